@@ -1,81 +1,191 @@
-from crewai import Agent, Process, Task
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from crewai import Crew, Process
 from app.agent_factory import AgentFactory
 from config.config import Config
 from app.crew_manager import CrewManager
+from app.solution_compactor import SOLUTION_SEPARATOR, SolutionCompactor
 from app.task_builder import TaskBuilder
+from app.tutoring_result import StudentSolution, TutoringResult
 from enums.llm_type import LLMType
+from enums.sampling_mode import SamplingMode
+from enums.student_mode import StudentMode
+from enums.verifier_context import VerifierContext
+from enums.verifier_mode import VerifierMode
+from utils.answer_checker import AnswerChecker
+from utils.answer_extractor import extract_final_answer, normalize_answer
+from utils.metrics import bind_context, metrics
+
+STUDENT_ROLE = "Mathematics Student"
+STUDENT_GOAL = "Solve the mathematics problem and explain your solution clearly"
+STUDENT_BACKSTORY = (
+    "You are a grade {grade} student who approaches problems methodically.\n"
+    "You will:\n"
+    "1. Read and understand the problem carefully\n"
+    "2. Show your complete solution step by step\n"
+    "3. Verify your answer makes sense\n"
+    "4. Present your solution clearly"
+)
+SOLVE_DESCRIPTION = (
+    "Solve this mathematics problem:\n\n"
+    "{question}\n\n"
+    "Show your complete solution following this format:\n"
+    "1. First explain what you understand from the problem\n"
+    "2. Show your step-by-step solution with explanations\n"
+    "3. State your final answer clearly\n"
+    "4. Verify your answer makes sense"
+)
+SOLVE_EXPECTED_OUTPUT = (
+    "# Understanding\n"
+    "* What I know:\n"
+    "* What I need to find:\n\n"
+    "# Solution Steps\n"
+    "1. Step 1\n"
+    "   * Work: [show calculation]\n"
+    "   * Because: [explain why]\n"
+    "[continue steps...]\n\n"
+    "# Final Answer\n"
+    "* The answer is: [state clearly]\n"
+    "* This makes sense because: [verify]\n"
+)
+
+
+def student_messages(inputs: dict) -> list[dict]:
+    """
+    Build the prompt shared by every student of the ensemble.
+
+    Mirrors the prompt crewai gives a student agent, without the role
+    number, so that a single request can be sampled for all students.
+    """
+    system = (
+        f"You are {STUDENT_ROLE}. {STUDENT_BACKSTORY.format(**inputs)}\n"
+        f"Your personal goal is: {STUDENT_GOAL}"
+    )
+    user = (
+        f"Current Task: {SOLVE_DESCRIPTION.format(**inputs)}\n\n"
+        "This is the expected criteria for your final answer: "
+        f"{SOLVE_EXPECTED_OUTPUT}\n"
+        "you MUST return the actual complete content as the final answer, "
+        "not a summary.\n\nBegin!"
+    )
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
 
 
 class Application:
     """Main application to execute the crew."""
 
-    def __init__(self, llm_type: LLMType = LLMType.LOCAL):
-        self.config = Config()
+    def __init__(self, llm_type: LLMType = LLMType.LOCAL, config: Config = None):
+        self.config = config or Config()
+        self.llm_type = llm_type
         self.llm = self._get_llm(llm_type)
-        self.crew_manager = CrewManager()
+        self.student_crews: list[Crew] = []
+        self.student_mode = StudentMode.AGENTS
+        self.student_llm = None
+        self.total_students = 0
+        self.crew = None
+        self.sampling = SamplingMode.FIXED
+        self.min_students = 1
+        self.wave_size = 1
+        self.agreement = 1.0
+        self.verifier = VerifierMode.LLM
+        self.answer_checker = AnswerChecker()
+        self.verifier_context = VerifierContext.FULL
+        self.compactor = SolutionCompactor(answer_checker=self.answer_checker)
+        self.quorum = None
+        self.straggler_timeout = 0.0
+        self._executor = None
+        # Student runs, kept until done since dropped stragglers keep running
+        self._running: dict[int, Future] = {}
 
-    def _get_llm(self, llm_type: LLMType):
+    def _get_llm(self, llm_type: LLMType, sample_index: int = None):
         """Get the appropriate LLM based on type."""
         match llm_type:
             case LLMType.OPENAI:
-                return self.config.get_openai_llm()
+                return self.config.get_openai_llm(sample_index)
             case LLMType.GOOGLE:
-                return self.config.get_google_llm()
+                return self.config.get_google_llm(sample_index)
             case LLMType.LOCAL | _:  # Default to LOCAL for any unmatched case
-                return self.config.get_local_llm()
-
-    def setup(self, total_students: int = 10):  # Reduced number of students for clarity
-        """Setup the agents and tasks."""
-        problem_solving_tasks: list[Task] = []
-        students: list[Agent] = []
-
-        # Create student problem solvers
-        for i in range(total_students):
-            student = AgentFactory.create_agent(
-                role=f"Mathematics Student {i+1}",
-                goal="Solve the mathematics problem and explain your solution clearly",
-                backstory=(
-                    "You are a grade {grade} student who approaches problems methodically.\n"
-                    "You will:\n"
-                    "1. Read and understand the problem carefully\n"
-                    "2. Show your complete solution step by step\n"
-                    "3. Verify your answer makes sense\n"
-                    "4. Present your solution clearly"
-                ),
-                llm=self.llm,
-                max_rpm=self.config.get_max_rpm(),
-            )
+                return self.config.get_local_llm(sample_index)
 
-            # Create problem-solving task for each student
-            solve_task = TaskBuilder.create_task(
-                description=(
-                    "Solve this mathematics problem:\n\n"
-                    "{question}\n\n"
-                    "Show your complete solution following this format:\n"
-                    "1. First explain what you understand from the problem\n"
-                    "2. Show your step-by-step solution with explanations\n"
-                    "3. State your final answer clearly\n"
-                    "4. Verify your answer makes sense"
-                ),
-                expected_output=(
-                    "# Understanding\n"
-                    "* What I know:\n"
-                    "* What I need to find:\n\n"
-                    "# Solution Steps\n"
-                    "1. Step 1\n"
-                    "   * Work: [show calculation]\n"
-                    "   * Because: [explain why]\n"
-                    "[continue steps...]\n\n"
-                    "# Final Answer\n"
-                    "* The answer is: [state clearly]\n"
-                    "* This makes sense because: [verify]\n"
-                ),
-                agent=student,
-                async_execution=True,
-            )
+    def setup(
+        self,
+        total_students: int = 10,  # Reduced number of students for clarity
+        sampling: SamplingMode = SamplingMode.FIXED,
+        min_students: int = 3,
+        wave_size: int = 2,
+        agreement: float = 0.75,
+        verifier: VerifierMode = VerifierMode.LLM,
+        verifier_context: VerifierContext = VerifierContext.FULL,
+        student_mode: StudentMode = StudentMode.AGENTS,
+        quorum: int = None,
+        straggler_timeout: float = 0.0,
+    ):
+        """
+        Setup the agents, tasks and crews.
+
+        Every student gets a single-task crew so that students can be run in
+        waves, and the verifier gets a crew reading their solutions from the
+        {solutions} input. The tasks are templated with {question}, {grade}
+        and {answer}, so the crews are built once and can be kicked off again
+        for every problem. In ensemble mode the students share one prompt and
+        are sampled together instead of running as separate agents.
+
+        Args:
+            total_students: Maximum number of students run on a problem
+            sampling: Run every student, or stop early on agreement
+            min_students: Students run before agreement is checked (adaptive)
+            wave_size: Students added per wave until agreement (adaptive)
+            agreement: Share of answers that must agree to stop (adaptive)
+            verifier: Let the LLM review every solution, or only the ones
+                whose final answer cannot be checked locally
+            verifier_context: Pass every solution to the verifier, or one
+                derivation per distinct final answer
+            student_mode: One agent per student, or one prompt sampled for
+                every student of a wave
+            quorum: Students that must answer before the slower ones of a
+                wave can be dropped (None waits for every student)
+            straggler_timeout: Seconds to wait for the remaining students of
+                a wave once the quorum has answered
+        """
+        self.sampling = sampling
+        self.min_students = max(1, min(min_students, total_students))
+        self.wave_size = max(1, wave_size)
+        self.agreement = agreement
+        self.verifier = verifier
+        self.verifier_context = verifier_context
+        self.student_mode = student_mode
+        self.total_students = total_students
+        self.quorum = min(quorum, total_students) if quorum else None
+        self.straggler_timeout = straggler_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(1, total_students))
 
-            students.append(student)
-            problem_solving_tasks.append(solve_task)
+        if student_mode is StudentMode.ENSEMBLE:
+            # One LLM samples every student from a single prompt
+            self.student_llm = self._get_llm(self.llm_type)
+        else:
+            # Create student problem solvers
+            for i in range(total_students):
+                student = AgentFactory.create_agent(
+                    role=f"{STUDENT_ROLE} {i+1}",
+                    goal=STUDENT_GOAL,
+                    backstory=STUDENT_BACKSTORY,
+                    # Each student samples its own response, keyed by its index
+                    llm=self._get_llm(self.llm_type, sample_index=i),
+                )
+
+                # Create problem-solving task for each student
+                solve_task = TaskBuilder.create_task(
+                    description=SOLVE_DESCRIPTION,
+                    expected_output=SOLVE_EXPECTED_OUTPUT,
+                    agent=student,
+                )
+
+                self.student_crews.append(self._build_crew(student, solve_task))
 
         # Create solution verifier
         verifier = AgentFactory.create_agent(
@@ -89,7 +199,6 @@ class Application:
                 "3. Identify which solution (if any) is correct"
             ),
             llm=self.llm,
-            max_rpm=self.config.get_max_rpm(),
         )
 
         # Create verification task
@@ -98,6 +207,7 @@ class Application:
                 "TASK: Check student solutions against the correct answer\n\n"
                 "Original Problem: {question}\n"
                 "Correct Answer: {answer}\n\n"
+                "Student Solutions:\n{solutions}\n\n"
                 "Check if any student found the correct answer by:\n"
                 "1. Looking at their final answers\n"
                 "2. Comparing with the correct answer\n"
@@ -118,22 +228,180 @@ class Application:
                 "* If no, explain why no one got it right\n"
             ),
             agent=verifier,
-            context=problem_solving_tasks,
         )
 
-        # Add agents and tasks to crew manager
-        self.crew_manager.add_agents(*students, verifier)
-        self.crew_manager.add_tasks(
-            *problem_solving_tasks,
-            verify_task
-        )
+        self.crew = self._build_crew(verifier, verify_task)
 
-    def run(self, inputs: dict):
-        """Execute the crew and return the result."""
-        crew = self.crew_manager.build_crew(
+    def _build_crew(self, agent, task) -> Crew:
+        """Build a crew running a single task."""
+        crew_manager = CrewManager()
+        crew_manager.add_agent(agent)
+        crew_manager.add_task(task)
+        return crew_manager.build_crew(
             process=Process.sequential,
             memory=False,
             embedder=self.config.get_google_embedder(),
         )
-        result = crew.kickoff(inputs=inputs)
-        return result
+
+    def run(self, inputs: dict) -> TutoringResult:
+        """Run the students, then the verifier, and return the result."""
+        if self.crew is None:
+            raise RuntimeError("Application.setup() must be called before run()")
+
+        with metrics.stage('students'):
+            solutions, launched = self._run_students(inputs)
+
+        sections = []
+        to_verify = solutions
+        if self.verifier is VerifierMode.LOCAL:
+            for solution in solutions:
+                solution.verdict = self.answer_checker.check(
+                    solution.final_answer, inputs["answer"])
+            to_verify = [solution for solution in solutions if solution.verdict is None]
+            sections.append(self._local_report(solutions))
+
+        if to_verify:
+            if self.verifier_context is VerifierContext.COMPACT:
+                solutions_text = self.compactor.compact(to_verify)
+            else:
+                solutions_text = SOLUTION_SEPARATOR.join(
+                    f"Student {solution.index + 1}:\n{solution.raw}"
+                    for solution in to_verify
+                )
+            with metrics.stage('verifier'):
+                result = self.crew.kickoff(inputs={**inputs, "solutions": solutions_text})
+            sections.append(result.raw)
+
+        return TutoringResult(
+            raw="\n\n".join(sections),
+            total_students=self.total_students,
+            solutions=solutions,
+            verifier_called=bool(to_verify),
+            students_launched=launched,
+        )
+
+    @staticmethod
+    def _local_report(solutions: list[StudentSolution]) -> str:
+        """Summarize the answers checked without the LLM verifier."""
+        labels = {True: "correct", False: "incorrect", None: "undecided, sent to the verifier"}
+        correct = [
+            f"Student {solution.index + 1}" for solution in solutions if solution.verdict
+        ]
+        decided = sum(solution.verdict is not None for solution in solutions)
+        lines = [
+            "# Local Verification",
+            f"* Number of solutions checked: {len(solutions)}",
+            f"* Decided locally: {decided}",
+            f"* Correct solutions found: {'yes' if correct else 'no'}",
+            "",
+            "# Local Analysis",
+            "* Student answers reviewed:",
+        ]
+        lines.extend(
+            f"  - Student {solution.index + 1}: "
+            f"{solution.final_answer or '[no final answer]'} ({labels[solution.verdict]})"
+            for solution in solutions
+        )
+        if correct:
+            lines.extend(["", f"* Correct student(s): {', '.join(correct)}"])
+        return "\n".join(lines) + "\n"
+
+    def _run_students(self, inputs: dict) -> tuple[list[StudentSolution], int]:
+        """
+        Run students in waves, stopping early once their answers agree.
+
+        Returns the solutions collected and the number of student runs
+        started, which includes dropped stragglers.
+        """
+        total = self.total_students
+        if self.sampling is SamplingMode.FIXED:
+            wave_sizes = [total]
+        else:
+            wave_sizes = [self.min_students]
+            remaining = total - self.min_students
+            while remaining > 0:
+                wave_sizes.append(min(self.wave_size, remaining))
+                remaining -= wave_sizes[-1]
+
+        solutions: list[StudentSolution] = []
+        students = self._free_students()
+        position = 0
+        launched = 0
+        for wave_size in wave_sizes:
+            wave = students[position:position + wave_size]
+            if not wave:
+                break
+            launched += len(wave)
+            if self.student_mode is StudentMode.ENSEMBLE:
+                outputs = dict(zip(wave, self.student_llm.call_samples(
+                    student_messages(inputs), len(wave), first_index=wave[0])))
+            else:
+                futures = {
+                    index: self._executor.submit(
+                        bind_context(self.student_crews[index].kickoff), inputs=inputs)
+                    for index in wave
+                }
+                self._running.update(futures)
+                needed = len(wave) if self.quorum is None else min(
+                    len(wave), max(1, self.quorum - len(solutions)))
+                outputs = self._collect(futures, needed)
+            solutions.extend(
+                StudentSolution(index, outputs[index], extract_final_answer(outputs[index]))
+                for index in wave
+                if index in outputs
+            )
+            position += wave_size
+            if self._has_agreement(solutions):
+                break
+
+        return solutions, launched
+
+    def _free_students(self) -> list[int]:
+        """
+        Return the students not busy with a dropped run of an earlier problem.
+
+        A crew runs one problem at a time, so students whose straggling run
+        is still going are left out, waiting for them only if fewer than the
+        quorum would be left.
+        """
+        while True:
+            busy = {index for index, future in self._running.items() if not future.done()}
+            free = [index for index in range(self.total_students) if index not in busy]
+            if len(free) >= (self.quorum or self.total_students) or not busy:
+                return free
+            wait([self._running[index] for index in busy], return_when=FIRST_COMPLETED)
+
+    def _collect(self, futures: dict[int, Future], needed: int) -> dict[int, str]:
+        """Wait for the students of a wave, dropping stragglers once `needed` answered."""
+        index_of = {future: index for index, future in futures.items()}
+        outputs: dict[int, str] = {}
+        pending = set(futures.values())
+        deadline = None
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                outputs[index_of[future]] = future.result().raw
+            if deadline is None and len(outputs) >= needed:
+                deadline = time.monotonic() + self.straggler_timeout
+
+        if pending:
+            metrics.count('stragglers_dropped', len(pending))
+        return outputs
+
+    def _has_agreement(self, solutions: list[StudentSolution]) -> bool:
+        """Check whether enough students agree on one final answer."""
+        if self.sampling is SamplingMode.FIXED:
+            return False
+
+        answers = Counter(
+            normalize_answer(solution.final_answer) for solution in solutions
+        )
+        answers.pop(None, None)
+        if not answers:
+            return False
+
+        _, count = answers.most_common(1)[0]
+        return count / len(solutions) >= self.agreement
@@ -0,0 +1,94 @@
+import threading
+import time
+from contextlib import contextmanager
+from queue import Empty, Queue
+
+from app.application import Application
+from config.config import Config
+from enums.cache_mode import CacheMode
+from enums.llm_type import LLMType
+from utils.metrics import metrics
+
+
+class ApplicationPool:
+    """Pool of warm applications reused across problems."""
+
+    def __init__(
+        self,
+        llm_type: LLMType = LLMType.LOCAL,
+        total_students: int = 10,
+        size: int = 1,
+        cache_mode: CacheMode = CacheMode.OFF,
+        **setup_options,
+    ):
+        """
+        Initialize the pool.
+
+        Applications are created and set up lazily, at most `size` of them,
+        and share a single Config.
+
+        Args:
+            llm_type: LLM type used by every application
+            total_students: Number of student agents per application
+            size: Maximum number of applications (one per concurrent problem)
+            cache_mode: LLM response cache mode
+            setup_options: Additional arguments for Application.setup
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.llm_type = llm_type
+        self.total_students = total_students
+        self.size = size
+        self.setup_options = setup_options
+        self.config = Config(cache_mode=cache_mode)
+        self._idle: Queue[Application] = Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create(self) -> Application:
+        app = Application(llm_type=self.llm_type, config=self.config)
+        app.setup(total_students=self.total_students, **self.setup_options)
+        return app
+
+    @contextmanager
+    def acquire(self):
+        """Borrow an application for the duration of the context."""
+        start = time.perf_counter()
+        app = self._take()
+        metrics.add_wait(time.perf_counter() - start, stage='problem')
+        try:
+            yield app
+        finally:
+            self._idle.put(app)
+
+    def _take(self) -> Application:
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+
+        if not can_create:
+            return self._idle.get()
+
+        try:
+            return self._create()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def warm(self):
+        """Create and set up every application ahead of the first problem."""
+        apps = [self._take() for _ in range(self.size)]
+        for app in apps:
+            self._idle.put(app)
+
+    def run(self, inputs: dict):
+        """Execute a warm crew on the given inputs and return the result."""
+        with self.acquire() as app:
+            return app.run(inputs)
@@ -0,0 +1,59 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Iterable, Iterator, Tuple
+
+
+class ProblemPipeline:
+    """Runs problems concurrently and yields results in input order."""
+
+    def __init__(
+        self,
+        worker: Callable[[dict], Any],
+        concurrency: int = 1,
+        max_pending: int = None,
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            worker: Callable processing a single problem
+            concurrency: Number of problems processed at the same time
+            max_pending: Maximum number of submitted but not yet yielded
+                problems (defaults to twice the concurrency)
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.worker = worker
+        self.concurrency = concurrency
+        self.max_pending = max(max_pending or concurrency * 2, concurrency)
+
+    def run(
+        self,
+        problems: Iterable[dict],
+    ) -> Iterator[Tuple[dict, Any, Exception | None]]:
+        """
+        Process problems and yield (problem, result, error) tuples.
+
+        Problems are pulled lazily from the iterable, so at most
+        `max_pending` problems are held in memory at any time. A failing
+        problem yields its exception instead of stopping the run.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        pending: Deque[Tuple[dict, Future]] = deque()
+        try:
+            for problem in problems:
+                if len(pending) >= self.max_pending:
+                    yield self._collect(*pending.popleft())
+                pending.append((problem, executor.submit(self.worker, problem)))
+
+            while pending:
+                yield self._collect(*pending.popleft())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _collect(problem: dict, future: Future):
+        try:
+            return problem, future.result(), None
+        except Exception as e:
+            return problem, None, e
@@ -0,0 +1,119 @@
+from typing import List, Optional
+
+from app.tutoring_result import StudentSolution
+from utils.answer_checker import AnswerChecker
+
+SOLUTION_SEPARATOR = "\n\n----------\n\n"
+
+
+class _Cluster:
+    """Students that reached the same final answer."""
+
+    def __init__(self, solution: StudentSolution, normalized: Optional[str]):
+        self.answer = solution.final_answer
+        self.normalized = normalized
+        self.solutions = [solution]
+
+    @property
+    def students(self) -> str:
+        return ", ".join(f"Student {solution.index + 1}" for solution in self.solutions)
+
+    def representative(self) -> StudentSolution:
+        # The shortest derivation is the cheapest one to review
+        return min(self.solutions, key=lambda solution: len(solution.raw))
+
+
+class SolutionCompactor:
+    """Builds a bounded verifier context from many student solutions."""
+
+    def __init__(
+        self,
+        max_derivations: int = 4,
+        max_derivation_chars: int = 3000,
+        max_listed_answers: int = 20,
+        answer_checker: AnswerChecker = None,
+    ):
+        """
+        Initialize the compactor.
+
+        Args:
+            max_derivations: Distinct answers shown with a full derivation
+            max_derivation_chars: Characters kept from each derivation
+            max_listed_answers: Further distinct answers listed without one
+            answer_checker: Checker used to group equivalent answers
+        """
+        self.max_derivations = max_derivations
+        self.max_derivation_chars = max_derivation_chars
+        self.max_listed_answers = max_listed_answers
+        self.answer_checker = answer_checker or AnswerChecker()
+
+    def compact(self, solutions: List[StudentSolution]) -> str:
+        """
+        Group solutions by final answer and keep one derivation per answer.
+
+        The size of the result depends on the limits, not on the number of
+        students.
+        """
+        clusters = self._cluster(solutions)
+        clusters.sort(key=lambda cluster: len(cluster.solutions), reverse=True)
+
+        sections = [
+            f"{len(solutions)} student solution(s) with "
+            f"{len(clusters)} distinct final answer(s)."
+        ]
+        for number, cluster in enumerate(clusters[:self.max_derivations], 1):
+            representative = cluster.representative()
+            sections.append(
+                f"## Answer {number}: {cluster.answer or '[no final answer]'}\n"
+                f"* Students: {len(cluster.solutions)} ({cluster.students})\n"
+                f"* Representative solution (Student {representative.index + 1}):\n\n"
+                f"{self._truncate(representative.raw)}"
+            )
+
+        others = clusters[self.max_derivations:]
+        if others:
+            lines = ["## Other answers"]
+            lines.extend(
+                f"* {cluster.answer or '[no final answer]'}: "
+                f"{len(cluster.solutions)} ({cluster.students})"
+                for cluster in others[:self.max_listed_answers]
+            )
+            hidden = others[self.max_listed_answers:]
+            if hidden:
+                students = sum(len(cluster.solutions) for cluster in hidden)
+                lines.append(
+                    f"* ... {len(hidden)} more distinct answer(s) from {students} student(s)"
+                )
+            sections.append("\n".join(lines))
+
+        return SOLUTION_SEPARATOR.join(sections)
+
+    def _cluster(self, solutions: List[StudentSolution]) -> List[_Cluster]:
+        """Group solutions whose final answers are equal or equivalent."""
+        clusters: List[_Cluster] = []
+        for solution in solutions:
+            normalized = (
+                self.answer_checker.normalize(solution.final_answer)
+                if solution.final_answer else None
+            )
+            for cluster in clusters:
+                if normalized == cluster.normalized or (
+                    normalized is not None and cluster.normalized is not None
+                    and self.answer_checker.check(solution.final_answer, cluster.answer)
+                ):
+                    cluster.solutions.append(solution)
+                    break
+            else:
+                clusters.append(_Cluster(solution, normalized))
+        return clusters
+
+    def _truncate(self, text: str) -> str:
+        """Shorten a derivation, keeping its beginning and its final answer."""
+        if len(text) <= self.max_derivation_chars:
+            return text
+
+        tail_start = text.rfind("# Final Answer")
+        tail = text[tail_start:] if tail_start != -1 else ""
+        tail = tail[:self.max_derivation_chars // 3]
+        head = text[:self.max_derivation_chars - len(tail)]
+        return f"{head}\n[...]\n{tail}"
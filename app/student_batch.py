@@ -0,0 +1,162 @@
+import json
+import os
+from typing import Dict, Iterable, List
+
+from app.application import student_messages
+from config.tutor_llm import TutorLLM
+
+
+class StudentBatch:
+    """
+    Offline student sampling through the OpenAI Batch API.
+
+    Student prompts are submitted as one batch job, which is processed
+    within 24 hours at a lower price and outside the online rate limits.
+    Once the job completes, the samples are stored in the LLM response cache
+    under the same keys as the ensemble student mode, so a later run with
+    `--student-mode ensemble --cache read` only calls the verifier.
+    """
+
+    ENDPOINT = "/v1/chat/completions"
+
+    def __init__(self, llm: TutorLLM, state_dir: str = "output/batches"):
+        """
+        Initialize the batch.
+
+        Args:
+            llm: Student LLM, with the response cache the samples are stored in
+            state_dir: Directory keeping the prompts of each submitted batch
+        """
+        self.llm = llm
+        self.state_dir = state_dir
+
+    def build_requests(self, inputs: Iterable[dict], students: int) -> List[dict]:
+        """
+        Build the batch requests sampling every student of every problem.
+
+        Problems get a single request with n samples when the provider
+        supports it, and one request per student otherwise.
+
+        Args:
+            inputs: Crew inputs of each problem (grade, question, ...)
+            students: Number of students per problem
+        """
+        n = students if self.llm.supports_n() else 1
+        requests = []
+        for problem_index, problem_inputs in enumerate(inputs):
+            messages = student_messages(problem_inputs)
+            for first_index in range(0, students, n):
+                requests.append({
+                    "custom_id": f"{problem_index}:{first_index}",
+                    "method": "POST",
+                    "url": self.ENDPOINT,
+                    "body": self._body(messages, min(n, students - first_index)),
+                })
+        return requests
+
+    def submit(self, requests: List[dict]) -> str:
+        """
+        Upload the requests and create the batch job.
+
+        Returns:
+            str: The id of the batch
+        """
+        import litellm
+
+        os.makedirs(self.state_dir, exist_ok=True)
+        input_path = os.path.join(self.state_dir, "pending_requests.jsonl")
+        with open(input_path, 'w', encoding='utf-8') as f:
+            for request in requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+        with open(input_path, 'rb') as f:
+            input_file = litellm.create_file(
+                file=f, purpose="batch", **self._provider_options())
+        batch = litellm.create_batch(
+            completion_window="24h",
+            endpoint=self.ENDPOINT,
+            input_file_id=input_file.id,
+            **self._provider_options(),
+        )
+
+        os.replace(input_path, self._requests_path(batch.id))
+        return batch.id
+
+    def status(self, batch_id: str):
+        """Return the batch job, with its status and request counts."""
+        import litellm
+
+        return litellm.retrieve_batch(batch_id=batch_id, **self._provider_options())
+
+    def collect(self, batch_id: str) -> int:
+        """
+        Download the results of a completed batch into the response cache.
+
+        Returns:
+            int: Number of student samples stored
+        """
+        import litellm
+
+        if self.llm.cache is None:
+            raise ValueError("The student LLM has no response cache to collect into")
+
+        batch = self.status(batch_id)
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch_id} is {batch.status}, not completed")
+
+        messages_by_id = self._load_messages(batch_id)
+        content = litellm.file_content(
+            file_id=batch.output_file_id, **self._provider_options())
+
+        stored = 0
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                print(f"Skipping failed batch request {result.get('custom_id')}")
+                continue
+
+            messages = messages_by_id[result["custom_id"]]
+            _, first_index = map(int, result["custom_id"].split(":"))
+            for offset, choice in enumerate(response["body"]["choices"]):
+                text = choice["message"]["content"]
+                if text:
+                    key = self.llm.cache_key(messages, sample_index=first_index + offset)
+                    self.llm.cache.set(key, text)
+                    stored += 1
+        return stored
+
+    def _body(self, messages: List[Dict[str, str]], n: int) -> dict:
+        """Build a chat completion body with the sampling parameters of the LLM."""
+        body = {
+            name: getattr(self.llm, name, None)
+            for name in TutorLLM.SAMPLING_PARAMS
+        }
+        body.update(
+            model=self.llm.model.split("/", 1)[-1] if self.llm.model.startswith("openai/")
+            else self.llm.model,
+            messages=messages,
+            n=n,
+        )
+        return {name: value for name, value in body.items() if value is not None}
+
+    def _provider_options(self) -> dict:
+        return {
+            "custom_llm_provider": "openai",
+            "api_key": getattr(self.llm, "api_key", None),
+            "api_base": getattr(self.llm, "base_url", None) or getattr(self.llm, "api_base", None),
+        }
+
+    def _requests_path(self, batch_id: str) -> str:
+        return os.path.join(self.state_dir, f"{batch_id}.jsonl")
+
+    def _load_messages(self, batch_id: str) -> Dict[str, List[Dict[str, str]]]:
+        """Read back the prompt of each request of a submitted batch."""
+        messages = {}
+        with open(self._requests_path(batch_id), encoding='utf-8') as f:
+            for line in f:
+                request = json.loads(line)
+                messages[request["custom_id"]] = request["body"]["messages"]
+        return messages
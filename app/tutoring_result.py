@@ -0,0 +1,62 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from utils.answer_extractor import extract_verdict
+
+
+@dataclass
+class StudentSolution:
+    """Solution written by one student."""
+
+    index: int
+    raw: str
+    final_answer: Optional[str] = None
+    # True/False when checked locally, None when left to the LLM verifier
+    verdict: Optional[bool] = None
+
+
+@dataclass
+class TutoringResult:
+    """Outcome of running the students and the verifier on one problem."""
+
+    raw: str
+    total_students: int
+    solutions: List[StudentSolution] = field(default_factory=list)
+    verifier_called: bool = True
+    # item_id of the near-duplicate problem whose analysis was reused
+    reused_from: Optional[str] = None
+    # Student runs started, dropped stragglers included (solutions if None)
+    students_launched: Optional[int] = None
+
+    @property
+    def students_run(self) -> int:
+        """Number of student LLM runs made for the problem."""
+        if self.students_launched is None:
+            return len(self.solutions)
+        return self.students_launched
+
+    @property
+    def calls_saved(self) -> int:
+        """
+        Number of student runs never started, skipped by early stopping or
+        because the students were still busy with a dropped run.
+        """
+        return self.total_students - self.students_run
+
+    @property
+    def stragglers_dropped(self) -> int:
+        """Number of student runs started but dropped before answering."""
+        return self.students_run - len(self.solutions)
+
+    @property
+    def verdict(self) -> Optional[bool]:
+        """
+        Whether a correct solution was found: True if a student was checked
+        correct locally, otherwise the conclusion of the verifier, or False
+        when every answer was checked incorrect without it. None if unknown.
+        """
+        if any(solution.verdict for solution in self.solutions):
+            return True
+        if self.verifier_called:
+            return extract_verdict(self.raw)
+        return False if self.solutions else None
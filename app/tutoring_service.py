@@ -0,0 +1,76 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+from utils.metrics import bind_context, metrics
+
+# Problem fields that make up the crew inputs, identical ones share a crew run
+COALESCE_FIELDS = ('question_text', 'answer_text', 'explanation')
+
+
+def coalesce_key(problem: dict) -> str:
+    """Hash the crew inputs of a problem."""
+    payload = json.dumps(
+        [problem.get(name) for name in COALESCE_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TutoringService:
+    """
+    Runs problems submitted by concurrent clients on a fixed set of workers.
+
+    Problems submitted while an identical one is still running are coalesced:
+    they get the future of the running problem instead of a crew run of
+    their own.
+    """
+
+    def __init__(self, worker: Callable[[dict], Any], concurrency: int = 1):
+        """
+        Initialize the service.
+
+        Args:
+            worker: Callable processing a single problem
+            concurrency: Number of problems processed at the same time
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.worker = worker
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._running: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, problem: dict) -> Tuple[Future, bool]:
+        """
+        Schedule a problem, or join the identical one already scheduled.
+
+        Returns:
+            Tuple[Future, bool]: Future of the worker result, and whether the
+                problem was coalesced with a scheduled one
+        """
+        key = coalesce_key(problem)
+        with self._lock:
+            future = self._running.get(key)
+            if future is not None:
+                metrics.count('coalesced_requests')
+                return future, True
+            future = self._executor.submit(bind_context(self.worker), problem)
+            self._running[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future, False
+
+    def _forget(self, key: str, future: Future):
+        with self._lock:
+            if self._running.get(key) is future:
+                del self._running[key]
+
+    @property
+    def pending(self) -> int:
+        """Number of distinct problems queued or running."""
+        with self._lock:
+            return len(self._running)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
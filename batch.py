@@ -0,0 +1,69 @@
+import argparse
+
+from app.student_batch import StudentBatch
+from config.config import Config
+from enums.cache_mode import CacheMode
+from main import problem_texts
+from utils.csv_reader import CSVReader
+
+
+def parse_args():
+    """
+    Parse command line arguments for offline student batches.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Sample students offline through the OpenAI Batch API')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    submit = subparsers.add_parser('submit', help='Submit the student prompts of a CSV file')
+    submit.add_argument(
+        '--file',
+        type=str,
+        default='data/question_content_math_7.csv',
+        help='Path to CSV file containing problems'
+    )
+    submit.add_argument(
+        '--students',
+        type=int,
+        default=10,
+        help='Number of students to simulate'
+    )
+
+    status = subparsers.add_parser('status', help='Show the status of a batch')
+    status.add_argument('batch_id', type=str)
+
+    collect = subparsers.add_parser('collect', help='Store the results of a batch in the LLM cache')
+    collect.add_argument('batch_id', type=str)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # Samples are written to the LLM cache and read back by main.py
+    config = Config(cache_mode=CacheMode.WRITE)
+    batch = StudentBatch(config.get_openai_llm())
+
+    if args.command == 'submit':
+        inputs = []
+        for problem in CSVReader(args.file).iter_problems():
+            question_text, answer_text = problem_texts(problem)
+            inputs.append({
+                "grade": 7,
+                "question": question_text,
+                "explanation": problem["explanation"],
+                "answer": answer_text,
+            })
+        requests = batch.build_requests(inputs, args.students)
+        batch_id = batch.submit(requests)
+        print(f"Submitted {len(requests)} requests for {len(inputs)} problems as batch {batch_id}")
+    elif args.command == 'status':
+        job = batch.status(args.batch_id)
+        print(f"Batch {job.id}: {job.status} ({job.request_counts})")
+    else:
+        stored = batch.collect(args.batch_id)
+        print(f"Stored {stored} student samples in {config.llm_cache_path}")
+        config.get_llm_cache().close()
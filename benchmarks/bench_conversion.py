@@ -0,0 +1,89 @@
+"""
+Benchmark HTML to text conversion throughput on a synthetic HTML corpus.
+
+Compares converting problems one at a time with HTMLToText.process_content
+against the ConversionPipeline, which renders on browser tabs and OCRs in a
+process pool. The conversion cache and direct extraction are disabled so every
+fragment is rendered. Requires Chrome and Tesseract.
+
+Usage:
+    python benchmarks/bench_conversion.py --problems 40
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.conversion_pipeline import ConversionPipeline  # noqa: E402
+from utils.html_renderer import HTMLRenderer  # noqa: E402
+from utils.html_to_text import HTMLToText  # noqa: E402
+
+
+def synthetic_problem(index: int, rng: random.Random) -> dict:
+    a, b, c = rng.randint(2, 99), rng.randint(2, 99), rng.randint(2, 9)
+    rows = "".join(
+        f"<tr><td>{x}</td><td>{x * c}</td></tr>" for x in range(1, rng.randint(3, 8))
+    )
+    return {
+        'index': index,
+        'item_id': f"bench{index}",
+        'item_description': (
+            f"<p>次の表は、<i>x</i> と <i>y</i> の関係を表しています。</p>"
+            f"<table border='1'><tr><th>x</th><th>y</th></tr>{rows}</table>"
+        ),
+        'question': f"<p>{a}<sup>2</sup> − {b} を計算しなさい。</p>",
+        'answer': f"<p>{a * a - b}</p>",
+        'explanation': "",
+    }
+
+
+def sequential(problems, tabs):
+    converter = HTMLToText(renderer=HTMLRenderer(tabs=tabs), direct=False)
+    # Start the browser outside of the measurement
+    converter.renderer.render("<p>warm up</p>")
+    start = time.perf_counter()
+    for problem in problems:
+        for content_type in ('question', 'answer'):
+            converter.process_content(problem, content_type)
+    elapsed = time.perf_counter() - start
+    converter.close()
+    return elapsed
+
+
+def pipelined(problems, tabs, workers):
+    converter = HTMLToText(renderer=HTMLRenderer(tabs=tabs), direct=False)
+    # Start the browser outside of the measurement
+    converter.renderer.render("<p>warm up</p>")
+    start = time.perf_counter()
+    for problem in ConversionPipeline(converter, workers=workers).run(problems):
+        if 'conversion_error' in problem:
+            raise problem['conversion_error']
+    elapsed = time.perf_counter() - start
+    converter.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML conversion benchmark')
+    parser.add_argument('--problems', type=int, default=40)
+    parser.add_argument('--tabs', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    problems = [synthetic_problem(i, rng) for i in range(args.problems)]
+
+    before = sequential(problems, args.tabs)
+    after = pipelined(problems, args.tabs, args.workers)
+
+    print(f"problems={args.problems} tabs={args.tabs} ocr_workers={args.workers}")
+    print(f"sequential: {args.problems / before:.2f} problems/s ({before:.1f} s)")
+    print(f"pipelined:  {args.problems / after:.2f} problems/s ({after:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
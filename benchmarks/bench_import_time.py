@@ -0,0 +1,90 @@
+"""
+Check the import time of main.py against a budget.
+
+Imports main in a fresh interpreter with `python -X importtime`, reports the
+slowest modules and fails when the total exceeds the budget or when a heavy
+dependency (crewai, litellm, IPython, Tesseract, PIL, ...) is loaded at
+import time. Those must only be imported on the code paths that use them.
+The same check runs with the tests (tests/test_import_time.py).
+
+Usage:
+    python benchmarks/bench_import_time.py --budget-ms 150
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUDGET_MS = 150.0
+
+# Packages that must not be loaded by `import main`
+HEAVY_MODULES = (
+    'crewai',
+    'litellm',
+    'chromadb',
+    'IPython',
+    'pytesseract',
+    'PIL',
+    'websocket',
+    'sympy',
+)
+
+
+def import_times(module: str) -> list[tuple[str, int]]:
+    """Return (module, cumulative microseconds) for every module imported."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = line.replace('|', ':').split(':', 3)
+        times.append((name.strip(), int(cumulative_us)))
+    return times
+
+
+def total_ms(times: list[tuple[str, int]], module: str) -> float:
+    """Return the cumulative import time of module in milliseconds."""
+    return next(us for name, us in times if name == module) / 1000
+
+
+def heavy_modules(times: list[tuple[str, int]]) -> list[str]:
+    """Return the heavy packages among the imported modules."""
+    loaded = {name for name, _ in times}
+    return sorted(
+        name for name in HEAVY_MODULES
+        if any(module == name or module.startswith(name + '.') for module in loaded)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time budget check')
+    parser.add_argument('--module', type=str, default='main')
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+    elapsed_ms = total_ms(times, args.module)
+    heavy = heavy_modules(times)
+
+    print(f"import {args.module}: {elapsed_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, us in sorted(times, key=lambda item: -item[1])[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if heavy:
+        print(f"Heavy modules loaded at import time: {', '.join(heavy)}")
+        failed = True
+    if elapsed_ms > args.budget_ms:
+        print("Import time is over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark OCR time and character accuracy of the screenshot settings.
+
+Renders synthetic HTML fragments (tables, paragraphs and sub/superscripts)
+with the current settings (full 1024x768 viewport at scale 2, raw
+screenshot) and the OCR-optimized ones (content clip at scale 3, cropped,
+binarized and split into bands), then OCRs them one fragment at a time. The
+reference text of a fragment is its direct extraction by HTMLExtractor, and
+accuracy is 1 - character error rate, ignoring whitespace. Requires Chrome
+and Tesseract.
+
+Usage:
+    python benchmarks/bench_ocr.py --fragments 40 --max-band-height 1200
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_conversion import synthetic_problem  # noqa: E402
+from utils.html_extractor import HTMLExtractor  # noqa: E402
+from utils.html_renderer import HTMLRenderer  # noqa: E402
+from utils.html_to_text import HTMLToText  # noqa: E402
+from utils.metrics import percentile  # noqa: E402
+
+
+def edit_distance(first: str, second: str) -> int:
+    """Levenshtein distance between two strings."""
+    previous = list(range(len(second) + 1))
+    for i, a in enumerate(first, 1):
+        current = [i]
+        for j, b in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a != b)))
+        previous = current
+    return previous[-1]
+
+
+def accuracy(text: str, reference: str) -> float:
+    """1 - character error rate of text against reference, ignoring whitespace."""
+    text, reference = re.sub(r'\s+', '', text), re.sub(r'\s+', '', reference)
+    if not reference:
+        return 1.0 if not text else 0.0
+    return max(0.0, 1 - edit_distance(text, reference) / len(reference))
+
+
+def fragments(count: int, seed: int) -> list[str]:
+    """Wrapped HTML of the questions and answers of synthetic problems."""
+    rng = random.Random(seed)
+    converter = HTMLToText(renderer=HTMLRenderer())
+    htmls = []
+    for index in range(count // 2 + 1):
+        problem = synthetic_problem(index, rng)
+        for content_type in ('question', 'answer'):
+            html, _ = converter.wrap_content(problem, content_type)
+            htmls.append(html)
+    return htmls[:count]
+
+
+def measure(name: str, converter: HTMLToText, htmls: list[str], references: list[str]) -> dict:
+    """Render and OCR every fragment, timing the OCR of each one."""
+    converter.renderer.render("<p>warm up</p>")
+    ocr_seconds, scores, pixels = [], [], []
+    for html, reference in zip(htmls, references):
+        image = converter.html_to_image(html)
+        pixels.append(_pixels(image))
+        start = time.perf_counter()
+        text = converter.image_to_text(image) or ''
+        ocr_seconds.append(time.perf_counter() - start)
+        scores.append(accuracy(text, reference))
+    converter.close()
+    return {
+        'name': name,
+        'pixels': sum(pixels) / len(pixels),
+        'ocr_total': sum(ocr_seconds),
+        'ocr_p50': percentile(ocr_seconds, 0.5),
+        'ocr_p95': percentile(ocr_seconds, 0.95),
+        'accuracy': sum(scores) / len(scores),
+    }
+
+
+def _pixels(image: bytes) -> int:
+    """Pixel count of a PNG, read from its IHDR chunk."""
+    return int.from_bytes(image[16:20], 'big') * int.from_bytes(image[20:24], 'big')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR settings benchmark')
+    parser.add_argument('--fragments', type=int, default=40)
+    parser.add_argument('--max-band-height', type=int, default=1200,
+                        help='Band height of the optimized settings in pixels')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    htmls = fragments(args.fragments, args.seed)
+    extractor = HTMLExtractor()
+    references = [extractor.extract(html) or '' for html in htmls]
+
+    rows = [
+        measure(
+            'current',
+            HTMLToText(renderer=HTMLRenderer(scale=2), direct=False),
+            htmls, references,
+        ),
+        measure(
+            'optimized',
+            HTMLToText(
+                renderer=HTMLRenderer(scale=3, clip=True),
+                direct=False,
+                optimize=True,
+                max_band_height=args.max_band_height,
+            ),
+            htmls, references,
+        ),
+    ]
+
+    print(f"fragments={len(htmls)} max_band_height={args.max_band_height}")
+    print(f"{'settings':<10} {'pixels':>10} {'ocr total':>10} {'p50':>7} {'p95':>7} {'accuracy':>9}")
+    for row in rows:
+        print(
+            f"{row['name']:<10} {row['pixels']:>10.0f} {row['ocr_total']:>9.2f}s "
+            f"{row['ocr_p50']:>6.2f}s {row['ocr_p95']:>6.2f}s {row['accuracy']:>9.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
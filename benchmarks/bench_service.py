@@ -0,0 +1,188 @@
+"""
+Load test the tutoring service (server.py) against the mock LLM server.
+
+Starts benchmarks/mock_llm_server.py in process and server.py as a
+subprocess pointed at it, waits for the crews to be warm and then sends
+problems from concurrent clients to POST /problems. A share of the requests
+repeats an earlier question, to exercise the coalescing of identical
+problems. Reports requests per second, the p50/p95/p99 latency seen by the
+clients and the requests coalesced by the service. With --batch the problems
+are sent to POST /problems/batch instead, and the latency is the time until
+each streamed result arrives.
+
+Usage:
+    python benchmarks/bench_service.py --requests 200 --clients 16 \\
+        --concurrency 4 --duplicate-ratio 0.2 --latency lognormal:-0.7,0.5
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_llm_server import MockLLMServer  # noqa: E402
+from utils.metrics import percentile  # noqa: E402
+
+
+def synthetic_problems(count: int, duplicate_ratio: float, seed: int) -> list[dict]:
+    """Build problems, a share of them repeating an earlier question."""
+    rng = random.Random(seed)
+    problems = []
+    for index in range(count):
+        if problems and rng.random() < duplicate_ratio:
+            problems.append({**rng.choice(problems), 'item_id': f"load{index:05d}"})
+            continue
+        a, b = rng.randint(2, 30), rng.randint(2, 99)
+        problems.append({
+            'item_id': f"load{index:05d}",
+            'question': f"x = {a} のとき、x^2 - {b} の値を求めなさい。",
+            'answer': str(a * a - b),
+            'explanation': f"{a}^2 - {b} = {a * a - b}",
+        })
+    return problems
+
+
+def post(url: str, payload: dict, timeout: float):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+    )
+    return urllib.request.urlopen(request, timeout=timeout)
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, timeout: float):
+    """Wait until the service answers its health check."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server.py exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError("server.py did not become ready")
+
+
+def load_single(base_url: str, problems: list[dict], clients: int, timeout: float):
+    """Send each problem as its own request from concurrent clients."""
+    def send(problem):
+        start = time.perf_counter()
+        try:
+            with post(f"{base_url}/problems", problem, timeout) as response:
+                response.read()
+            return time.perf_counter() - start, True
+        except OSError:
+            return time.perf_counter() - start, False
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        return list(executor.map(send, problems))
+
+
+def load_batch(base_url: str, problems: list[dict], timeout: float):
+    """Send every problem in one batch request and time each streamed result."""
+    start = time.perf_counter()
+    results = []
+    with post(f"{base_url}/problems/batch", {'problems': problems}, timeout) as response:
+        for line in response:
+            results.append((time.perf_counter() - start, 'error' not in json.loads(line)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tutoring service load test')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=16,
+                        help='Concurrent client connections')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Problems the service runs at the same time')
+    parser.add_argument('--students', type=int, default=3)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.2,
+                        help='Share of requests repeating an earlier question')
+    parser.add_argument('--batch', action='store_true',
+                        help='Send all problems in one streamed batch request')
+    parser.add_argument('--latency', type=str, default='lognormal:-0.7,0.5',
+                        help='Mock time to first token distribution')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--completion-tokens', type=int, default=300)
+    parser.add_argument('--model', type=str, default='gpt-4o-mini',
+                        help='Model name sent to the mock server')
+    parser.add_argument('--port', type=int, default=8765, help='Port of the service')
+    parser.add_argument('--server-args', type=str, default='',
+                        help='Extra arguments for server.py, e.g. "--student-mode ensemble"')
+    parser.add_argument('--timeout', type=float, default=600.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    mock = MockLLMServer(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        seed=args.seed,
+    ).start()
+    workdir = tempfile.mkdtemp(prefix='bench_service_')
+    command = [
+        sys.executable, os.path.join(ROOT, 'server.py'),
+        '--llm', 'OPENAI',
+        '--port', str(args.port),
+        '--students', str(args.students),
+        '--concurrency', str(args.concurrency),
+        '--metrics-file', os.path.join(workdir, 'metrics.jsonl'),
+        *args.server_args.split(),
+    ]
+    env = {
+        **os.environ,
+        'OPENAI_BASE_URL': f"{mock.base_url}/v1",
+        'OPENAI_API_KEY': 'mock',
+        'OPENAI_MODEL': args.model,
+    }
+    base_url = f"http://127.0.0.1:{args.port}"
+    process = subprocess.Popen(
+        command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(base_url, process, args.timeout)
+        problems = synthetic_problems(args.requests, args.duplicate_ratio, args.seed)
+
+        start = time.perf_counter()
+        if args.batch:
+            results = load_batch(base_url, problems, args.timeout)
+        else:
+            results = load_single(base_url, problems, args.clients, args.timeout)
+        elapsed = time.perf_counter() - start
+
+        with urllib.request.urlopen(f"{base_url}/metrics", timeout=5) as response:
+            text = response.read().decode('utf-8')
+        pattern = r'^tutor_coalesced_requests_total\S* (\S+)$'
+        coalesced = sum(float(value) for value in re.findall(pattern, text, re.M))
+    finally:
+        process.terminate()
+        process.wait()
+        mock.stop()
+
+    latencies = [seconds for seconds, ok in results if ok]
+    print(
+        f"requests={args.requests} clients={1 if args.batch else args.clients} "
+        f"concurrency={args.concurrency} students={args.students} "
+        f"duplicates={args.duplicate_ratio} mode={'batch' if args.batch else 'single'}"
+    )
+    print(f"ok: {len(latencies)}/{len(results)}")
+    print(f"throughput: {len(latencies) / elapsed:.2f} req/s ({elapsed:.1f}s)")
+    print(
+        f"latency p50={percentile(latencies, 0.5):.2f}s "
+        f"p95={percentile(latencies, 0.95):.2f}s p99={percentile(latencies, 0.99):.2f}s"
+    )
+    print(f"coalesced: {coalesced:g}, LLM requests: {mock.stats['requests']}")
+
+
+if __name__ == "__main__":
+    main()
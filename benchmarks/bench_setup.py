@@ -0,0 +1,60 @@
+"""
+Benchmark the per-problem setup overhead of the crew.
+
+Compares building a new Application (Config, LLM client, agents, tasks and
+crew) for every problem, as main.py used to do, with borrowing a warm
+application from an ApplicationPool. No LLM requests are made.
+
+Usage:
+    python benchmarks/bench_setup.py --problems 50 --students 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.application import Application  # noqa: E402
+from app.application_pool import ApplicationPool  # noqa: E402
+from enums.llm_type import LLMType  # noqa: E402
+from utils.load_env import load_env  # noqa: E402
+
+
+def per_problem(problems: int, students: int) -> float:
+    start = time.perf_counter()
+    for _ in range(problems):
+        # Config() used to walk the filesystem for .env on every problem
+        load_env.__wrapped__()
+        app = Application(llm_type=LLMType.LOCAL)
+        app.setup(total_students=students)
+    return time.perf_counter() - start
+
+
+def pooled(problems: int, students: int) -> float:
+    start = time.perf_counter()
+    pool = ApplicationPool(llm_type=LLMType.LOCAL, total_students=students)
+    for _ in range(problems):
+        with pool.acquire():
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crew setup benchmark')
+    parser.add_argument('--problems', type=int, default=50)
+    parser.add_argument('--students', type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOCAL_MODEL", "ollama/benchmark")
+
+    before = per_problem(args.problems, args.students)
+    after = pooled(args.problems, args.students)
+
+    print(f"problems={args.problems} students={args.students}")
+    print(f"per-problem setup: {before / args.problems * 1000:.2f} ms/problem")
+    print(f"pooled setup:      {after / args.problems * 1000:.2f} ms/problem")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark end-to-end throughput of main.py against the mock LLM server.
+
+Generates a synthetic problem CSV, starts benchmarks/mock_llm_server.py in
+process and runs main.py once per scenario, sweeping the number of students,
+the concurrency and the HTML converter. Reports problems per minute, the
+p50/p95/p99 latency of a problem (from the metrics file of the run) and the
+requests served and rejected by the mock server. No API calls are made; the
+converter scenarios need Chrome and Tesseract.
+
+Usage:
+    python benchmarks/bench_throughput.py --problems 30 --students 3,10 \\
+        --concurrency 1,4 --converter off,on --latency lognormal:-0.7,0.5
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_llm_server import MockLLMServer  # noqa: E402
+from benchmarks.synthetic_csv import write_csv  # noqa: E402
+from utils.metrics import percentile  # noqa: E402
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(',')]
+
+
+def run_scenario(args, server, csv_path, students, concurrency, converter) -> dict:
+    """Run main.py on the synthetic CSV and collect its throughput and latencies."""
+    workdir = tempfile.mkdtemp(prefix='bench_throughput_')
+    metrics_path = os.path.join(workdir, 'metrics.jsonl')
+    command = [
+        sys.executable, os.path.join(ROOT, 'main.py'),
+        '--llm', 'OPENAI',
+        '--file', csv_path,
+        '--students', str(students),
+        '--concurrency', str(concurrency),
+        '--metrics-file', metrics_path,
+        *args.main_args.split(),
+    ]
+    if converter:
+        command.append('--enable-converter')
+
+    env = {
+        **os.environ,
+        'OPENAI_BASE_URL': f"{server.base_url}/v1",
+        'OPENAI_API_KEY': 'mock',
+        'OPENAI_MODEL': args.model,
+    }
+    before = dict(server.stats)
+    start = time.perf_counter()
+    completed = subprocess.run(
+        command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies, done = [], 0
+    if os.path.exists(metrics_path):
+        with open(metrics_path, encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                done += record['status'] == 'done'
+                wall = record['stages'].get('problem', {}).get('wall')
+                if wall is not None:
+                    latencies.append(wall)
+    if completed.returncode and not done:
+        print(completed.stderr[-2000:], file=sys.stderr)
+
+    return {
+        'students': students,
+        'concurrency': concurrency,
+        'converter': 'on' if converter else 'off',
+        'done': done,
+        'per_minute': done / elapsed * 60,
+        'p50': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'requests': server.stats['requests'] - before['requests'],
+        'rejected': server.stats['rejected'] - before['rejected'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end throughput benchmark')
+    parser.add_argument('--problems', type=int, default=30)
+    parser.add_argument('--students', type=_int_list, default=[3, 10])
+    parser.add_argument('--concurrency', type=_int_list, default=[1, 4])
+    parser.add_argument('--converter', type=str, default='off',
+                        help='Comma-separated converter settings to sweep (off,on)')
+    parser.add_argument('--html-ratio', type=float, default=0.5)
+    parser.add_argument('--visual-ratio', type=float, default=0.1)
+    parser.add_argument('--latency', type=str, default='lognormal:-0.7,0.5',
+                        help='Mock time to first token distribution')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--completion-tokens', type=int, default=300)
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Share of mock requests rejected with 429')
+    parser.add_argument('--model', type=str, default='gpt-4o-mini',
+                        help='Model name sent to the mock server')
+    parser.add_argument('--main-args', type=str, default='',
+                        help='Extra arguments for main.py, e.g. "--student-mode ensemble"')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    ).start()
+    csv_path = os.path.join(tempfile.mkdtemp(prefix='bench_csv_'), 'problems.csv')
+    write_csv(csv_path, args.problems, args.html_ratio, args.visual_ratio, args.seed)
+
+    converters = [setting.strip() == 'on' for setting in args.converter.split(',')]
+    print(
+        f"problems={args.problems} latency={args.latency} "
+        f"tokens/s={args.tokens_per_second} error_rate={args.error_rate}"
+    )
+    print(
+        f"{'students':>8} {'conc':>5} {'conv':>5} {'done':>5} {'prob/min':>9} "
+        f"{'p50':>7} {'p95':>7} {'p99':>7} {'reqs':>6} {'429s':>5}"
+    )
+    try:
+        for students, concurrency, converter in itertools.product(
+                args.students, args.concurrency, converters):
+            row = run_scenario(args, server, csv_path, students, concurrency, converter)
+            print(
+                f"{row['students']:>8} {row['concurrency']:>5} {row['converter']:>5} "
+                f"{row['done']:>5} {row['per_minute']:>9.1f} "
+                f"{row['p50']:>6.2f}s {row['p95']:>6.2f}s {row['p99']:>6.2f}s "
+                f"{row['requests']:>6} {row['rejected']:>5}",
+                flush=True,
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
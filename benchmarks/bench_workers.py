@@ -0,0 +1,124 @@
+"""
+Benchmark scaling of main.py worker processes sharing a work queue.
+
+Generates a synthetic problem CSV, starts benchmarks/mock_llm_server.py in
+process and, for every worker count, starts that many main.py processes on
+one SQLite work queue (--queue). Reports problems per minute, the speedup
+over one worker and the scaling efficiency, and checks that the merged
+results of the run hold every problem exactly once. No API calls are made.
+
+Usage:
+    python benchmarks/bench_workers.py --problems 64 --workers 1,2,4,8,16 \\
+        --latency lognormal:-0.7,0.5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_llm_server import MockLLMServer  # noqa: E402
+from benchmarks.synthetic_csv import write_csv  # noqa: E402
+from utils.results_store import ResultsStore  # noqa: E402
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(',')]
+
+
+def run_workers(args, server, csv_path, workers) -> dict:
+    """Run the workers on one queue until it is drained and read the merged results."""
+    workdir = tempfile.mkdtemp(prefix='bench_workers_')
+    command = [
+        sys.executable, os.path.join(ROOT, 'main.py'),
+        '--llm', 'OPENAI',
+        '--file', csv_path,
+        '--students', str(args.students),
+        '--concurrency', str(args.concurrency),
+        '--queue', os.path.join(workdir, 'queue.db'),
+        '--run-id', 'bench',
+        '--metrics-file', os.path.join(workdir, 'metrics.jsonl'),
+        *args.main_args.split(),
+    ]
+    env = {
+        **os.environ,
+        'OPENAI_BASE_URL': f"{server.base_url}/v1",
+        'OPENAI_API_KEY': 'mock',
+        'OPENAI_MODEL': args.model,
+    }
+    start = time.perf_counter()
+    processes = [
+        subprocess.Popen(
+            command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        _, stderr = process.communicate()
+        if process.returncode:
+            print(stderr[-2000:], file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    results_dir = os.path.join(workdir, 'output', 'results')
+    copies = Counter(
+        record['item_id'] for record in ResultsStore.iter_records(results_dir, 'bench'))
+    return {
+        'workers': workers,
+        'done': len(copies),
+        'duplicates': sum(count - 1 for count in copies.values()),
+        'per_minute': len(copies) / elapsed * 60,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker scaling benchmark')
+    parser.add_argument('--problems', type=int, default=64)
+    parser.add_argument('--workers', type=_int_list, default=[1, 2, 4, 8, 16])
+    parser.add_argument('--students', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Concurrency of each worker')
+    parser.add_argument('--latency', type=str, default='lognormal:-0.7,0.5',
+                        help='Mock time to first token distribution')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--completion-tokens', type=int, default=300)
+    parser.add_argument('--model', type=str, default='gpt-4o-mini',
+                        help='Model name sent to the mock server')
+    parser.add_argument('--main-args', type=str, default='',
+                        help='Extra arguments for main.py, e.g. "--student-mode ensemble"')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        seed=args.seed,
+    ).start()
+    csv_path = os.path.join(tempfile.mkdtemp(prefix='bench_csv_'), 'problems.csv')
+    write_csv(csv_path, args.problems, html_ratio=0.0, visual_ratio=0.0, seed=args.seed)
+
+    print(f"problems={args.problems} students={args.students} latency={args.latency}")
+    print(f"{'workers':>7} {'done':>5} {'dups':>5} {'prob/min':>9} {'speedup':>8} {'eff':>6}")
+    baseline = None
+    try:
+        for workers in args.workers:
+            row = run_workers(args, server, csv_path, workers)
+            baseline = baseline or row['per_minute'] / row['workers']
+            speedup = row['per_minute'] / baseline if baseline else 0.0
+            print(
+                f"{row['workers']:>7} {row['done']:>5} {row['duplicates']:>5} "
+                f"{row['per_minute']:>9.1f} {speedup:>7.2f}x {speedup / workers:>6.0%}",
+                flush=True,
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
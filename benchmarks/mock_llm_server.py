@@ -0,0 +1,282 @@
+"""
+Local stand-in for OpenAI and Ollama chat APIs, for benchmarks without API costs.
+
+Serves /v1/chat/completions (OpenAI, with n unless --ignore-n), /api/chat
+and /api/generate (Ollama). Every response waits for a time to first token
+drawn from a latency distribution plus the completion length at a fixed
+token rate, and a share of requests can be rejected with 429 errors. Student prompts get a
+solution with a "# Final Answer" section, other prompts a verification.
+
+Point the application at it with OPENAI_BASE_URL=http://127.0.0.1:PORT/v1
+(and any OPENAI_API_KEY), or LOCAL_BASE_URL=http://127.0.0.1:PORT.
+
+Usage:
+    python benchmarks/mock_llm_server.py --port 8089 --latency lognormal:-0.7,0.5
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SOLUTION = (
+    "# Understanding\n"
+    "* What I know: the values given in the problem\n"
+    "* What I need to find: the requested value\n\n"
+    "# Solution Steps\n"
+    "1. Step 1\n"
+    "   * Work: {filler}\n"
+    "   * Because: this follows from the problem statement\n\n"
+    "# Final Answer\n"
+    "* The answer is: {answer}\n"
+    "* This makes sense because: it satisfies the problem\n"
+)
+VERIFICATION = (
+    "# Verification Results\n"
+    "* Number of solutions checked: {students}\n"
+    "* Correct solutions found: yes\n\n"
+    "# Analysis\n"
+    "* Student answers reviewed: {filler}\n\n"
+    "# Conclusion\n"
+    "* Correct solution found: yes\n"
+)
+
+
+def parse_distribution(spec: str):
+    """
+    Parse a latency distribution in seconds.
+
+    Accepts const:S, uniform:LOW,HIGH, exp:MEAN and lognormal:MU,SIGMA.
+    """
+    kind, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(',') if value]
+    match kind:
+        case 'const':
+            return lambda rng: values[0]
+        case 'uniform':
+            return lambda rng: rng.uniform(values[0], values[1])
+        case 'exp':
+            return lambda rng: rng.expovariate(1 / values[0])
+        case 'lognormal':
+            return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockLLMServer:
+    """Threaded HTTP server answering chat requests with canned completions."""
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: str = 'const:0.2',
+        tokens_per_second: float = 50.0,
+        completion_tokens: int = 300,
+        error_rate: float = 0.0,
+        answers: str = '12,12,12,13',
+        seed: int = None,
+        ignore_n: bool = False,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            port: Port to listen on (0 picks a free port)
+            latency: Time to first token distribution (see parse_distribution)
+            tokens_per_second: Generation speed of the completion
+            completion_tokens: Approximate length of each completion
+            error_rate: Share of requests rejected with 429 Too Many Requests
+            answers: Final answers the students pick from
+            seed: Random seed for reproducible runs
+            ignore_n: Return a single choice whatever n is requested, like
+                some OpenAI-compatible servers
+        """
+        self.latency = parse_distribution(latency)
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.answers = answers.split(',')
+        self.ignore_n = ignore_n
+        self.stats = {'requests': 0, 'rejected': 0, 'choices': 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> 'MockLLMServer':
+        """Serve from a daemon thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def complete(self, messages: list, n: int = 1):
+        """
+        Wait like a real model and return n completions, or None for a 429.
+
+        Returns:
+            tuple: (list of texts, prompt tokens, completion tokens per text)
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+            rejected = self._rng.random() < self.error_rate
+            if rejected:
+                self.stats['rejected'] += 1
+                return None
+            self.stats['choices'] += n
+            delay = self.latency(self._rng)
+            answers = [self._rng.choice(self.answers) for _ in range(n)]
+
+        time.sleep(delay + self.completion_tokens / self.tokens_per_second)
+
+        prompt = "\n".join(str(message.get('content', '')) for message in messages)
+        filler = " ".join(["work"] * max(1, self.completion_tokens - 60))
+        if "Student Solutions" in prompt:
+            students = prompt.count("Student ") or 1
+            texts = [VERIFICATION.format(students=students, filler=filler)] * n
+        else:
+            texts = [SOLUTION.format(answer=answer, filler=filler) for answer in answers]
+        return texts, len(prompt) // 4, self.completion_tokens
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if self.path == '/stats':
+                    self._send(200, server.stats)
+                elif self.path in ('/', '/api/tags', '/v1/models'):
+                    self._send(200, {'models': [], 'data': []})
+                else:
+                    self._send(404, {'error': 'not found'})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if self.path.endswith('/chat/completions'):
+                    self._openai(body)
+                elif self.path == '/api/chat':
+                    self._ollama(body, chat=True)
+                elif self.path == '/api/generate':
+                    self._ollama(body, chat=False)
+                else:
+                    self._send(404, {'error': 'not found'})
+
+            def _openai(self, body):
+                n = 1 if server.ignore_n else int(body.get('n') or 1)
+                result = server.complete(body.get('messages', []), n)
+                if result is None:
+                    self._send(429, {'error': {
+                        'message': 'Rate limit reached', 'type': 'rate_limit_error',
+                        'code': 'rate_limit_exceeded',
+                    }}, {'Retry-After': '1'})
+                    return
+                texts, prompt_tokens, completion_tokens = result
+                self._send(200, {
+                    'id': f"chatcmpl-{uuid.uuid4().hex}",
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': body.get('model', 'mock'),
+                    'choices': [
+                        {
+                            'index': index,
+                            'message': {'role': 'assistant', 'content': text},
+                            'finish_reason': 'stop',
+                        }
+                        for index, text in enumerate(texts)
+                    ],
+                    'usage': {
+                        'prompt_tokens': prompt_tokens,
+                        'completion_tokens': completion_tokens * len(texts),
+                        'total_tokens': prompt_tokens + completion_tokens * len(texts),
+                    },
+                })
+
+            def _ollama(self, body, chat):
+                messages = body.get('messages') or [{'content': body.get('prompt', '')}]
+                result = server.complete(messages)
+                if result is None:
+                    self._send(429, {'error': 'rate limit exceeded'}, {'Retry-After': '1'})
+                    return
+                texts, prompt_tokens, completion_tokens = result
+                response = {
+                    'model': body.get('model', 'mock'),
+                    'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                    'done': True,
+                    'done_reason': 'stop',
+                    'prompt_eval_count': prompt_tokens,
+                    'eval_count': completion_tokens,
+                }
+                if chat:
+                    response['message'] = {'role': 'assistant', 'content': texts[0]}
+                else:
+                    response['response'] = texts[0]
+                # A streamed response is a single NDJSON chunk marked done
+                self._send(200, response, content_type=(
+                    'application/x-ndjson' if body.get('stream') else 'application/json'))
+
+            def _send(self, status, payload, headers=None, content_type='application/json'):
+                data = json.dumps(payload).encode('utf-8')
+                if content_type == 'application/x-ndjson':
+                    data += b'\n'
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock OpenAI/Ollama server')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=str, default='const:0.2',
+                        help='Time to first token: const:S, uniform:A,B, exp:MEAN, lognormal:MU,SIGMA')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--completion-tokens', type=int, default=300)
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Share of requests rejected with 429')
+    parser.add_argument('--ignore-n', action='store_true',
+                        help='Return a single choice whatever n is requested')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        port=args.port,
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        ignore_n=args.ignore_n,
+    )
+    print(f"Mock LLM server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
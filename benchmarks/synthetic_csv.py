@@ -0,0 +1,120 @@
+"""
+Generate a synthetic problem CSV in the format read by CSVReader.
+
+Every item has a description holding the question and four options, one of
+them correct, spread over one row with the item_id and three continuation rows
+with an empty item_id. Problems are plain text, simple HTML that is
+extracted directly, or visual HTML (SVG figures) that is rendered and OCR'd.
+
+Usage:
+    python benchmarks/synthetic_csv.py --problems 100 --html-ratio 0.5 \\
+        --visual-ratio 0.1 --output /tmp/synthetic.csv
+"""
+import argparse
+import csv
+import random
+
+FIELDS = (
+    'item_id',
+    'item_description',
+    'question_content',
+    'options',
+    'correct_option',
+    'explanation',
+)
+
+
+def synthetic_item(index: int, rng: random.Random, kind: str) -> list[dict]:
+    """Build the CSV rows of one item of the given kind (plain, html or visual)."""
+    a, b, c = rng.randint(2, 30), rng.randint(2, 99), rng.randint(2, 9)
+    answer = a * a - b
+    wrong = rng.sample([answer + d for d in (-10, -2, -1, 1, 2, 10)], 3)
+    options = [answer] + wrong
+    rng.shuffle(options)
+
+    if kind == 'plain':
+        description = f"次の計算をしなさい。x = {a} のとき"
+        question = f"x^2 - {b} の値を求めなさい。"
+        format_option = str
+    else:
+        rows = "".join(
+            f"<tr><td>{x}</td><td>{x * c}</td></tr>" for x in range(1, rng.randint(3, 6))
+        )
+        description = (
+            f"<p>次の表は、<i>x</i> と <i>y</i> の関係を表しています。</p>"
+            f"<table border='1'><tr><th>x</th><th>y</th></tr>{rows}</table>"
+        )
+        if kind == 'visual':
+            description += (
+                "<svg width='120' height='60'><rect x='5' y='5' width='110' "
+                f"height='50' fill='none' stroke='black'/><text x='50' y='35'>{a}</text></svg>"
+            )
+        question = f"<p><i>x</i> = {a} のとき、<i>x</i><sup>2</sup> − {b} の値を求めなさい。</p>"
+
+        def format_option(value):
+            return f"<p>{value}</p>"
+
+    # Single-question items are read from item_description alone
+    description += question
+
+    rows = []
+    for position, option in enumerate(options):
+        first = position == 0
+        rows.append({
+            'item_id': f"synthetic{index:05d}" if first else '',
+            'item_description': description if first else '',
+            'question_content': question if first else '',
+            'options': format_option(option),
+            'correct_option': 'TRUE' if option == answer else 'FALSE',
+            'explanation': f"{a}^2 - {b} = {answer}" if first else '',
+        })
+    return rows
+
+
+def write_csv(
+    path: str,
+    problems: int,
+    html_ratio: float = 0.5,
+    visual_ratio: float = 0.1,
+    seed: int = 0,
+):
+    """
+    Write a synthetic problem CSV.
+
+    Args:
+        path: Output file
+        problems: Number of problems
+        html_ratio: Share of problems written in HTML
+        visual_ratio: Share of problems with an SVG figure that needs OCR
+        seed: Random seed
+    """
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for index in range(problems):
+            draw = rng.random()
+            if draw < visual_ratio:
+                kind = 'visual'
+            elif draw < visual_ratio + html_ratio:
+                kind = 'html'
+            else:
+                kind = 'plain'
+            writer.writerows(synthetic_item(index, rng, kind))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic problem CSV generator')
+    parser.add_argument('--problems', type=int, default=100)
+    parser.add_argument('--html-ratio', type=float, default=0.5)
+    parser.add_argument('--visual-ratio', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default='synthetic_problems.csv')
+    args = parser.parse_args()
+
+    write_csv(args.output, args.problems, args.html_ratio, args.visual_ratio, args.seed)
+    print(f"Wrote {args.problems} problems to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,170 @@
 import os
+import threading
 
-from crewai import LLM
-
+from config.tutor_llm import TutorLLM
+from enums.cache_mode import CacheMode
+from enums.llm_type import LLMType
+from utils.endpoint_balancer import EndpointBalancer, share_http_connections
 from utils.load_env import load_env
+from utils.near_duplicates import NearDuplicateIndex
+from utils.rate_limiter import RateLimiter
+from utils.sqlite_cache import SQLiteCache
 
 
 class Config:
     """Centralized configuration for LLM and memory setting."""
-    def __init__(self):
+    def __init__(self, cache_mode: CacheMode = CacheMode.OFF):
         load_env()
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.openai_model = os.getenv("OPENAI_MODEL")
+        # Any OpenAI-compatible endpoint, e.g. benchmarks/mock_llm_server.py
+        self.openai_base_url = os.getenv("OPENAI_BASE_URL") or None
         self.google_api_key = os.getenv("GOOGLE_API_KEY")
         self.google_model = os.getenv("GOOGLE_MODEL")
         self.google_embedder_model = os.getenv("GOOGLE_EMBEDDER_MODEL")
         self.local_model = os.getenv("LOCAL_MODEL")
+        self.local_base_url = os.getenv("LOCAL_BASE_URL") or "http://localhost:11434"
+        self.local_endpoints = os.getenv("LOCAL_ENDPOINTS") or None
+        self._local_balancer = None
+        self._local_balancer_lock = threading.Lock()
         max_rpm = os.getenv("MAX_RPM")
         self.max_rpm = int(max_rpm) if max_rpm is not None else None
+        max_tpm = os.getenv("MAX_TPM")
+        self.max_tpm = int(max_tpm) if max_tpm else None
+        self.rate_limit_dir = os.getenv("RATE_LIMIT_DIR") or None
+        self.llm_timeout = float(os.getenv("LLM_TIMEOUT") or 120)
+        self.llm_max_retries = int(os.getenv("LLM_MAX_RETRIES") or 3)
+        hedge_percentile = os.getenv("LLM_HEDGE_PERCENTILE")
+        self.llm_hedge_percentile = float(hedge_percentile) / 100 if hedge_percentile else None
+        self.llm_hedge_provider = os.getenv("LLM_HEDGE_PROVIDER") or None
+        self._hedge_llm = None
+        self._hedge_llm_lock = threading.RLock()
+        self.cache_mode = cache_mode
+        self.llm_cache_path = os.getenv("LLM_CACHE_PATH") or ".cache/llm_cache.sqlite"
+        self.llm_cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES") or 100000)
+        self.llm_cache_max_bytes = int(os.getenv("LLM_CACHE_MAX_MB") or 1024) * 1024 * 1024
+        self.llm_cache_max_age = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS") or 30) * 86400
+        self._llm_cache = None
+        self._llm_cache_lock = threading.Lock()
+        self.ocr_cache_path = os.getenv("OCR_CACHE_PATH") or ".cache/ocr_cache.sqlite"
+        self.ocr_cache_max_entries = int(os.getenv("OCR_CACHE_MAX_ENTRIES") or 50000)
+        self.near_duplicate_path = (
+            os.getenv("NEAR_DUPLICATE_PATH") or ".cache/near_duplicates.sqlite")
+
+    def get_llm_cache(self) -> SQLiteCache | None:
+        """Get the LLM response cache shared by all LLMs, or None if disabled."""
+        if self.cache_mode is CacheMode.OFF:
+            return None
+        with self._llm_cache_lock:
+            if self._llm_cache is None:
+                self._llm_cache = SQLiteCache(
+                    self.llm_cache_path,
+                    max_entries=self.llm_cache_max_entries,
+                    max_bytes=self.llm_cache_max_bytes,
+                    max_age=self.llm_cache_max_age,
+                )
+        return self._llm_cache
+
+    def get_ocr_cache(self) -> SQLiteCache:
+        """Get a cache of OCR'd text with least-recently-used eviction."""
+        return SQLiteCache(
+            self.ocr_cache_path,
+            max_entries=self.ocr_cache_max_entries,
+        )
+
+    def get_near_duplicate_index(
+        self, threshold: float = 0.9, scope: dict = None
+    ) -> NearDuplicateIndex:
+        """Get the index of solved problems reused for near-duplicates within scope."""
+        return NearDuplicateIndex(self.near_duplicate_path, threshold=threshold, scope=scope)
+
+    def get_model(self, llm_type: LLMType) -> str | None:
+        """Get the model configured for an LLM type."""
+        return {
+            LLMType.GOOGLE: self.google_model,
+            LLMType.OPENAI: self.openai_model,
+            LLMType.LOCAL: self.local_model,
+        }[llm_type]
+
+    def get_rate_limiter(self, model: str) -> RateLimiter | None:
+        """Get the rate limiter shared by every LLM calling model."""
+        if not self.max_rpm and not self.max_tpm:
+            return None
+        return RateLimiter.shared(
+            model,
+            rpm=self.max_rpm,
+            tpm=self.max_tpm,
+            state_dir=self.rate_limit_dir,
+        )
+
+    def get_local_balancer(self) -> EndpointBalancer | None:
+        """Get the balancer over LOCAL_ENDPOINTS, or None for a single server."""
+        if not self.local_endpoints:
+            return None
+        with self._local_balancer_lock:
+            if self._local_balancer is None:
+                self._local_balancer = EndpointBalancer.parse(self.local_endpoints)
+        return self._local_balancer
+
+    def get_hedge_llm(self):
+        """Get the LLM of LLM_HEDGE_PROVIDER receiving hedged requests, if set."""
+        if self.llm_hedge_percentile is None or not self.llm_hedge_provider:
+            return None
+        with self._hedge_llm_lock:
+            if self._hedge_llm is None:
+                # Marks the hedge LLM as being built, its own requests are not hedged
+                self._hedge_llm = False
+                match LLMType[self.llm_hedge_provider]:
+                    case LLMType.OPENAI:
+                        self._hedge_llm = self.get_openai_llm()
+                    case LLMType.GOOGLE:
+                        self._hedge_llm = self.get_google_llm()
+                    case LLMType.LOCAL:
+                        self._hedge_llm = self.get_local_llm()
+        return self._hedge_llm or None
 
-    def get_google_llm(self):
+    def _llm_options(self, model: str, sample_index: int | None) -> dict:
+        share_http_connections()
+        hedge_llm = self.get_hedge_llm()
+        # Set while the hedge LLM itself is being built
+        building_hedge = self._hedge_llm is False
+        return {
+            "cache": self.get_llm_cache(),
+            "cache_mode": self.cache_mode,
+            "sample_index": sample_index,
+            "rate_limiter": self.get_rate_limiter(model),
+            "timeout": self.llm_timeout,
+            "max_retries": self.llm_max_retries,
+            "hedge_percentile": None if building_hedge else self.llm_hedge_percentile,
+            "hedge_llm": hedge_llm,
+        }
+
+    def get_google_llm(self, sample_index: int = None):
         if self.google_api_key is None:
             raise ValueError("GOOGLE_API_KEY is not set")
         if self.google_model is None:
             raise ValueError("GOOGLE_MODEL is not set")
 
-        return LLM(
+        return TutorLLM(
             model=self.google_model,
             api_key=self.google_api_key,
             temperature=1.0,
+            **self._llm_options(self.google_model, sample_index),
         )
 
-    def get_openai_llm(self):
+    def get_openai_llm(self, sample_index: int = None):
         if self.openai_api_key is None:
             raise ValueError("OPENAI_API_KEY is not set")
         if self.openai_model is None:
             raise ValueError("OPENAI_MODEL is not set")
 
-        return LLM(
+        return TutorLLM(
             model=self.openai_model,
             api_key=self.openai_api_key,
+            base_url=self.openai_base_url,
             temperature=1.0,
-       )
+            **self._llm_options(self.openai_model, sample_index),
+        )
 
     def get_google_embedder(self):
         if self.google_api_key is None and self.google_embedder_model is None:
@@ -59,16 +183,23 @@ class Config:
             },
         }
 
-    def get_local_llm(self):
+    def get_local_llm(self, sample_index: int = None):
         if self.local_model is None:
             raise ValueError("LOCAL_MODEL is not set")
 
-        return LLM(
+        balancer = self.get_local_balancer()
+        return TutorLLM(
             model=self.local_model,
-            base_url="http://localhost:11434",
+            base_url=balancer.endpoints[0].url if balancer else self.local_base_url,
+            balancer=balancer,
             temperature=1.0,
+            **self._llm_options(self.local_model, sample_index),
         )
 
     def get_max_rpm(self) -> int | None:
         """Get the configured max RPM value or None if not set."""
         return self.max_rpm
+
+    def get_max_tpm(self) -> int | None:
+        """Get the configured max TPM value or None if not set."""
+        return self.max_tpm
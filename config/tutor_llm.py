@@ -0,0 +1,393 @@
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Union
+
+from crewai import LLM
+
+from enums.cache_mode import CacheMode
+from utils.endpoint_balancer import EndpointBalancer
+from utils.hedging import LatencyTracker, backoff_delay, first_completed, is_retryable
+from utils.metrics import bind_context, metrics
+from utils.rate_limiter import RateLimiter
+from utils.sqlite_cache import SQLiteCache
+
+
+class TutorLLM(LLM):
+    """LLM with a response cache, a shared rate limiter, retries and hedging."""
+
+    # Completion size assumed when reserving tokens if max_tokens is not set
+    DEFAULT_COMPLETION_TOKENS = 1024
+
+    # Sampling parameters that change the response and belong in the cache key
+    SAMPLING_PARAMS = (
+        "temperature",
+        "top_p",
+        "n",
+        "stop",
+        "max_tokens",
+        "max_completion_tokens",
+        "presence_penalty",
+        "frequency_penalty",
+        "seed",
+        "response_format",
+    )
+
+    def __init__(
+        self,
+        *args,
+        cache: SQLiteCache = None,
+        cache_mode: CacheMode = CacheMode.OFF,
+        sample_index: int = None,
+        rate_limiter: RateLimiter = None,
+        balancer: EndpointBalancer = None,
+        max_retries: int = 0,
+        hedge_percentile: float = None,
+        hedge_llm: 'TutorLLM' = None,
+        **kwargs,
+    ):
+        """
+        Initialize the LLM.
+
+        Args:
+            cache: Response cache shared by all LLMs of a run
+            cache_mode: How the cache is used (see CacheMode)
+            sample_index: Index of the student using this LLM. Responses are
+                sampled at temperature 1.0, so each student keeps its own
+                cached response.
+            rate_limiter: Requests and tokens per minute budget shared by
+                every LLM calling the same model
+            balancer: Picks the server of each request among several
+                endpoints serving the model
+            max_retries: Retries of a request failing with a rate limit,
+                timeout or server error, with exponential backoff
+            hedge_percentile: Latency percentile (e.g. 0.95) of the model
+                after which the request is also sent to hedge_llm, or to
+                another endpoint; None disables hedging
+            hedge_llm: LLM receiving hedged requests, defaults to this one
+        """
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+        self.cache_mode = cache_mode
+        self.sample_index = sample_index
+        self.rate_limiter = rate_limiter
+        self.balancer = balancer
+        self.max_retries = max_retries
+        self.hedge_percentile = hedge_percentile
+        self.hedge_llm = hedge_llm
+        self.latency = LatencyTracker.shared(self.model)
+        self._endpoint_lock = threading.Lock()
+
+    def cache_key(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        sample_index: int = None,
+    ) -> str:
+        """
+        Return the cache key of a request for the given messages.
+
+        Args:
+            messages: Messages of the request
+            sample_index: Student the response is sampled for, defaults to
+                the sample_index of the LLM
+        """
+        messages_hash = hashlib.sha256(
+            json.dumps(messages, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+        params: Dict[str, Any] = {
+            name: getattr(self, name, None) for name in self.SAMPLING_PARAMS
+        }
+        params["sample_index"] = (
+            self.sample_index if sample_index is None else sample_index)
+        return hashlib.sha256(
+            json.dumps(
+                {"model": self.model, "messages": messages_hash, "params": params},
+                sort_keys=True,
+                default=str,
+            ).encode('utf-8')
+        ).hexdigest()
+
+    def call(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        tools: List[dict] = None,
+        callbacks: List[Any] = None,
+        available_functions: Dict[str, Any] = None,
+    ) -> str:
+        # Tool calls have side effects, so they are never served from the cache
+        use_cache = (
+            self.cache is not None
+            and self.cache_mode is not CacheMode.OFF
+            and not tools
+        )
+
+        if use_cache:
+            key = self.cache_key(messages)
+            if self.cache_mode in (CacheMode.READ, CacheMode.REPLAY):
+                response = self.cache.get(key)
+                if response is not None:
+                    metrics.count('cache_hits')
+                    return response
+                metrics.count('cache_misses')
+                if self.cache_mode is CacheMode.REPLAY:
+                    raise LookupError(
+                        f"No cached response for model {self.model} in replay mode"
+                    )
+
+        response = self._limited_call(messages, tools, callbacks, available_functions)
+        if use_cache and response:
+            self.cache.set(key, response)
+        return response
+
+    def _limited_call(self, messages, tools, callbacks, available_functions) -> str:
+        """Call the model once the shared rate budget allows it."""
+        prompt_tokens = self.count_tokens(messages)
+        reserved = prompt_tokens + (self.max_tokens or self.DEFAULT_COMPLETION_TOKENS)
+
+        if tools or self.hedge_percentile is None:
+            response = self._with_retries(
+                lambda: self._timed(
+                    self._call_endpoint, messages, tools, callbacks, available_functions),
+                reserved,
+            )
+        else:
+            # Sent with litellm directly so that a request and its hedge can
+            # be in flight without sharing the endpoint state of the instance.
+            # The callbacks are passed on so the agent still counts the tokens.
+            if isinstance(messages, str):
+                messages = [{"role": "user", "content": messages}]
+            hedge_llm = self.hedge_llm or self
+            response = self._with_retries(
+                lambda: first_completed(
+                    lambda: self._timed(self._complete_text, messages, callbacks),
+                    lambda: hedge_llm._hedge_request(messages, reserved, callbacks),
+                    self.latency.percentile(self.hedge_percentile),
+                ),
+                reserved,
+            )
+
+        completion_tokens = self.count_tokens(response)
+        self._record_request(prompt_tokens, completion_tokens)
+        if self.rate_limiter is not None:
+            self.rate_limiter.record_usage(reserved, prompt_tokens + completion_tokens)
+        return response
+
+    def _with_retries(self, request, reserved: int):
+        """
+        Send a request within the rate budget, retrying transient failures.
+
+        Every attempt, retries included, takes its share of the budget, and
+        the tokens of a failed attempt are given back.
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                metrics.add_wait(self.rate_limiter.acquire(reserved))
+            try:
+                return request()
+            except Exception as e:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.record_usage(reserved, 0)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                metrics.count('retries')
+                time.sleep(backoff_delay(attempt, e))
+                attempt += 1
+
+    def _timed(self, request, *args, **kwargs):
+        """
+        Send a request and record its latency for the hedging percentile.
+
+        Only primary requests are recorded, including ones that lose to
+        their hedge, so hedging does not lower its own threshold.
+        """
+        start = time.perf_counter()
+        result = request(*args, **kwargs)
+        self.latency.record(time.perf_counter() - start)
+        return result
+
+    def _hedge_request(
+        self,
+        messages: List[Dict[str, str]],
+        reserved: int,
+        callbacks: List[Any] = None,
+    ) -> str:
+        """
+        Send a hedged copy of a request, within this LLM's rate budget.
+
+        The hedge settles its reservation with its actual usage, whether it
+        wins or finishes in the background after losing.
+        """
+        if self.rate_limiter is not None:
+            metrics.add_wait(self.rate_limiter.acquire(reserved))
+        try:
+            response = self._complete(messages, callbacks=callbacks)
+        except Exception:
+            if self.rate_limiter is not None:
+                self.rate_limiter.record_usage(reserved, 0)
+            raise
+
+        text = response.choices[0].message.content or ""
+        if self.rate_limiter is not None:
+            self.rate_limiter.record_usage(
+                reserved, sum(self._usage(messages, response, [text])))
+        return text
+
+    def _complete_text(self, messages: List[Dict[str, str]], callbacks: List[Any] = None) -> str:
+        return self._complete(messages, callbacks=callbacks).choices[0].message.content or ""
+
+    def _usage(self, messages, response, texts: List[str]):
+        """Return the prompt and completion tokens of a response, counted if not reported."""
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or self.count_tokens(messages)
+        completion_tokens = getattr(usage, "completion_tokens", None) or sum(
+            self.count_tokens(text) for text in texts)
+        return prompt_tokens, completion_tokens
+
+    def _call_endpoint(self, messages, tools, callbacks, available_functions) -> str:
+        """Call the model on the endpoint picked by the balancer, if any."""
+        if self.balancer is None:
+            return super().call(messages, tools, callbacks, available_functions)
+
+        # The base URL is read from the instance, so calls of one LLM are serialized
+        with self._endpoint_lock, self.balancer.acquire() as url:
+            self.base_url = self.api_base = url
+            return super().call(messages, tools, callbacks, available_functions)
+
+    @staticmethod
+    def _record_request(prompt_tokens: int, completion_tokens: int):
+        metrics.count('llm_requests')
+        metrics.count('prompt_tokens', prompt_tokens)
+        metrics.count('completion_tokens', completion_tokens)
+
+    def count_tokens(self, content: Union[str, List[Dict[str, str]], None]) -> int:
+        """Count the tokens of messages or a text with the model tokenizer."""
+        if not content:
+            return 0
+        if isinstance(content, str):
+            content = [{"role": "user", "content": content}]
+
+        try:
+            import litellm
+
+            return litellm.token_counter(model=self.model, messages=content)
+        except Exception:
+            # Unknown tokenizer, fall back to ~4 characters per token
+            return sum(len(str(message.get("content", ""))) for message in content) // 4
+
+    def supports_n(self) -> bool:
+        """Check whether the provider returns several choices for one request."""
+        if getattr(self, "_supports_n", None) is None:
+            try:
+                import litellm
+
+                _, provider, _, _ = litellm.get_llm_provider(self.model)
+                params = litellm.get_supported_openai_params(
+                    model=self.model, custom_llm_provider=provider) or []
+                # litellm maps n to candidateCount for Gemini
+                self._supports_n = "n" in params
+            except Exception:
+                self._supports_n = False
+        return self._supports_n
+
+    def call_samples(
+        self,
+        messages: List[Dict[str, str]],
+        n: int,
+        first_index: int = 0,
+    ) -> List[str]:
+        """
+        Sample n responses to the same messages, one per student.
+
+        The samples are requested at once with the n parameter when the
+        provider supports it, and with parallel single requests otherwise.
+        Each sample is cached under its own student index, like the
+        responses of a student agent.
+
+        Args:
+            messages: Prompt shared by the students
+            n: Number of samples
+            first_index: Student index of the first sample
+
+        Returns:
+            List[str]: The responses, in student order
+        """
+        indices = range(first_index, first_index + n)
+        responses: Dict[int, str] = {}
+        use_cache = self.cache is not None and self.cache_mode is not CacheMode.OFF
+
+        if use_cache:
+            keys = {index: self.cache_key(messages, sample_index=index) for index in indices}
+            if self.cache_mode in (CacheMode.READ, CacheMode.REPLAY):
+                for index in indices:
+                    response = self.cache.get(keys[index])
+                    if response is not None:
+                        responses[index] = response
+                metrics.count('cache_hits', len(responses))
+                metrics.count('cache_misses', n - len(responses))
+                if self.cache_mode is CacheMode.REPLAY and len(responses) < n:
+                    raise LookupError(
+                        f"No cached response for model {self.model} in replay mode"
+                    )
+
+        missing = [index for index in indices if index not in responses]
+        if missing:
+            if self.supports_n():
+                texts = self._sample(messages, len(missing))
+            else:
+                with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                    futures = [
+                        executor.submit(bind_context(self._sample), messages, 1)
+                        for _ in missing
+                    ]
+                    texts = [future.result()[0] for future in futures]
+
+            for index, text in zip(missing, texts):
+                responses[index] = text
+                if use_cache and text:
+                    self.cache.set(keys[index], text)
+
+        return [responses[index] for index in indices]
+
+    def _sample(self, messages: List[Dict[str, str]], n: int) -> List[str]:
+        """Request n choices in one completion, within the shared rate budget."""
+        prompt_tokens = self.count_tokens(messages)
+        reserved = prompt_tokens + n * (self.max_tokens or self.DEFAULT_COMPLETION_TOKENS)
+        response = self._with_retries(
+            lambda: self._timed(self._complete, messages, n=n), reserved)
+        texts = [choice.message.content or "" for choice in response.choices]
+
+        prompt_tokens, completion_tokens = self._usage(messages, response, texts)
+        self._record_request(prompt_tokens, completion_tokens)
+        if self.rate_limiter is not None:
+            self.rate_limiter.record_usage(reserved, prompt_tokens + completion_tokens)
+
+        # Some OpenAI-compatible servers ignore n and return a single choice
+        while len(texts) < n:
+            texts.extend(self._sample(messages, 1))
+        return texts[:n]
+
+    def _complete(self, messages: List[Dict[str, str]], **overrides):
+        """Send a completion request with the parameters of this LLM."""
+        import litellm
+
+        params = {
+            "model": self.model,
+            "messages": messages,
+            "timeout": getattr(self, "timeout", None),
+            "api_key": getattr(self, "api_key", None),
+            "api_base": getattr(self, "api_base", None),
+            "base_url": getattr(self, "base_url", None),
+            "api_version": getattr(self, "api_version", None),
+            **{name: getattr(self, name, None) for name in self.SAMPLING_PARAMS},
+            **(getattr(self, "additional_params", None) or {}),
+            **overrides,
+        }
+        params = {name: value for name, value in params.items() if value is not None}
+        if self.balancer is None:
+            return litellm.completion(**params)
+
+        with self.balancer.acquire() as url:
+            return litellm.completion(**{**params, "api_base": url, "base_url": url})
@@ -0,0 +1,14 @@
+from enum import Enum
+
+
+class CacheMode(Enum):
+    """Enum for the LLM response cache modes."""
+
+    OFF = "off"  # Never read or write the cache
+    READ = "read"  # Serve cached responses, call the LLM and store on a miss
+    WRITE = "write"  # Always call the LLM and refresh the cache
+    REPLAY = "replay"  # Serve cached responses only, fail on a miss
+
+    def __str__(self) -> str:
+        """Return the value of the enum."""
+        return self.value
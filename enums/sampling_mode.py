@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class SamplingMode(Enum):
+    """Enum for how many students are run on a problem."""
+
+    FIXED = "fixed"  # Always run every student
+    ADAPTIVE = "adaptive"  # Run students in waves until their answers agree
+
+    def __str__(self) -> str:
+        """Return the value of the enum."""
+        return self.value
@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class StudentMode(Enum):
+    """Enum for how student solutions are sampled."""
+
+    AGENTS = "agents"  # One agent and one request per student
+    ENSEMBLE = "ensemble"  # One prompt, several samples per request
+
+    def __str__(self) -> str:
+        """Return the value of the enum."""
+        return self.value
@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class VerifierContext(Enum):
+    """Enum for how student solutions are passed to the LLM verifier."""
+
+    FULL = "full"  # Every solution in full
+    COMPACT = "compact"  # One derivation per distinct final answer, with counts
+
+    def __str__(self) -> str:
+        """Return the value of the enum."""
+        return self.value
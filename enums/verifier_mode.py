@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class VerifierMode(Enum):
+    """Enum for how student answers are verified."""
+
+    LLM = "llm"  # The LLM verifier reviews every solution
+    LOCAL = "local"  # Check answers locally, the LLM reviews undecided ones
+
+    def __str__(self) -> str:
+        """Return the value of the enum."""
+        return self.value
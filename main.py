@@ -1,96 +1,433 @@
 import warnings
 import os
-from datetime import datetime
-from IPython.display import Markdown
+import socket
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING
 
-from app.application import Application
+from app.problem_pipeline import ProblemPipeline
+from enums.cache_mode import CacheMode
 from enums.llm_type import LLMType
+from enums.sampling_mode import SamplingMode
+from enums.student_mode import StudentMode
+from enums.verifier_context import VerifierContext
+from enums.verifier_mode import VerifierMode
 from utils.csv_reader import CSVReader
-from utils.html_to_text import HTMLToText
 from utils.parse_args import parse_args
-from utils.markdown_writer import MarkdownWriter
+from utils.run_manifest import RunManifest
+from utils.metrics import metrics, problem_key
+from utils.results_store import ResultsStore
+from utils.work_queue import WorkQueue, shard_of
+
+if TYPE_CHECKING:
+    from app.application_pool import ApplicationPool
+    from app.tutoring_result import TutoringResult
+    from utils.near_duplicates import NearDuplicateIndex
 
 # Create results directory if it doesn't exist
 OUTPUT_DIR = 'output'
+# Owner of the leases taken from a shared work queue
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+
+def problem_texts(problem: dict):
+    """Return the question and answer text used as crew inputs."""
+    if 'conversion_error' in problem:
+        raise problem['conversion_error']
+    if 'question_text' in problem:
+        # Converted ahead of time by the conversion pipeline
+        return problem['question_text'], problem['answer_text']
+
+    # Use raw content without conversion
+    question_text = f"{problem['item_description']}\n{problem['question']}"
+    return question_text, problem['answer']
+
+
+def pending_problems(problems, manifest: RunManifest, skipped: list):
+    """Yield the problems not completed by a previous run."""
+    for problem in problems:
+        if manifest.is_done(problem):
+            skipped.append(problem['item_id'])
+            continue
+        yield problem
+
+
+def in_notebook() -> bool:
+    """Check whether the code runs in a Jupyter kernel."""
+    ipython = sys.modules.get('IPython')
+    shell = ipython.get_ipython() if ipython is not None else None
+    return type(shell).__name__ == 'ZMQInteractiveShell'
+
+
+def result_record(problem: dict, solved: dict, stages: dict) -> dict:
+    """Build the structured results record of a solved problem."""
+    result = solved['result']
+    return {
+        'item_id': problem['item_id'],
+        'index': problem.get('index'),
+        'question': solved['question'],
+        'answer': solved['answer'],
+        'students': [
+            {
+                'index': solution.index,
+                'final_answer': solution.final_answer,
+                'verdict': solution.verdict,
+            }
+            for solution in result.solutions
+        ],
+        'verdict': result.verdict,
+        'verifier_called': result.verifier_called,
+        'reused_from': result.reused_from,
+        'analysis': result.raw,
+        'duration': solved['duration'],
+        'prompt_tokens': sum(stage.get('prompt_tokens', 0) for stage in stages.values()),
+        'completion_tokens': sum(
+            stage.get('completion_tokens', 0) for stage in stages.values()),
+        'stages': stages,
+    }
+
+
+def record_done(manifest: RunManifest, store: ResultsStore, unwritten: list, queue=None):
+    """Mark the problems whose records were written as done."""
+    for problem, duration in unwritten:
+        manifest.record(problem, 'done', output_path=store.data_path, duration=duration)
+        if queue is not None:
+            queue.complete(problem, WORKER_ID)
+    unwritten.clear()
+
+
+def renew_leases(queue: WorkQueue, stopped: threading.Event):
+    """Keep the leases of this worker alive while its problems run."""
+    while not stopped.wait(queue.visibility_timeout / 3):
+        queue.renew(WORKER_ID)
+
+
+def run_until_drained(run, problems, queue: WorkQueue = None):
+    """
+    Yield the results of run over problems. With a work queue, this worker's
+    problems failing after the queue was drained went back to it, and are
+    leased again until no problem is pending.
+    """
+    while True:
+        yield from run(problems)
+        if queue is None or not queue.counts().get('pending'):
+            return
+        problems = queue.consume(WORKER_ID)
+
+
+def build_pool(args) -> 'ApplicationPool':
+    """Create the pool of warm crews configured by the command line arguments."""
+    # Loads crewai and litellm, after --help and argument errors have exited
+    from app.application_pool import ApplicationPool
+
+    # Crews are set up once and reused, one per concurrent problem
+    return ApplicationPool(
+        llm_type=LLMType[args.llm],
+        total_students=args.students,
+        size=args.concurrency,
+        cache_mode=CacheMode(args.cache),
+        sampling=SamplingMode(args.sampling),
+        min_students=args.min_students,
+        wave_size=args.wave_size,
+        agreement=args.agreement,
+        verifier=VerifierMode(args.verifier),
+        verifier_context=VerifierContext(args.verifier_context),
+        student_mode=StudentMode(args.student_mode),
+        quorum=args.quorum,
+        straggler_timeout=args.straggler_timeout,
+    )
+
+
+def open_duplicate_index(args, pool: 'ApplicationPool') -> 'NearDuplicateIndex':
+    """Open the index of solved problems, reused only under the same model and students."""
+    return pool.config.get_near_duplicate_index(args.dedup_threshold, scope={
+        'model': pool.config.get_model(LLMType[args.llm]),
+        'students': args.students,
+        'student_mode': args.student_mode,
+        'sampling': args.sampling,
+        'min_students': args.min_students,
+        'wave_size': args.wave_size,
+        'agreement': args.agreement,
+        'quorum': args.quorum,
+        'straggler_timeout': args.straggler_timeout,
+        'verifier': args.verifier,
+        'verifier_context': args.verifier_context,
+    })
+
+
+def reuse_duplicate(
+    index: 'NearDuplicateIndex', question: str, answer: str
+) -> 'TutoringResult | None':
+    """Rebuild the result of a solved near-duplicate problem, if any."""
+    from app.tutoring_result import StudentSolution, TutoringResult
+
+    match = index.find(question, answer)
+    if match is None:
+        return None
+    stored, _ = match
+
+    # Student answers are checked again against this problem's answer
+    solutions = []
+    for student in stored['students']:
+        verdict = index.answer_checker.check(student['final_answer'], answer)
+        solutions.append(StudentSolution(
+            index=student['index'],
+            raw='',
+            final_answer=student['final_answer'],
+            verdict=student['verdict'] if verdict is None else verdict,
+        ))
+    metrics.count('duplicates_reused')
+    return TutoringResult(
+        raw=stored['analysis'],
+        total_students=stored['total_students'],
+        solutions=solutions,
+        verifier_called=stored['verifier_called'],
+        reused_from=stored['item_id'],
+    )
+
+
+def solve_problem(
+    problem: dict, pool: 'ApplicationPool', index: 'NearDuplicateIndex' = None
+) -> dict:
+    """Run the crew on a single problem, or reuse the result of a near-duplicate."""
+    start = time.perf_counter()
+    question_text, answer_text = problem_texts(problem)
+
+    # Update the inputs dictionary
+    inputs = {
+        "grade": 7,
+        "question": question_text,
+        "explanation": problem["explanation"],
+        "answer": answer_text,
+    }
+
+    with metrics.stage('problem', problem_key(problem)):
+        result = reuse_duplicate(index, question_text, answer_text) if index else None
+        if result is None:
+            result = pool.run(inputs)
+            if index is not None:
+                index.add(question_text, answer_text, {
+                    'item_id': problem['item_id'],
+                    'analysis': result.raw,
+                    'total_students': result.total_students,
+                    'verifier_called': result.verifier_called,
+                    'students': [
+                        {
+                            'index': solution.index,
+                            'final_answer': solution.final_answer,
+                            'verdict': solution.verdict,
+                        }
+                        for solution in result.solutions
+                    ],
+                })
+
+    return {
+        "question": question_text,
+        "answer": answer_text,
+        "result": result,
+        "duration": time.perf_counter() - start,
+    }
+
 
 if __name__ == "__main__":
     args = parse_args()
     warnings.filterwarnings('ignore')
 
-    question_text = None
-    answer_text = None
-    question_image = None
-    answer_image = None
-
     # Read problems from specified file
     csv_reader = CSVReader(args.file)
-    problems = csv_reader.read_to_dict()
+    problems = (
+        {**problem, 'index': index}
+        for index, problem in enumerate(csv_reader.iter_problems())
+    )
 
-    # Initialize markdown writer
-    md_writer = MarkdownWriter(OUTPUT_DIR)
+    # Only the problems of this shard, split by item_id hash
+    if args.shard is not None:
+        shard_index, shard_count = args.shard
+        problems = (
+            problem for problem in problems
+            if shard_of(problem['item_id'], shard_count) == shard_index
+        )
 
-    for problem in problems:
-        if args.enable_converter:
-            # Initialize HTML to text converter
-            converter = HTMLToText()
-
-            try:
-                # Process question and answer
-                question_text, question_image = converter.process_content(
-                    problem, 'question', problem['item_id'])
-                answer_text, answer_image = converter.process_content(
-                    problem, 'answer', problem['item_id'])
-            except ValueError as e:
-                print(f"Error processing content: {e}")
-                # Cleanup any temporary files that might have been created
-                if question_image:
-                    HTMLToText.cleanup_temp_files(question_image)
-                if answer_image:
-                    HTMLToText.cleanup_temp_files(answer_image)
-                exit(1)
-        else:
-            # Use raw content without conversion
-            question_text = f"{problem['item_description']}\n{problem['question']}"
-            answer_text = problem['answer']
-
-        # Update the inputs dictionary
-        inputs = {
-            "grade": 7,
-            "question": question_text,
-            "explanation": problem["explanation"],
-            "answer": answer_text,
-        }
+    # Record every completed problem, skip the ones done by a previous run
+    manifest = RunManifest(
+        os.path.join(
+            OUTPUT_DIR,
+            f'run_manifest-{WORKER_ID}.jsonl' if args.queue else 'run_manifest.jsonl',
+        ),
+        resume=args.resume,
+    )
+
+    # Per-stage timings and LLM counters of every problem
+    if args.run_id:
+        metrics.run_id = args.run_id
+    elif args.queue:
+        # Workers of one queue share a run unless told otherwise
+        metrics.run_id = os.path.splitext(os.path.basename(args.queue))[0]
+    elif manifest.run_id:
+        # A resumed run keeps adding to the results of the run it resumes
+        metrics.run_id = manifest.run_id
+    manifest.run_id = metrics.run_id
+    metrics.export_to(args.metrics_file)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    # Structured results of the run, exported to Markdown on demand. Workers
+    # of a queue write files of their own in the partition of the run. A
+    # problem run again after a crash is only stored once
+    store = ResultsStore(
+        os.path.join(OUTPUT_DIR, 'results'),
+        run_id=metrics.run_id,
+        format=args.results_format,
+        writer=WORKER_ID if args.queue else None,
+        skip_stored=args.resume or bool(args.queue),
+    )
+    skipped = []
+    problems = pending_problems(problems, manifest, skipped)
+
+    # Problems are leased from the queue shared with the other workers, the
+    # first worker to start fills it
+    queue = None
+    lease_renewal = threading.Event()
+    if args.queue:
+        queue = WorkQueue(args.queue, visibility_timeout=args.lease_timeout)
+        added = queue.enqueue(problems)
+        print(f"Work queue {args.queue}: {added} problem(s) added, {queue.counts()}")
+        problems = queue.consume(WORKER_ID)
+        threading.Thread(
+            target=renew_leases, args=(queue, lease_renewal), daemon=True).start()
+
+    pool = build_pool(args)
 
+    # Initialize HTML to text converter, sharing one browser for the whole run
+    converter = None
+    conversion = None
+    if args.enable_converter:
+        from utils.conversion_pipeline import ConversionPipeline
+        from utils.html_renderer import HTMLRenderer
+        from utils.html_to_text import HTMLToText
+
+        converter = HTMLToText(
+            renderer=HTMLRenderer(
+                tabs=min(args.concurrency, 8),
+                # Content only, at 288 DPI, close to the 300 Tesseract is tuned for
+                scale=3 if args.ocr_optimize else 2,
+                clip=args.ocr_optimize,
+            ),
+            cache=pool.config.get_ocr_cache(),
+            direct=not args.force_ocr,
+            optimize=args.ocr_optimize,
+        )
+        # Render and OCR upcoming problems while the crews run
+        conversion = ConversionPipeline(converter)
+
+    # Solved problems are indexed so their near-duplicates reuse the analysis
+    index = open_duplicate_index(args, pool) if args.dedup else None
+
+    pipeline = ProblemPipeline(
+        worker=lambda problem: solve_problem(problem, pool, index),
+        concurrency=args.concurrency,
+    )
+
+    failed = []
+    unwritten = []
+    calls_saved = 0
+    stragglers_dropped = 0
+    verified_locally = 0
+    duplicates_reused = 0
+    def run(problems):
+        return pipeline.run(conversion.run(problems) if conversion else problems)
+
+    for problem, solved, error in run_until_drained(run, problems, queue):
         print(f"Question ID: {problem['item_id']}")
-        print(f"Question: {question_text}")
-        print(f"Answer: {answer_text}")
-        print(f"Explanation: {problem['explanation']}\n")
+        if error is not None:
+            print(f"Error processing problem {problem['item_id']}: {error}\n")
+            failed.append(problem['item_id'])
+            manifest.record(problem, 'failed', error=str(error))
+            metrics.finish_problem(problem_key(problem), 'failed')
+            if queue is not None:
+                queue.complete(problem, WORKER_ID, 'failed', error=str(error))
+            continue
 
-        app = Application(llm_type=LLMType[args.llm])
-        app.setup(total_students=args.students)
-        result = app.run(inputs)
+        print(f"Question: {solved['question']}")
+        print(f"Answer: {solved['answer']}")
+        print(f"Explanation: {problem['explanation']}")
+        if solved['result'].reused_from is not None:
+            print(f"Reused the analysis of near-duplicate {solved['result'].reused_from}\n")
+            duplicates_reused += 1
+        else:
+            print(
+                f"Students run: {solved['result'].students_run}/"
+                f"{solved['result'].total_students}\n"
+            )
+            calls_saved += solved['result'].calls_saved
+            stragglers_dropped += solved['result'].stragglers_dropped
+            verified_locally += not solved['result'].verifier_called
 
-        # Write results to markdown file
+        # Problems are marked done once their record is written, so that a
+        # resumed run does not skip problems lost with the buffer
+        stages = metrics.finish_problem(problem_key(problem))['stages']
+        unwritten.append((problem, solved['duration']))
         try:
-            md_writer.write_problem_result(
-                problem_id=problem['item_id'],
-                question=question_text,
-                answer=answer_text,
-                analysis=result.raw
-            )
-        except IOError as e:
+            written = store.append(result_record(problem, solved, stages))
+        except (IOError, ImportError) as e:
             print(f"Error writing results: {e}")
-            if question_image:
-                HTMLToText.cleanup_temp_files(question_image)
-            if answer_image:
-                HTMLToText.cleanup_temp_files(answer_image)
-            exit(1)
+            for unwritten_problem, _ in unwritten:
+                failed.append(unwritten_problem['item_id'])
+                if queue is not None:
+                    queue.complete(unwritten_problem, WORKER_ID, 'failed', error=str(e))
+            unwritten.clear()
+            continue
+        if written:
+            record_done(manifest, store, unwritten, queue)
 
         # Display result in notebook
-        Markdown(result.raw)
+        if in_notebook():
+            from IPython.display import Markdown, display
+
+            display(Markdown(solved['result'].raw))
+
+    if converter is not None:
+        stats = converter.cache.stats()
+        print(
+            f"Conversion cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate)"
+        )
+        paths = ", ".join(
+            f"{path}: {count}" for path, count in sorted(converter.path_counts.items()))
+        print(f"Conversion paths: {paths or 'none'}")
+        converter.close()
+
+    store.close()
+    record_done(manifest, store, unwritten, queue)
+    manifest.close()
+    if queue is not None:
+        lease_renewal.set()
+        print(f"Work queue {args.queue}: {queue.counts()}")
+        queue.close()
+    print(f"Stage timings per problem:\n{metrics.format_summary()}")
+    metrics.close()
+    if verified_locally:
+        print(f"Verified {verified_locally} problem(s) without the LLM verifier")
+    if calls_saved:
+        if args.sampling == SamplingMode.ADAPTIVE.value:
+            print(f"Adaptive sampling saved {calls_saved} student LLM run(s)")
+        else:
+            print(f"Skipped {calls_saved} student LLM run(s) of students busy with dropped runs")
+    if stragglers_dropped:
+        print(
+            f"Dropped {stragglers_dropped} straggling student run(s), "
+            f"made but left out of the analysis"
+        )
+    if index is not None:
+        print(
+            f"Near-duplicates reused {duplicates_reused} stored analyses, "
+            f"avoiding {duplicates_reused} crew run(s) ({len(index)} problems indexed)"
+        )
+        index.close()
+    if skipped:
+        print(f"Skipped {len(skipped)} problem(s) completed by a previous run")
 
-        # Cleanup temporary files
-        if question_image:
-            HTMLToText.cleanup_temp_files(question_image)
-        if answer_image:
-            HTMLToText.cleanup_temp_files(answer_image)
+    if failed:
+        print(f"{len(failed)} problem(s) failed: {', '.join(failed)}")
+        exit(1)
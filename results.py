@@ -0,0 +1,77 @@
+import argparse
+import os
+
+from utils.markdown_writer import MarkdownWriter
+from utils.results_store import ResultsStore
+
+RESULTS_DIR = os.path.join('output', 'results')
+
+
+def parse_args():
+    """
+    Parse command line arguments for querying stored results.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(description='Query and export the results of runs')
+    parser.add_argument(
+        '--root',
+        type=str,
+        default=RESULTS_DIR,
+        help=f'Directory holding the results of every run (default: {RESULTS_DIR})'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('runs', help='List the stored runs')
+
+    summary = subparsers.add_parser('summary', help='Show the totals and accuracy of a run')
+    summary.add_argument('--run', type=str, default=None, help='Run id (default: latest)')
+
+    export = subparsers.add_parser('export-markdown', help='Write Markdown reports of a run')
+    export.add_argument('--run', type=str, default=None, help='Run id (default: latest)')
+    export.add_argument('--item', type=str, default=None, help='Only export this item_id')
+    export.add_argument(
+        '--output',
+        type=str,
+        default='output',
+        help='Directory receiving the Markdown files (default: output)'
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    runs = ResultsStore.runs(args.root)
+    if args.command == 'runs':
+        for run_id in runs:
+            summary = ResultsStore.summary(args.root, run_id)
+            print(f"{run_id}: {summary['problems']} problems")
+        raise SystemExit(0)
+
+    run_id = args.run or (runs[-1] if runs else None)
+    if run_id not in runs:
+        raise SystemExit(f"No results found for run {run_id} in {args.root}")
+
+    if args.command == 'summary':
+        summary = ResultsStore.summary(args.root, run_id)
+        accuracy = summary.pop('accuracy')
+        print(f"Run {run_id}")
+        for name, value in summary.items():
+            print(f"  {name}: {round(value, 2)}")
+        print(f"  accuracy: {'n/a' if accuracy is None else f'{accuracy:.1%}'}")
+    else:
+        md_writer = MarkdownWriter(args.output)
+        exported = 0
+        for record in ResultsStore.iter_records(args.root, run_id):
+            if args.item is not None and str(record['item_id']) != args.item:
+                continue
+            md_writer.write_problem_result(
+                problem_id=record['item_id'],
+                question=record['question'],
+                answer=record['answer'],
+                analysis=record['analysis'],
+            )
+            exported += 1
+        print(f"Exported {exported} problems of run {run_id} to {args.output}")
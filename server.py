@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+import uuid
+import warnings
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from main import OUTPUT_DIR, build_pool, open_duplicate_index, result_record, solve_problem
+from utils.metrics import metrics, problem_key
+from utils.parse_args import build_parser
+from utils.results_store import ResultsStore
+
+
+def parse_args():
+    """
+    Parse command line arguments for the tutoring service.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = build_parser('AI Tutor HTTP service')
+    parser.add_argument(
+        '--host',
+        type=str,
+        default='127.0.0.1',
+        help='Interface the service listens on (default: 127.0.0.1)'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8000,
+        help='Port the service listens on (default: 8000)'
+    )
+    return parser.parse_args()
+
+
+def create_app(args):
+    """
+    Create the FastAPI application serving warm crews.
+
+    Args:
+        args: Parsed command line arguments configuring the crews
+    """
+    from fastapi import FastAPI, HTTPException
+    from fastapi.responses import PlainTextResponse, StreamingResponse
+    from pydantic import BaseModel
+
+    from app.tutoring_service import TutoringService
+
+    class Problem(BaseModel):
+        question: str
+        answer: str
+        explanation: str = ''
+        item_id: Optional[str] = None
+
+    class Batch(BaseModel):
+        problems: List[Problem]
+
+    pool = build_pool(args)
+    index = open_duplicate_index(args, pool) if args.dedup else None
+    store = ResultsStore(
+        os.path.join(OUTPUT_DIR, 'results'),
+        run_id=metrics.run_id,
+        format=args.results_format,
+    )
+
+    def solve(problem: dict) -> dict:
+        try:
+            solved = solve_problem(problem, pool, index)
+        except Exception:
+            metrics.finish_problem(problem_key(problem), 'failed')
+            raise
+        stages = metrics.finish_problem(problem_key(problem))['stages']
+        record = result_record(problem, solved, stages)
+        store.append(record)
+        return record
+
+    service = TutoringService(solve, concurrency=args.concurrency)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Crews are set up before the first request is accepted
+        await asyncio.to_thread(pool.warm)
+        yield
+        service.close()
+        store.close()
+        metrics.close()
+
+    app = FastAPI(title='AI Tutor', lifespan=lifespan)
+
+    async def run(problem: Problem, item_id: str) -> dict:
+        future, coalesced = service.submit({
+            'item_id': item_id,
+            # Clients may send several problems with one item_id
+            'metrics_key': uuid.uuid4().hex,
+            'question_text': problem.question,
+            'answer_text': problem.answer,
+            'explanation': problem.explanation,
+        })
+        record = await asyncio.wrap_future(future)
+        # A coalesced problem gets the record of the identical one that ran
+        return {**record, 'item_id': item_id, 'coalesced': coalesced}
+
+    @app.post('/problems')
+    async def solve_one(problem: Problem):
+        try:
+            return await run(problem, problem.item_id or uuid.uuid4().hex)
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=str(e))
+
+    @app.post('/problems/batch')
+    async def solve_batch(batch: Batch):
+        async def settle(problem: Problem) -> dict:
+            item_id = problem.item_id or uuid.uuid4().hex
+            try:
+                return await run(problem, item_id)
+            except Exception as e:
+                return {'item_id': item_id, 'error': str(e)}
+
+        async def results():
+            # Every problem is scheduled at once, results are streamed as
+            # JSON Lines in completion order
+            tasks = [asyncio.ensure_future(settle(problem)) for problem in batch.problems]
+            for task in asyncio.as_completed(tasks):
+                yield json.dumps(await task, ensure_ascii=False) + '\n'
+
+        return StreamingResponse(results(), media_type='application/x-ndjson')
+
+    @app.get('/health')
+    async def health():
+        return {'status': 'ok', 'pending': service.pending}
+
+    @app.get('/metrics', response_class=PlainTextResponse)
+    async def prometheus():
+        return metrics.prometheus_text()
+
+    return app
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    warnings.filterwarnings('ignore')
+
+    import uvicorn
+
+    metrics.export_to(args.metrics_file)
+    uvicorn.run(create_app(args), host=args.host, port=args.port)
@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from utils.answer_checker import AnswerChecker
+
+
+@pytest.fixture(scope='module')
+def checker():
+    return AnswerChecker()
+
+
+@pytest.mark.parametrize('answer, correct', [
+    ('5', '5'),
+    ('答え: 5', '5'),
+    ('1/2', '0.5'),
+    ('\\frac{1}{2}', '0.5'),
+    ('三分の二', '2/3'),
+    ('3分の2', '2/3'),
+    ('x=3', 'x=3.0'),
+    ('マイナス三', '-3'),
+    ('2**3', '8'),
+    ('-(-3)', '3'),
+    ('2x+2', '2(x+1)'),
+    ('x^2-1', '(x+1)(x-1)'),
+    ('sqrt(8)', '2sqrt(2)'),
+    ('30cm', '30cm'),
+])
+def test_equivalent_answers(checker, answer, correct):
+    assert checker.check(answer, correct) is True
+
+
+@pytest.mark.parametrize('answer, correct', [
+    ('3', '4'),
+    ('30cm', '20cm'),
+    ('2x+1', '2(x+1)'),
+])
+def test_different_answers(checker, answer, correct):
+    assert checker.check(answer, correct) is False
+
+
+@pytest.mark.parametrize('answer, correct', [
+    # Units are not converted
+    ('30cm', '0.3m'),
+    ('1000g', '1kg'),
+    ('90分', '1.5時間'),
+    ('30cm', '30m'),
+    # A unit on one side only
+    ('50%', '1/2'),
+    ('10%', '0.1'),
+    ('30', '30cm'),
+])
+def test_units_are_left_to_the_verifier(checker, answer, correct):
+    assert checker.check(answer, correct) is None
+
+
+@pytest.mark.parametrize('answer', [
+    "open('{path}','w').write('x')",
+    "__import__('os').system('touch {path}')",
+    "exec('open(\"{path}\",\"w\")')",
+    "().__class__.__base__",
+    "lambda: 1",
+])
+def test_answers_are_never_evaluated(checker, tmp_path, answer):
+    path = tmp_path / 'written'
+    assert checker.check(answer.format(path=path), '1') is None
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize('answer', [
+    '9^9^9^9',
+    '(2^1000)^1000',
+    '9^(sqrt(2)*10^300)',
+    '1' * 1000,
+    '1/0',
+    'hello',
+])
+def test_unparseable_or_huge_answers(checker, answer):
+    assert checker.check(answer, '1') is None
+
+
+@pytest.mark.parametrize('answer, correct', [
+    # Different variables, or a variable on one side only
+    ('a=2', 'b=2'),
+    ('y=2x+1', '2x+1'),
+    ('x=3', '3'),
+])
+def test_variables_must_match(checker, answer, correct):
+    assert checker.check(answer, correct) is None
+
+
+def test_kanji_words_are_not_numbers(checker):
+    # 十分 means enough, not ten minutes
+    assert checker.check('十分', '10分') is None
+
+
+@pytest.mark.parametrize('answer, correct', [
+    ('0.333', '1/3'),
+    ('0.3', '1/3'),
+    ('0.667', '2/3'),
+    ('0.666', '2/3'),
+])
+def test_rounded_decimals_are_left_to_the_verifier(checker, answer, correct):
+    assert checker.check(answer, correct) is None
+
+
+@pytest.mark.parametrize('answer, correct', [
+    ('0.334', '1/3'),
+    ('0.5', '1/3'),
+])
+def test_wrong_decimals(checker, answer, correct):
+    assert checker.check(answer, correct) is False
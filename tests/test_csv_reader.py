@@ -0,0 +1,100 @@
+import csv
+import random
+
+import pytest
+
+from utils.csv_reader import CSVReader
+
+FIELDS = [
+    'item_id', 'item_description', 'question_content', 'options', 'correct_option', 'explanation']
+
+
+def eager_read(rows):
+    """The problems of rows as built by the former, eager CSVReader."""
+    filled = []
+    previous_id = None
+    for row in rows:
+        if row['item_id'].strip():
+            previous_id = row['item_id']
+        filled.append({**row, 'item_id': previous_id})
+
+    counts = {}
+    for row in rows:
+        counts[row['item_id']] = counts.get(row['item_id'], 0) + 1
+
+    descriptions = {}
+    answers = {}
+    for row in filled:
+        item_id = row['item_id'].strip()
+        if row['item_description'] and item_id not in descriptions:
+            descriptions[item_id] = row['item_description']
+        if row['correct_option'].upper() == 'TRUE':
+            answers[item_id] = row['options']
+
+    return [
+        {
+            'question': row['question_content'] if (
+                counts[row['item_id'].strip()] > 1 or not row['item_description'].strip()
+            ) else '',
+            'answer': answers.get(row['item_id'].strip()),
+            'item_id': row['item_id'].strip(),
+            'item_description': descriptions.get(row['item_id'].strip()) or row['item_description'],
+            'explanation': row['explanation'],
+        }
+        for row in rows
+        if row['item_id'].strip()
+    ]
+
+
+def random_rows(rng):
+    rows = []
+    for item in range(rng.randint(1, 8)):
+        for position in range(rng.randint(1, 4)):
+            rows.append({
+                'item_id': f'item{item}' if position == 0 or rng.random() < 0.5 else '',
+                'item_description': rng.choice(['', f'<p>Description {item}</p>']),
+                'question_content': f'<p>Question {item}.{position}</p>',
+                'options': f'option {position}',
+                'correct_option': rng.choice(['TRUE', 'FALSE', 'true', '']),
+                'explanation': f'Explanation {item}.{position}',
+            })
+    return rows
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_streaming_matches_the_eager_reader(tmp_path, seed):
+    rows = random_rows(random.Random(seed))
+    path = write_csv(tmp_path / 'problems.csv', rows)
+    assert list(CSVReader(path).iter_problems()) == eager_read(rows)
+    assert CSVReader(path).read_to_dict() == eager_read(rows)
+
+
+def test_problems_are_streamed(tmp_path):
+    rows = random_rows(random.Random(0))
+    path = write_csv(tmp_path / 'problems.csv', rows)
+    problems = CSVReader(path).iter_problems()
+    assert next(problems)['item_id'] == 'item0'
+
+
+def test_non_contiguous_item_id_is_rejected(tmp_path):
+    rows = random_rows(random.Random(1))
+    rows.append({**rows[0]})
+    path = write_csv(tmp_path / 'problems.csv', rows)
+    with pytest.raises(ValueError, match='item0 are not contiguous'):
+        CSVReader(path).read_to_dict()
+
+
+def test_first_row_needs_an_item_id(tmp_path):
+    rows = random_rows(random.Random(2))
+    rows[0]['item_id'] = ''
+    path = write_csv(tmp_path / 'problems.csv', rows)
+    with pytest.raises(ValueError, match='First row'):
+        CSVReader(path).read_to_dict()
@@ -0,0 +1,111 @@
+import pytest
+
+pytest.importorskip('crewai')
+pytest.importorskip('litellm')
+
+from litellm.integrations.custom_logger import CustomLogger  # noqa: E402
+
+from benchmarks.mock_llm_server import MockLLMServer  # noqa: E402
+from config.tutor_llm import TutorLLM  # noqa: E402
+
+MESSAGES = [{'role': 'user', 'content': 'Solve x + 1 = 3.'}]
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.acquired = []
+        self.usage = []
+
+    def acquire(self, tokens=0):
+        self.acquired.append(tokens)
+        return 0.0
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        self.usage.append((estimated_tokens, actual_tokens))
+
+
+class UsageCallback(CustomLogger):
+    def __init__(self):
+        super().__init__()
+        self.completion_tokens = 0
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.completion_tokens += response_obj.usage.completion_tokens
+
+
+@pytest.fixture
+def server():
+    server = MockLLMServer(
+        latency='const:0', tokens_per_second=10000, completion_tokens=20, seed=0).start()
+    yield server
+    server.stop()
+
+
+def make_llm(base_url, limiter) -> TutorLLM:
+    return TutorLLM(
+        model='openai/mock',
+        api_key='mock',
+        base_url=base_url,
+        timeout=5,
+        rate_limiter=limiter,
+        hedge_percentile=0.95,
+    )
+
+
+def test_hedge_settles_its_reservation_and_calls_back(server):
+    limiter = RecordingLimiter()
+    callback = UsageCallback()
+    text = make_llm(f"{server.base_url}/v1", limiter)._hedge_request(
+        MESSAGES, 5000, [callback])
+
+    assert text
+    assert limiter.acquired == [5000]
+    [(estimated, actual)] = limiter.usage
+    assert estimated == 5000
+    assert 20 <= actual < 5000
+    assert callback.completion_tokens == 20
+
+
+def test_failed_hedge_gives_its_tokens_back():
+    limiter = RecordingLimiter()
+    with pytest.raises(Exception):
+        make_llm('http://127.0.0.1:9/v1', limiter)._hedge_request(MESSAGES, 5000)
+    assert limiter.usage == [(5000, 0)]
+
+
+def test_rate_limited_request_is_retried_with_its_tokens_given_back(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr('config.tutor_llm.time.sleep', sleeps.append)
+    limiter = RecordingLimiter()
+    llm = make_llm('http://127.0.0.1:9/v1', limiter)
+    llm.max_retries = 2
+
+    error = Exception('429 Too Many Requests')
+    error.status_code = 429
+    error.response = type('Response', (), {'headers': {'retry-after': '3'}})()
+    responses = [error, error, 'done']
+
+    def request():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert llm._with_retries(request, 500) == 'done'
+    assert limiter.acquired == [500, 500, 500]
+    assert limiter.usage == [(500, 0), (500, 0)]
+    assert sleeps == [3.0, 3.0]
+
+
+def test_retries_stop_after_max_retries(monkeypatch):
+    monkeypatch.setattr('config.tutor_llm.time.sleep', lambda seconds: None)
+    limiter = RecordingLimiter()
+    llm = make_llm('http://127.0.0.1:9/v1', limiter)
+    llm.max_retries = 1
+
+    def request():
+        raise TimeoutError()
+
+    with pytest.raises(TimeoutError):
+        llm._with_retries(request, 500)
+    assert limiter.acquired == [500, 500]
@@ -0,0 +1,65 @@
+import io
+import subprocess
+
+import pytest
+
+pytest.importorskip('websocket')
+
+from utils import html_to_text  # noqa: E402
+from utils.html_to_text import _band_cuts, ocr_image, prepare_for_ocr  # noqa: E402
+
+
+def test_band_cuts_at_the_last_blank_row_within_reach():
+    ink_rows = [0, 5, 5, 0, 5, 5, 0, 5, 5, 0]
+    assert _band_cuts(ink_rows, 5) == [0, 3, 6, 10]
+
+
+def test_band_cuts_never_cut_through_ink():
+    ink_rows = [5] * 8 + [0] + [1] * 8
+    assert _band_cuts(ink_rows, 4) == [0, 8, 17]
+    assert _band_cuts([1] * 10, 4) == [0, 10]
+
+
+def test_tesseract_command_is_read_from_the_environment(monkeypatch):
+    commands = []
+
+    def run(command, **kwargs):
+        commands.append(command)
+        return subprocess.CompletedProcess(command, 0, stdout=b' text \n', stderr=b'')
+
+    monkeypatch.setattr(html_to_text.subprocess, 'run', run)
+    monkeypatch.setenv('TESSERACT_CMD', '/opt/tesseract/bin/tesseract')
+    assert ocr_image(b'png', 'jpn', '--psm 6') == 'text'
+    monkeypatch.delenv('TESSERACT_CMD')
+    ocr_image(b'png', 'jpn', '-l eng')
+
+    assert commands == [
+        ['/opt/tesseract/bin/tesseract', 'stdin', 'stdout', '--psm', '6', '-l', 'jpn'],
+        ['tesseract', 'stdin', 'stdout', '-l', 'eng'],
+    ]
+
+
+def test_bands_are_not_cut_through_thin_strokes():
+    Image = pytest.importorskip('PIL.Image')
+
+    # Lines of text in a wide screenshot, each with a row holding a single
+    # ink pixel, which averages to less than one gray level
+    image = Image.new('L', (3000, 1000), 255)
+    for top in range(20, 960, 60):
+        for y in range(top, top + 40):
+            if y == top + 20:
+                image.putpixel((150, y), 0)
+            else:
+                for x in range(100, 200):
+                    image.putpixel((x, y), 0)
+    # Keeps the cropped image wide
+    image.putpixel((2900, 20), 0)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+
+    bands = prepare_for_ocr(buffer.getvalue(), max_band_height=150)
+    assert len(bands) > 1
+    for band in bands:
+        band = Image.open(io.BytesIO(band))
+        top_row = band.crop((0, 0, band.width, 1))
+        assert min(top_row.getdata()) == 255
@@ -0,0 +1,10 @@
+from benchmarks.bench_import_time import BUDGET_MS, heavy_modules, import_times, total_ms
+
+
+def test_main_does_not_load_heavy_modules():
+    assert heavy_modules(import_times('main')) == []
+
+
+def test_main_imports_within_budget():
+    # Best of three, so a busy machine does not fail the test
+    assert min(total_ms(import_times('main'), 'main') for _ in range(3)) <= BUDGET_MS
@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+from utils.near_duplicates import MinHasher, NearDuplicateIndex, similarity
+
+QUESTION = '<p>(1) 次の方程式を解きなさい。</p><p>3x + 5 = 20</p>'
+RECORD = {'item_id': 'a', 'analysis': 'x = 5'}
+SCOPE = {'model': 'gemini', 'students': 10}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / 'index.sqlite'), threshold=0.8, scope=SCOPE)
+    yield index
+    index.close()
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('(1) 3x + 5 = 20', '3x+5=20'),
+    ('1. 3x + 5 = 20', '3x+5=20'),
+    ('① 3x + 5 = 20', '3x+5=20'),
+    ('問2 3x + 5 = 20', '3x+5=20'),
+    ('(a) 3x + 5 = 20', '3x+5=20'),
+    ('a. 3x + 5 = 20', '3x+5=20'),
+    ('ア) 3x + 5 = 20', '3x+5=20'),
+    ('１．ｘ＝２', 'x=2'),
+])
+def test_numbering_is_removed(index, text, expected):
+    assert index.normalize(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('a、bの値を求めなさい', 'abの値を求めなさい'),
+    ('ア、イのうち正しいもの', 'アイのうち正しいもの'),
+    ('a.b = 3', 'ab=3'),
+    ('3x + ① = 20', '3x+1=20'),
+    ('1.5 + 2 = 3.5', '1.5+2=3.5'),
+    ('(ab)^2 = 4', 'ab^2=4'),
+])
+def test_text_that_looks_like_numbering_is_kept(index, text, expected):
+    assert index.normalize(text) == expected
+
+
+def test_signature_similarity():
+    hasher = MinHasher()
+    first = hasher.signature('次の方程式を解きなさい3x+5=20')
+    assert similarity(first, first) == 1.0
+    assert similarity(first, hasher.signature('次の方程式を解きなさい3x+5=20です')) > 0.8
+    assert similarity(first, hasher.signature('三角形の面積を求めよ')) < 0.2
+
+
+def test_near_duplicate_is_found(index):
+    index.add(QUESTION, '5', RECORD)
+    record, score = index.find('2.  次の方程式を解きなさい。 3x+5=20', '5')
+    assert record == RECORD
+    assert score >= 0.8
+
+
+def test_other_answer_or_question_is_not_found(index):
+    index.add(QUESTION, '5', RECORD)
+    assert index.find(QUESTION, '6') is None
+    assert index.find('<p>三角形の面積を求めなさい。</p>', '5') is None
+
+
+def test_other_scope_is_not_found(index, tmp_path):
+    index.add(QUESTION, '5', RECORD)
+    other = NearDuplicateIndex(
+        str(tmp_path / 'index.sqlite'), scope={**SCOPE, 'students': 5})
+    assert other.find(QUESTION, '5') is None
+    other.close()
+
+
+def test_index_persists_across_runs(index, tmp_path):
+    index.add(QUESTION, '5', RECORD)
+    reopened = NearDuplicateIndex(str(tmp_path / 'index.sqlite'), scope=SCOPE)
+    assert len(reopened) == 1
+    assert reopened.find(QUESTION, '5')[0] == RECORD
+    reopened.close()
+
+
+def test_problems_indexed_without_a_scope_are_not_reused(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE problems (id INTEGER PRIMARY KEY, item_id TEXT NOT NULL, answer TEXT, "
+        "signature TEXT NOT NULL, record TEXT NOT NULL, created_at REAL NOT NULL)")
+    connection.commit()
+    connection.close()
+
+    index = NearDuplicateIndex(path, scope=SCOPE)
+    index.add(QUESTION, '5', RECORD)
+    assert index.find(QUESTION, '5')[0] == RECORD
+    index.close()
+
+
+def test_bands_must_divide_the_signature(tmp_path):
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(str(tmp_path / 'index.sqlite'), num_perm=64, bands=10)
@@ -0,0 +1,33 @@
+import pytest
+
+from utils.parse_args import build_parser
+
+
+def parse(*argv):
+    return build_parser().parse_args(list(argv))
+
+
+def test_defaults():
+    args = parse()
+    assert args.students == 10
+    assert args.agreement == 0.75
+    assert args.dedup_threshold == 0.9
+
+
+@pytest.mark.parametrize('argv', [
+    ('--students', '0'),
+    ('--students', '-2'),
+    ('--agreement', '1.5'),
+    ('--agreement', '-0.1'),
+    ('--dedup-threshold', '2'),
+    ('--shard', '2/2'),
+])
+def test_out_of_range_values_are_rejected(argv, capsys):
+    with pytest.raises(SystemExit):
+        parse(*argv)
+    assert argv[0] in capsys.readouterr().err
+
+
+def test_bounds_are_accepted():
+    args = parse('--students', '1', '--agreement', '1', '--dedup-threshold', '0')
+    assert (args.students, args.agreement, args.dedup_threshold) == (1, 1.0, 0.0)
@@ -0,0 +1,135 @@
+from types import SimpleNamespace
+
+import pytest
+
+import utils.rate_limiter as rate_limiter
+from utils.hedging import backoff_delay, is_retryable
+from utils.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    """Clock that only moves when the limiter waits."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.waits = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.waits.append(seconds)
+        self.now += seconds
+
+
+class FakeCondition:
+    def __init__(self, clock):
+        self.clock = clock
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def wait(self, timeout=None):
+        self.clock.sleep(timeout)
+
+    def notify_all(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    return clock
+
+
+def make_limiter(clock, **kwargs) -> RateLimiter:
+    limiter = RateLimiter(**kwargs)
+    limiter._condition = FakeCondition(clock)
+    return limiter
+
+
+def test_requests_wait_once_the_budget_is_spent(clock):
+    limiter = make_limiter(clock, rpm=60)
+    assert [limiter.acquire() for _ in range(60)] == [0.0] * 60
+    # One request per second refills
+    assert limiter.acquire() == pytest.approx(1.0)
+    assert limiter.acquire() == pytest.approx(1.0)
+
+
+def test_tokens_wait_for_the_bucket_to_refill(clock):
+    limiter = make_limiter(clock, tpm=6000)
+    assert limiter.acquire(6000) == 0.0
+    # 100 tokens per second
+    assert limiter.acquire(500) == pytest.approx(5.0)
+
+
+def test_request_larger_than_the_budget_waits_for_a_full_bucket(clock):
+    limiter = make_limiter(clock, tpm=1000)
+    limiter.acquire(400)
+    assert limiter.acquire(5000) == pytest.approx(24.0)
+
+
+def test_record_usage_corrects_the_reservation(clock):
+    limiter = make_limiter(clock, tpm=6000)
+    limiter.acquire(6000)
+    # Only 1000 of the 6000 reserved tokens were used
+    limiter.record_usage(6000, 1000)
+    assert limiter.acquire(5000) == 0.0
+
+    # Usage above the reservation is taken from the next requests
+    limiter.record_usage(5000, 5600)
+    assert limiter.acquire(100) == pytest.approx(7.0)
+
+
+def test_record_usage_never_overfills_the_bucket(clock):
+    limiter = make_limiter(clock, tpm=6000)
+    limiter.record_usage(6000, 0)
+    limiter.acquire(6000)
+    assert limiter.acquire(600) == pytest.approx(6.0)
+
+
+def test_unlimited_limiter_never_waits(clock):
+    limiter = make_limiter(clock)
+    assert limiter.acquire(10 ** 9) == 0.0
+    assert clock.waits == []
+
+
+def test_state_file_shares_the_budget(clock, tmp_path):
+    state_path = str(tmp_path / 'limiter.json')
+    first = make_limiter(clock, rpm=2, state_path=state_path)
+    second = make_limiter(clock, rpm=2, state_path=state_path)
+    first.acquire()
+    second.acquire()
+    assert first.acquire() == pytest.approx(30.0)
+
+
+def rate_limit_error(retry_after=None):
+    error = Exception('429 Too Many Requests')
+    error.status_code = 429
+    error.response = SimpleNamespace(
+        headers={} if retry_after is None else {'retry-after': retry_after})
+    return error
+
+
+def test_rate_limit_errors_are_retryable():
+    assert is_retryable(rate_limit_error())
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(ValueError('bad request'))
+
+
+def test_backoff_honors_retry_after_up_to_the_cap():
+    assert backoff_delay(0, rate_limit_error('7')) == 7.0
+    assert backoff_delay(0, rate_limit_error('120'), cap=30.0) == 30.0
+
+
+def test_backoff_is_jittered_exponentially(monkeypatch):
+    monkeypatch.setattr('utils.hedging.random.uniform', lambda low, high: high)
+    assert [backoff_delay(attempt, rate_limit_error()) for attempt in range(7)] == [
+        1.0, 2.0, 4.0, 8.0, 16.0, 30.0, 30.0]
@@ -0,0 +1,36 @@
+from utils.results_store import ResultsStore
+
+
+def record(item_id, index, verdict=True):
+    return {'item_id': item_id, 'index': index, 'verdict': verdict, 'duration': 1.0}
+
+
+def test_problem_stored_before_a_crash_is_not_stored_again(tmp_path):
+    root = str(tmp_path / 'results')
+    store = ResultsStore(root, run_id='run', flush_every=2, skip_stored=True)
+    store.append(record('a', 0))
+    assert store.append(record('a', 1))
+    # Killed before the manifest recorded the problems as done
+
+    store = ResultsStore(root, run_id='run', flush_every=2, skip_stored=True)
+    assert not store.append(record('a', 0))
+    store.append(record('a', 1))
+    store.append(record('b', 2, verdict=False))
+    store.close()
+
+    records = list(ResultsStore.iter_records(root, 'run'))
+    assert [(r['item_id'], r['index']) for r in records] == [('a', 0), ('a', 1), ('b', 2)]
+    summary = ResultsStore.summary(root, 'run')
+    assert summary['problems'] == 3
+    assert summary['accuracy'] == 2 / 3
+
+
+def test_writers_share_the_stored_problems(tmp_path):
+    root = str(tmp_path / 'results')
+    first = ResultsStore(root, run_id='run', flush_every=1, writer='w1', skip_stored=True)
+    first.append(record('a', 0))
+
+    second = ResultsStore(root, run_id='run', flush_every=1, writer='w2', skip_stored=True)
+    assert not second.append(record('a', 0))
+    assert second.append(record('b', 1))
+    assert len(list(ResultsStore.iter_records(root, 'run'))) == 2
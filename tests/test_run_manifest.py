@@ -0,0 +1,34 @@
+from utils.run_manifest import RunManifest
+
+FIRST = {'item_id': 'a', 'question': '1 + 1'}
+SECOND = {'item_id': 'b', 'question': '2 + 2'}
+
+
+def test_resume_after_partial_line(tmp_path):
+    path = str(tmp_path / 'run_manifest.jsonl')
+    manifest = RunManifest(path)
+    manifest.record(FIRST, 'done')
+    manifest.close()
+    # A run killed while writing a record
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"input_hash": "0123", "ite')
+
+    manifest = RunManifest(path, resume=True)
+    manifest.record(SECOND, 'done')
+    manifest.close()
+
+    manifest = RunManifest(path, resume=True)
+    assert manifest.is_done(FIRST)
+    assert manifest.is_done(SECOND)
+    manifest.close()
+
+
+def test_resume_keeps_the_run_id(tmp_path):
+    path = str(tmp_path / 'run_manifest.jsonl')
+    manifest = RunManifest(path, run_id='first')
+    manifest.record(FIRST, 'done')
+    manifest.close()
+
+    assert RunManifest(path, resume=True).run_id == 'first'
+    assert RunManifest(path, resume=True, run_id='other').run_id == 'other'
+    assert RunManifest(path).run_id is None
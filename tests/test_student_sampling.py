@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip('crewai')
+pytest.importorskip('litellm')
+
+from benchmarks.mock_llm_server import MockLLMServer  # noqa: E402
+from config.tutor_llm import TutorLLM  # noqa: E402
+from enums.cache_mode import CacheMode  # noqa: E402
+from utils.sqlite_cache import SQLiteCache  # noqa: E402
+
+MESSAGES = [{'role': 'user', 'content': 'Solve x + 1 = 3.'}]
+
+
+@pytest.fixture
+def server(request):
+    server = MockLLMServer(
+        latency='const:0',
+        tokens_per_second=10000,
+        completion_tokens=20,
+        answers='1,2,3,4,5,6,7,8,9',
+        seed=0,
+        ignore_n=getattr(request, 'param', False),
+    ).start()
+    yield server
+    server.stop()
+
+
+def make_llm(server, supports_n=True, **kwargs) -> TutorLLM:
+    llm = TutorLLM(
+        model='openai/mock',
+        api_key='mock',
+        base_url=f"{server.base_url}/v1",
+        temperature=1.0,
+        **kwargs,
+    )
+    # Decided by litellm from the provider otherwise
+    llm._supports_n = supports_n
+    return llm
+
+
+def test_samples_in_one_request(server):
+    samples = make_llm(server).call_samples(MESSAGES, 4)
+    assert len(samples) == 4
+    assert all('# Final Answer' in sample for sample in samples)
+    assert server.stats['requests'] == 1
+    assert server.stats['choices'] == 4
+
+
+@pytest.mark.parametrize('server', [True], indirect=True)
+def test_server_ignoring_n(server):
+    samples = make_llm(server).call_samples(MESSAGES, 3)
+    assert len(samples) == 3
+    # One request for all, then one per missing sample
+    assert server.stats['requests'] == 3
+    assert server.stats['choices'] == 3
+
+
+def test_parallel_single_requests(server):
+    samples = make_llm(server, supports_n=False).call_samples(MESSAGES, 3)
+    assert len(samples) == 3
+    assert server.stats['requests'] == 3
+
+
+def test_cache_replays_samples_per_student(server, tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'llm_cache.sqlite'))
+    written = make_llm(server, cache=cache, cache_mode=CacheMode.WRITE).call_samples(
+        MESSAGES, 4)
+    requests = server.stats['requests']
+
+    replay = make_llm(server, cache=cache, cache_mode=CacheMode.REPLAY)
+    assert replay.call_samples(MESSAGES, 4) == written
+    # A later wave gets the samples of its own students
+    assert replay.call_samples(MESSAGES, 2, first_index=2) == written[2:]
+    assert server.stats['requests'] == requests
+
+    keys = {replay.cache_key(MESSAGES, sample_index=index) for index in range(4)}
+    assert len(keys) == 4
+    with pytest.raises(LookupError):
+        replay.call_samples(MESSAGES, 2, first_index=4)
+
+
+def test_cache_read_samples_only_missing_students(server, tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'llm_cache.sqlite'))
+    written = make_llm(server, cache=cache, cache_mode=CacheMode.WRITE).call_samples(
+        MESSAGES, 2)
+
+    samples = make_llm(server, cache=cache, cache_mode=CacheMode.READ).call_samples(
+        MESSAGES, 4)
+    assert samples[:2] == written
+    assert server.stats['requests'] == 2
+    assert server.stats['choices'] == 4
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from utils.work_queue import WorkQueue, shard_of
+
+PROBLEMS = [
+    {'item_id': 'a', 'index': 0, 'question': '1 + 1'},
+    {'item_id': 'b', 'index': 1, 'question': '2 + 2'},
+]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.db'), visibility_timeout=60, poll_interval=0.01)
+    yield queue
+    queue.close()
+
+
+def expire_leases(queue):
+    with queue._lock:
+        queue._connection.execute(
+            "UPDATE items SET lease_expires = ? WHERE status = 'leased'", (time.time() - 1,))
+
+
+def test_enqueue_ignores_problems_already_queued(queue):
+    assert queue.enqueue(PROBLEMS) == 2
+    assert queue.enqueue(PROBLEMS) == 0
+    assert queue.counts() == {'pending': 2}
+
+
+def test_lease_in_order_and_complete(queue):
+    queue.enqueue(PROBLEMS)
+    assert queue.lease('w1')['item_id'] == 'a'
+    assert queue.lease('w2')['item_id'] == 'b'
+    assert queue.lease('w1') is None
+
+    assert queue.complete(PROBLEMS[0], 'w1')
+    # Only the owner of the lease completes it
+    assert not queue.complete(PROBLEMS[1], 'w1')
+    assert queue.counts() == {'done': 1, 'leased': 1}
+
+
+def test_expired_lease_is_leased_again(queue):
+    queue.enqueue(PROBLEMS[:1])
+    queue.lease('crashed')
+    assert queue.lease('w2') is None
+
+    expire_leases(queue)
+    assert queue.lease('w2')['item_id'] == 'a'
+    # The lease was lost to w2
+    assert not queue.complete(PROBLEMS[0], 'crashed')
+    assert queue.complete(PROBLEMS[0], 'w2')
+
+
+def test_renew_keeps_the_lease(queue):
+    queue.enqueue(PROBLEMS[:1])
+    queue.lease('w1')
+    expire_leases(queue)
+    assert queue.renew('w1') == 1
+    assert queue.lease('w2') is None
+
+
+def test_failed_problem_is_retried_until_the_cap(queue):
+    queue.enqueue(PROBLEMS[:1])
+    for _ in range(queue.max_attempts - 1):
+        assert queue.lease('w1') is not None
+        queue.complete(PROBLEMS[0], 'w1', 'failed', error='boom')
+        assert queue.counts() == {'pending': 1}
+
+    queue.lease('w1')
+    queue.complete(PROBLEMS[0], 'w1', 'failed', error='boom')
+    assert queue.counts() == {'failed': 1}
+    assert queue.lease('w1') is None
+
+
+def test_expired_lease_is_capped(queue):
+    queue.enqueue(PROBLEMS[:1])
+    for attempt in range(queue.max_attempts):
+        assert queue.lease(f'crashed{attempt}') is not None
+        expire_leases(queue)
+
+    assert queue.lease('w1') is None
+    assert queue.counts() == {'failed': 1}
+
+
+def test_consume_retries_failures_after_draining(queue):
+    queue.enqueue(PROBLEMS)
+    leased = list(queue.consume('w1'))
+    assert [problem['item_id'] for problem in leased] == ['a', 'b']
+
+    queue.complete(leased[0], 'w1')
+    queue.complete(leased[1], 'w1', 'failed', error='boom')
+    assert [problem['item_id'] for problem in queue.consume('w1')] == ['b']
+
+
+def test_shard_of_is_stable():
+    assert shard_of('item-1', 4) == shard_of('item-1', 4)
+    assert {shard_of(f'item-{index}', 4) for index in range(100)} == {0, 1, 2, 3}
@@ -0,0 +1,390 @@
+import math
+import re
+import threading
+import unicodedata
+from fractions import Fraction
+from typing import Optional, Tuple
+
+from utils.html_extractor import HTMLExtractor
+
+_KANJI_DIGITS = {
+    '〇': 0, '零': 0, '一': 1, '二': 2, '三': 3, '四': 4,
+    '五': 5, '六': 6, '七': 7, '八': 8, '九': 9,
+}
+_KANJI_UNITS = {'十': 10, '百': 100, '千': 1000}
+_KANJI_LARGE_UNITS = {'万': 10 ** 4, '億': 10 ** 8}
+_KANJI_NUMBER = re.compile('[〇零一二三四五六七八九十百千万億]+')
+# Kanji numerals standing alone, not part of a word such as 十分 (enough)
+_KANJI_TOKEN = re.compile(
+    r'(?<![\u3040-\u30ff\u4e00-\u9fff])[〇零一二三四五六七八九十百千万億]+'
+    r'(?![\u3040-\u30ff\u4e00-\u9fff])'
+)
+# 3分の2 and 三分の二 mean 2/3
+_JAPANESE_FRACTION = re.compile(
+    r'(?<![\u3040-\u30ff\u4e00-\u9fff])([\d.〇零一二三四五六七八九十百千万億]+)'
+    r'\s*分\s*の\s*([\d.〇零一二三四五六七八九十百千万億]+)'
+    r'(?![\u3040-\u30ff\u4e00-\u9fff])'
+)
+
+# Units and counters stripped from numeric answers
+_UNIT = re.compile(
+    r'(?P<unit>(?:[a-zμ°℃%]+(?:\^?[23])?|[²³]|[\u3040-\u30ff\u4e00-\u9fff]+)'
+    r'(?:/[a-z\u4e00-\u9fff]+)?)$'
+)
+_CJK = re.compile('[\u3040-\u30ff\u4e00-\u9fff]')
+_ANSWER_PREFIX = re.compile(r'^(?:答え?|解|ans(?:wer)?)\s*[:：は]?\s*', re.I)
+_VARIABLE_PREFIX = re.compile(r'^([a-z])=(?=[^=]+$)')
+# Decimal number at the start of a normalized answer, with its decimals
+_DECIMAL = re.compile(r'[-+]?\d*\.(\d+)(?![\d/.])')
+
+# Limits on answers parsed as expressions, which are LLM output
+MAX_EXPRESSION_LENGTH = 200
+MAX_EXPONENT = 1000
+MAX_POWER_BITS = 100_000
+# Longest run of letters read as a product of single-letter variables
+MAX_VARIABLE_RUN = 3
+# Seconds sympy may spend deciding whether two expressions are equal
+SIMPLIFY_TIMEOUT = 2.0
+
+_PLAIN_NUMBER = re.compile(r'[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:/\d+)?')
+_TOKEN = re.compile(
+    r'(?P<space>\s+)|(?P<number>\d+(?:\.\d*)?|\.\d+)|(?P<word>[a-z]+)'
+    r'|(?P<operator>\*\*|[-+*/^()])'
+)
+# Names accepted in expressions and their sympy counterparts
+_FUNCTIONS = {
+    'sqrt': 'sqrt', 'sin': 'sin', 'cos': 'cos', 'tan': 'tan',
+    'log': 'log', 'ln': 'log', 'exp': 'exp', 'abs': 'Abs',
+}
+_CONSTANTS = {'pi': 'pi'}
+
+_LATEX_REPLACEMENTS = (
+    (re.compile(r'\\[dt]?frac\s*\{([^{}]*)\}\s*\{([^{}]*)\}'), r'(\1)/(\2)'),
+    (re.compile(r'\\sqrt\s*\{([^{}]*)\}'), r'sqrt(\1)'),
+    (re.compile(r'\\(?:left|right)'), ''),
+    (re.compile(r'\\(?:times|cdot)'), '*'),
+    (re.compile(r'\\div'), '/'),
+    (re.compile(r'\\pi'), 'pi'),
+    (re.compile(r'\^\{([^{}]*)\}'), r'^(\1)'),
+    (re.compile(r'\\[,;!quad ]+'), ' '),
+)
+
+
+def kanji_to_int(text: str) -> Optional[int]:
+    """Convert a Japanese numeral such as 二千三十五 to an integer."""
+    if not text or not _KANJI_NUMBER.fullmatch(text):
+        return None
+
+    total, section, digit = 0, 0, None
+    for char in text:
+        if char in _KANJI_DIGITS:
+            # Positional style such as 二〇二四
+            digit = _KANJI_DIGITS[char] if digit is None else digit * 10 + _KANJI_DIGITS[char]
+        elif char in _KANJI_UNITS:
+            section += (1 if digit is None else digit) * _KANJI_UNITS[char]
+            digit = None
+        else:
+            section += digit or 0
+            total += (section or 1) * _KANJI_LARGE_UNITS[char]
+            section, digit = 0, None
+    return total + section + (digit or 0)
+
+
+class AnswerChecker:
+    """Decides whether final answers match the correct answer without an LLM."""
+
+    def __init__(self):
+        self._extractor = HTMLExtractor()
+
+    def check(self, answer: Optional[str], correct: Optional[str]) -> Optional[bool]:
+        """
+        Compare an answer with the correct answer.
+
+        Units are not converted, so answers in different units, or with a
+        unit on one side only, are left to the verifier.
+
+        Returns:
+            bool: True if equivalent, False if both are numbers or
+                expressions in the same unit that differ, None when it
+                cannot be decided
+        """
+        if answer is None or correct is None:
+            return None
+
+        answer_text = self.normalize(answer)
+        correct_text = self.normalize(correct)
+        if not answer_text or not correct_text:
+            return None
+        if answer_text == correct_text:
+            return True
+
+        # x=3 only matches an answer for the same variable
+        answer_variable, answer_text = self._split_variable(answer_text)
+        correct_variable, correct_text = self._split_variable(correct_text)
+        if answer_variable != correct_variable:
+            return None
+
+        answer_value, answer_unit = self._parse(answer_text)
+        correct_value, correct_unit = self._parse(correct_text)
+        if answer_value is None or correct_value is None:
+            return None
+        if answer_unit != correct_unit:
+            # 30cm and 0.3m, or 50% and 1/2, need a conversion
+            return None
+
+        equal = self._equal(answer_value, correct_value)
+        if equal is False and (
+            self._rounds_to(answer_text, answer_value, correct_value)
+            or self._rounds_to(correct_text, correct_value, answer_value)
+        ):
+            # 0.333 for 1/3 may or may not be accepted
+            return None
+        return equal
+
+    def normalize(self, answer: str) -> Optional[str]:
+        """Turn an answer into a compact, ASCII-like math expression."""
+        text = answer
+        if '<' in text:
+            text = self._extractor.extract(text) or re.sub(r'<[^>]*>', '', text)
+
+        text = unicodedata.normalize('NFKC', text)
+        text = text.replace('−', '-').replace('×', '*').replace('÷', '/')
+        for pattern, replacement in _LATEX_REPLACEMENTS:
+            text = pattern.sub(replacement, text)
+
+        # Markdown emphasis or math delimiters around the whole answer
+        text = text.strip().strip('`$').strip()
+        text = re.sub(r'^(\*\*|__)(.*)\1$', r'\2', text).strip()
+        text = _ANSWER_PREFIX.sub('', text)
+        text = re.sub(r'^マイナス', '-', text)
+        text = re.sub(r'^プラス', '+', text)
+        text = _JAPANESE_FRACTION.sub(
+            lambda m: f"({_kanji_digits(m.group(2))})/({_kanji_digits(m.group(1))})", text)
+        text = _KANJI_TOKEN.sub(lambda m: str(kanji_to_int(m.group())), text)
+
+        text = re.sub(r'\s+', '', text.lower()).rstrip('.。')
+        return text or None
+
+    @staticmethod
+    def _split_variable(text: str) -> Tuple[Optional[str], str]:
+        """Split x=3 into the variable and the value."""
+        match = _VARIABLE_PREFIX.match(text)
+        if match is None:
+            return None, text
+        return match.group(1), text[match.end():]
+
+    @staticmethod
+    def _rounds_to(text: str, value, exact) -> bool:
+        """Check whether a decimal answer is exact rounded or truncated to its decimals."""
+        match = _DECIMAL.match(text)
+        if match is None or not isinstance(value, Fraction) or not isinstance(exact, Fraction):
+            return False
+        places = len(match.group(1))
+        scale = 10 ** places
+        return value in (round(exact, places), Fraction(math.trunc(exact * scale), scale))
+
+    @staticmethod
+    def _parse(text: str) -> Tuple[Optional[object], Optional[str]]:
+        """Parse a normalized answer into a value and an optional unit."""
+        if len(text) > MAX_EXPRESSION_LENGTH:
+            return None, None
+
+        match = _UNIT.search(text)
+        if match and match.start() > 0:
+            value = _fraction(text[:match.start()])
+            if value is not None:
+                return value, match.group('unit').replace('^', '')
+
+        value = _fraction(text)
+        if value is not None:
+            return value, None
+
+        if _CJK.search(text):
+            # Words, not an expression
+            return None, None
+
+        try:
+            return _ExpressionParser(text).parse(), None
+        except Exception:
+            return None, None
+
+    @staticmethod
+    def _equal(a, b) -> Optional[bool]:
+        if isinstance(a, Fraction) and isinstance(b, Fraction):
+            return a == b
+
+        def compare():
+            import sympy
+
+            first, second = sympy.sympify(a), sympy.sympify(b)
+            if first.free_symbols != second.free_symbols:
+                # Words parsed as symbols, or answers in different variables
+                return None
+            difference = sympy.simplify(first - second)
+            if difference == 0:
+                return True
+            if difference.free_symbols:
+                return False
+            return bool(abs(sympy.N(difference)) < 1e-9)
+
+        return _with_time_limit(compare, SIMPLIFY_TIMEOUT)
+
+
+def _kanji_digits(text: str) -> str:
+    """Convert a number written in kanji to digits, leaving digits as they are."""
+    value = kanji_to_int(text)
+    return text if value is None else str(value)
+
+
+def _fraction(text: str) -> Optional[Fraction]:
+    """Parse a plain decimal or fraction, refusing anything else."""
+    if not _PLAIN_NUMBER.fullmatch(text):
+        return None
+    try:
+        return Fraction(text)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def _with_time_limit(function, seconds: float):
+    """
+    Call function in a daemon thread and return its result, or None if it
+    raises or does not return within seconds.
+    """
+    outcome = []
+
+    def target():
+        try:
+            outcome.append(function())
+        except Exception:
+            outcome.append(None)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    return outcome[0] if outcome else None
+
+
+class _ExpressionParser:
+    """
+    Recursive descent parser of arithmetic answers into sympy expressions.
+
+    Answers are LLM output, so they are never evaluated as Python: only
+    numbers, + - * / ^, parentheses, implicit multiplication, single-letter
+    variables and the functions in _FUNCTIONS are accepted, and powers too
+    large to compute are refused.
+    """
+
+    def __init__(self, text: str):
+        self.tokens = []
+        position = 0
+        while position < len(text):
+            match = _TOKEN.match(text, position)
+            if match is None:
+                raise ValueError(f"Unexpected character {text[position]!r}")
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'word':
+                if value not in _FUNCTIONS and value not in _CONSTANTS:
+                    if len(value) > MAX_VARIABLE_RUN:
+                        raise ValueError(f"Unknown name {value!r}")
+                    # 2ab is 2*a*b
+                    self.tokens.extend(('variable', letter) for letter in value)
+                    position = match.end()
+                    continue
+                kind = 'function' if value in _FUNCTIONS else 'constant'
+            if kind != 'space':
+                self.tokens.append((kind, value))
+            position = match.end()
+        self.position = 0
+
+    def parse(self):
+        import sympy
+
+        expression = self._sum()
+        if self.position != len(self.tokens):
+            raise ValueError("Unexpected trailing input")
+        if expression.has(sympy.zoo, sympy.nan, sympy.oo, -sympy.oo):
+            raise ValueError("Undefined value")
+        return expression
+
+    def _peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def _take(self):
+        token = self._peek()
+        self.position += 1
+        return token
+
+    def _sum(self):
+        value = self._product()
+        while self._peek()[1] in ('+', '-'):
+            operator = self._take()[1]
+            operand = self._product()
+            value = value + operand if operator == '+' else value - operand
+        return value
+
+    def _product(self):
+        value = self._unary()
+        while True:
+            kind, token = self._peek()
+            if token in ('*', '/'):
+                self._take()
+                operand = self._unary()
+                value = value * operand if token == '*' else value / operand
+            elif kind in ('number', 'variable', 'constant', 'function') or token == '(':
+                # Implicit multiplication: 2x, 3(x+1), (x+1)(x-1)
+                value = value * self._power()
+            else:
+                return value
+
+    def _unary(self):
+        if self._peek()[1] in ('+', '-'):
+            operator = self._take()[1]
+            operand = self._unary()
+            return -operand if operator == '-' else operand
+        return self._power()
+
+    def _power(self):
+        base = self._primary()
+        if self._peek()[1] in ('^', '**'):
+            self._take()
+            exponent = self._unary()
+            _check_power(base, exponent)
+            return base ** exponent
+        return base
+
+    def _primary(self):
+        import sympy
+
+        kind, token = self._take()
+        if kind == 'number':
+            return sympy.Rational(token)
+        if kind == 'variable':
+            return sympy.Symbol(token)
+        if kind == 'constant':
+            return getattr(sympy, _CONSTANTS[token])
+        if kind == 'function':
+            # sqrt(2) and sqrt 2
+            return getattr(sympy, _FUNCTIONS[token])(self._unary())
+        if token == '(':
+            value = self._sum()
+            if self._take()[1] != ')':
+                raise ValueError("Unbalanced parentheses")
+            return value
+        raise ValueError(f"Unexpected token {token!r}")
+
+
+def _check_power(base, exponent):
+    """Refuse powers whose value would be too large to compute."""
+    if not exponent.is_number:
+        return
+    size = abs(complex(exponent.evalf()))
+    if size > MAX_EXPONENT:
+        raise ValueError("Exponent too large")
+    if base.is_number:
+        magnitude = abs(complex(base.evalf()))
+        if magnitude and abs(math.log2(magnitude)) * size > MAX_POWER_BITS:
+            raise ValueError("Power too large")
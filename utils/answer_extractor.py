@@ -0,0 +1,70 @@
+import re
+import unicodedata
+from typing import Optional
+
+# "# Final Answer" section required by the student expected_output
+_FINAL_ANSWER_SECTION = re.compile(
+    r'^#+\s*Final Answer\s*$(?P<section>.*?)(?=^#+\s|\Z)', re.I | re.M | re.S)
+_ANSWER_LINE = re.compile(r'The answer is\s*[:：]\s*(?P<answer>.+)', re.I)
+# "* Correct solution found: yes" line of the verifier conclusion
+_VERDICT_LINE = re.compile(
+    r'Correct solutions? found\s*[:：]\s*\**\s*\[?(?P<verdict>yes|no)\b(?!\s*/)', re.I)
+
+
+def extract_final_answer(solution: str) -> Optional[str]:
+    """
+    Extract the final answer from a student solution.
+
+    Reads the "* The answer is: ..." line of the "# Final Answer" section,
+    falling back to the last such line anywhere in the solution.
+
+    Returns:
+        str: The answer as written by the student, or None if not found
+    """
+    if not solution:
+        return None
+
+    section = _FINAL_ANSWER_SECTION.search(solution)
+    search_in = section.group('section') if section else solution
+    matches = _ANSWER_LINE.findall(search_in)
+    if not matches:
+        return None
+
+    answer = matches[-1].strip().strip('*').strip()
+    return answer or None
+
+
+def normalize_answer(answer: Optional[str]) -> Optional[str]:
+    """
+    Normalize an answer for exact comparison.
+
+    Folds full-width characters, case, whitespace, emphasis markers and
+    trailing punctuation so that trivially different spellings compare equal.
+    """
+    if answer is None:
+        return None
+
+    text = unicodedata.normalize('NFKC', answer).lower()
+    text = re.sub(r'[*_`$]', '', text)
+    text = re.sub(r'\s+', '', text)
+    text = text.rstrip('.。')
+    return text or None
+
+
+def extract_verdict(verification: str) -> Optional[bool]:
+    """
+    Extract whether the verifier found a correct solution.
+
+    Reads the last "Correct solution found: yes/no" line, which is the one
+    of the "# Conclusion" section.
+
+    Returns:
+        bool: True or False, or None if the verifier did not say
+    """
+    if not verification:
+        return None
+
+    matches = _VERDICT_LINE.findall(verification)
+    if not matches:
+        return None
+    return matches[-1].lower() == 'yes'
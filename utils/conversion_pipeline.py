@@ -0,0 +1,138 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Deque, Dict, Iterable, Iterator, List, Tuple
+
+from utils.html_to_text import HTMLToText, ocr_image
+from utils.metrics import metrics, problem_key
+
+CONTENT_TYPES = ('question', 'answer')
+
+
+def _init_ocr_worker():
+    """Keep each Tesseract process on one core, the pool provides parallelism"""
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+def _timed_ocr(image, lang, config):
+    """OCR PNG bytes, returning the text with the start time and duration"""
+    started_at = time.time()
+    start = time.perf_counter()
+    text = ocr_image(image, lang, config)
+    return text, started_at, time.perf_counter() - start
+
+
+class ConversionPipeline:
+    """Converts problems ahead of the LLM stage, overlapping render and OCR"""
+
+    def __init__(self, converter: HTMLToText, workers=None, lookahead=None):
+        """
+        Initialize the pipeline
+        Args:
+            converter (HTMLToText): Converter providing the renderer and cache
+            workers (int): Number of OCR processes (default: CPU count)
+            lookahead (int): Number of problems converted ahead of the one
+                being consumed (default: twice the number of OCR processes)
+        """
+        self.converter = converter
+        self.workers = workers or os.cpu_count() or 1
+        self.lookahead = lookahead or self.workers * 2
+
+    def run(self, problems: Iterable[dict]) -> Iterator[dict]:
+        """
+        Convert problems and yield them in input order
+
+        Each yielded problem gets 'question_text' and 'answer_text' keys, or
+        a 'conversion_error' key holding the exception if conversion failed.
+        """
+        render_pool = ThreadPoolExecutor(max_workers=self.converter.renderer.tabs)
+        ocr_pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_ocr_worker
+        )
+        pending: Deque[Tuple[dict, Dict]] = deque()
+        try:
+            for problem in problems:
+                if len(pending) >= self.lookahead:
+                    yield self._finish(*pending.popleft())
+                pending.append((problem, self._start(problem, render_pool, ocr_pool)))
+
+            while pending:
+                yield self._finish(*pending.popleft())
+        finally:
+            render_pool.shutdown(wait=True, cancel_futures=True)
+            ocr_pool.shutdown(wait=True, cancel_futures=True)
+
+    def _start(self, problem, render_pool, ocr_pool) -> Dict:
+        """Submit the conversion of both contents of a problem"""
+        jobs = {}
+        problem_id = problem_key(problem)
+        for content_type in CONTENT_TYPES:
+            try:
+                with metrics.stage('extract', problem_id):
+                    text, html_content, cache_key = self.converter.resolve_content(
+                        problem, content_type)
+            except Exception as e:
+                # Fails this problem only, like a failed render or OCR
+                jobs[content_type] = (None, e)
+                continue
+            if text is not None:
+                jobs[content_type] = (None, text)
+                continue
+
+            jobs[content_type] = (
+                cache_key,
+                render_pool.submit(
+                    self._render_then_ocr,
+                    html_content, ocr_pool, problem_id, time.perf_counter(),
+                ),
+            )
+        return jobs
+
+    def _render_then_ocr(
+        self, html_content, ocr_pool, problem_id, submitted
+    ) -> Tuple[float, List[Future]]:
+        """Render on a browser tab, then hand the PNG bands to the OCR processes"""
+        metrics.add_wait(time.perf_counter() - submitted, 'render', problem_id)
+        with metrics.stage('render', problem_id):
+            image = self.converter.html_to_image(html_content)
+            if image is None:
+                raise ValueError("Error converting HTML to image")
+            bands = self.converter.prepare(image)
+        return time.time(), [
+            ocr_pool.submit(_timed_ocr, band, self.converter.lang, self.converter.ocr_config)
+            for band in bands
+        ]
+
+    def _finish(self, problem, jobs) -> dict:
+        """Wait for the conversion of a problem and attach the texts"""
+        converted = dict(problem)
+        for content_type, (cache_key, job) in jobs.items():
+            if isinstance(job, Exception):
+                converted['conversion_error'] = ValueError(
+                    f"Error converting {content_type}: {job}")
+                continue
+            if cache_key is None:
+                converted[f'{content_type}_text'] = job
+                continue
+
+            try:
+                ocr_submitted, ocr_futures = job.result()
+                results = [future.result() for future in ocr_futures]
+                text = "\n".join(band_text for band_text, _, _ in results)
+                if results:
+                    # Bands are OCR'd in parallel, the stage lasts from the
+                    # first start to the last end
+                    ocr_started = min(started for _, started, _ in results)
+                    ocr_ended = max(started + seconds for _, started, seconds in results)
+                    problem_id = problem_key(problem)
+                    metrics.add_wait(max(0.0, ocr_started - ocr_submitted), 'ocr', problem_id)
+                    metrics.add('ocr', 'wall', ocr_ended - ocr_started, problem_id)
+            except Exception as e:
+                converted['conversion_error'] = ValueError(
+                    f"Error converting {content_type}: {e}")
+                continue
+
+            self.converter.store_ocr_text(cache_key, text)
+            converted[f'{content_type}_text'] = text
+        return converted
@@ -1,5 +1,5 @@
 import csv
-from typing import Dict, List
+from typing import Dict, Iterator, List
 
 
 class CSVReader:
@@ -13,61 +13,39 @@ class CSVReader:
         Reads a CSV file and returns a list of dictionaries.
         Empty item_ids are filled with the previous valid item_id.
         """
-        try:
-            with open(self.filepath, mode='r', encoding='utf-8') as file:
-                csv_reader = csv.DictReader(file)
-                original_rows = list(csv_reader)
-
-                # Fill empty item_ids into temp_rows
-                temp_rows = []
-                previous_id = None
-                for row in original_rows:
-                    # Create a new dict to avoid modifying original row
-                    new_row = row.copy()
-                    if not new_row['item_id'].strip():
-                        if previous_id is None:
-                            raise ValueError("First row cannot have empty item_id")
-                        new_row['item_id'] = previous_id
-                    else:
-                        previous_id = new_row['item_id']
-                    temp_rows.append(new_row)
-
-                # Count occurrences of each item_id
-                item_id_counts = {}
-                for row in original_rows:
-                    item_id = row['item_id']
-                    item_id_counts[item_id] = item_id_counts.get(item_id, 0) + 1
+        return list(self.iter_problems())
 
-                # Group by item_id and fill data
-                item_descriptions = {}
-                correct_options = {}
-                for row in temp_rows:
-                    item_id = row['item_id'].strip()
-                    if row['item_description'] and item_id not in item_descriptions:
-                        item_descriptions[item_id] = row['item_description']
-                    if row['correct_option'].upper() == 'TRUE':
-                        correct_options[item_id] = row['options']
+    def iter_problems(self) -> Iterator[Dict]:
+        """
+        Streams the problems of a CSV file in a single pass.
 
-                # Create final list with processed data
-                processed_rows = []
-                for row in original_rows:
+        Rows sharing an item_id (or continuing it with an empty item_id) must
+        be contiguous, an item_id appearing again after other items raises a
+        ValueError. Each group is yielded as soon as its run of rows ends, so
+        memory is bounded by the largest group.
+        """
+        try:
+            with open(self.filepath, mode='r', encoding='utf-8') as file:
+                group: List[Dict] = []
+                finished = set()
+                reader = csv.DictReader(file)
+                for row in reader:
                     item_id = row['item_id'].strip()
-                    if bool(item_id):
-                        processed_rows.append({
-                            'question': row['question_content'] if (
-                                item_id_counts[item_id] > 1 or
-                                not row['item_description'].strip()
-                            ) else '',
-                            'answer': correct_options.get(item_id),
-                            'item_id': item_id,
-                            'item_description': (
-                                item_descriptions.get(item_id) or
-                                row['item_description']
-                            ),
-                            'explanation': row['explanation']
-                        })
+                    if not item_id:
+                        if not group:
+                            raise ValueError("First row cannot have empty item_id")
+                    elif group and item_id != group[0]['item_id'].strip():
+                        yield from self._process_group(group)
+                        finished.add(group[0]['item_id'].strip())
+                        group = []
+                    if item_id in finished:
+                        raise ValueError(
+                            f"Rows of item_id {item_id} are not contiguous "
+                            f"(line {reader.line_num})")
+                    group.append(row)
 
-                return processed_rows
+                if group:
+                    yield from self._process_group(group)
 
         except FileNotFoundError:
             raise FileNotFoundError(f"CSV file not found at: {self.filepath}")
@@ -76,6 +54,34 @@ class CSVReader:
         except IOError as e:
             raise IOError(f"Error reading CSV file: {str(e)}")
 
+    @staticmethod
+    def _process_group(rows: List[Dict]) -> Iterator[Dict]:
+        """Fill the shared data of an item_id group and yield its problems"""
+        item_id = rows[0]['item_id'].strip()
+
+        # Rows with an explicit item_id, continuation rows have an empty one
+        item_rows = [row for row in rows if row['item_id'].strip()]
+        item_description = next(
+            (row['item_description'] for row in rows if row['item_description']),
+            None,
+        )
+        answer = None
+        for row in rows:
+            if row['correct_option'].upper() == 'TRUE':
+                answer = row['options']
+
+        for row in item_rows:
+            yield {
+                'question': row['question_content'] if (
+                    len(item_rows) > 1 or
+                    not row['item_description'].strip()
+                ) else '',
+                'answer': answer,
+                'item_id': item_id,
+                'item_description': item_description or row['item_description'],
+                'explanation': row['explanation']
+            }
+
     def read_to_dict_with_key(self, key_column: str) -> Dict:
         """
         Reads a CSV file and returns a dictionary where a specified column
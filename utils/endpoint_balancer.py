@@ -0,0 +1,174 @@
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+@dataclass
+class Endpoint:
+    """A model server and its load."""
+
+    url: str
+    weight: float = 1.0
+    outstanding: int = 0
+    failures: int = 0
+    ejected_at: Optional[float] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_at is None
+
+
+class EndpointBalancer:
+    """
+    Spreads requests over model servers by least outstanding requests.
+
+    Each request goes to the healthy endpoint with the fewest requests in
+    flight relative to its weight. An endpoint failing several requests in a
+    row, or its health check, is ejected; a background thread checks the
+    endpoints periodically and lets an ejected one back in once it answers.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        health_path: str = '/api/tags',
+        check_interval: float = 10.0,
+        eject_after: int = 3,
+        timeout: float = 5.0,
+    ):
+        """
+        Initialize the balancer.
+
+        Args:
+            endpoints: Endpoints to balance over
+            health_path: Path requested by the health check
+            check_interval: Seconds between health checks
+            eject_after: Consecutive failed requests that eject an endpoint
+            timeout: Timeout of a health check in seconds
+        """
+        if not endpoints:
+            raise ValueError("At least one endpoint is required")
+        self.endpoints = endpoints
+        self.health_path = health_path
+        self.check_interval = check_interval
+        self.eject_after = eject_after
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._checker = None
+
+    @classmethod
+    def parse(cls, spec: str, **kwargs) -> 'EndpointBalancer':
+        """
+        Build a balancer from a comma-separated list of URLs with weights.
+
+        Example: "http://gpu1:11434=3,http://gpu2:11434" gives the first
+        endpoint three times the requests of the second (weight 1).
+        """
+        endpoints = []
+        for item in spec.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            url, _, weight = item.partition('=')
+            endpoints.append(Endpoint(url.rstrip('/'), float(weight or 1)))
+        return cls(endpoints, **kwargs)
+
+    @contextmanager
+    def acquire(self):
+        """Reserve the least loaded endpoint and yield its URL."""
+        endpoint = self._pick()
+        try:
+            yield endpoint.url
+        except Exception:
+            self._report(endpoint, ok=False)
+            raise
+        else:
+            self._report(endpoint, ok=True)
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    def _pick(self) -> Endpoint:
+        self._start_checker()
+        with self._lock:
+            # With every endpoint ejected, keep trying them rather than failing
+            candidates = [e for e in self.endpoints if e.healthy] or self.endpoints
+            endpoint = min(
+                candidates, key=lambda e: ((e.outstanding + 1) / e.weight, e.outstanding))
+            endpoint.outstanding += 1
+            return endpoint
+
+    def _report(self, endpoint: Endpoint, ok: bool):
+        with self._lock:
+            if ok:
+                endpoint.failures = 0
+                endpoint.ejected_at = None
+                return
+            endpoint.failures += 1
+            if endpoint.failures >= self.eject_after and endpoint.healthy:
+                endpoint.ejected_at = time.monotonic()
+                print(f"Ejected {endpoint.url} after {endpoint.failures} failed requests")
+
+    def check(self):
+        """Health check every endpoint, ejecting or re-admitting it."""
+        for endpoint in self.endpoints:
+            try:
+                with urllib.request.urlopen(
+                        endpoint.url + self.health_path, timeout=self.timeout) as response:
+                    ok = response.status < 500
+            except Exception:
+                ok = False
+
+            with self._lock:
+                if ok and not endpoint.healthy:
+                    print(f"Re-admitted {endpoint.url}")
+                    endpoint.failures = 0
+                    endpoint.ejected_at = None
+                elif not ok and endpoint.healthy:
+                    print(f"Ejected {endpoint.url} after a failed health check")
+                    endpoint.ejected_at = time.monotonic()
+
+    def _start_checker(self):
+        if self._checker is not None or len(self.endpoints) < 2:
+            return
+        with self._lock:
+            if self._checker is None:
+                self._checker = threading.Thread(target=self._check_loop, daemon=True)
+                self._checker.start()
+
+    def _check_loop(self):
+        while not self._stopped.wait(self.check_interval):
+            self.check()
+
+    def close(self):
+        self._stopped.set()
+
+
+_http_lock = threading.Lock()
+
+
+def share_http_connections(max_connections: int = 100):
+    """
+    Keep HTTP connections to model servers alive and shared by every LLM.
+
+    litellm creates a client per request for OpenAI-compatible endpoints
+    unless a client session is set; Ollama requests already go through its
+    module-level client, which keeps connections alive.
+    """
+    import litellm
+
+    with _http_lock:
+        if litellm.client_session is None:
+            import httpx
+
+            litellm.client_session = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+                timeout=None,
+            )
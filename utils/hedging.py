@@ -0,0 +1,108 @@
+import random
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+from utils.metrics import bind_context, metrics, percentile
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = (
+    'RateLimitError',
+    'Timeout',
+    'APITimeoutError',
+    'APIConnectionError',
+    'ServiceUnavailableError',
+    'InternalServerError',
+)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether a failed LLM request may succeed if sent again."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if getattr(error, 'status_code', None) in RETRYABLE_STATUSES:
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+def backoff_delay(attempt: int, error: Exception = None, base: float = 1.0, cap: float = 30.0) -> float:
+    """Return the delay before retry `attempt` (0-based), honoring Retry-After."""
+    try:
+        retry_after = float(error.response.headers.get('retry-after'))
+        return min(cap, retry_after)
+    except (AttributeError, TypeError, ValueError):
+        pass
+    # Full jitter keeps retrying clients from synchronizing
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class LatencyTracker:
+    """Rolling window of the latencies of one model, shared by its LLMs."""
+
+    _registry: Dict[str, 'LatencyTracker'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Initialize the tracker.
+
+        Args:
+            window: Number of recent latencies kept
+            min_samples: Latencies needed before percentiles are trusted
+        """
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, key: str) -> 'LatencyTracker':
+        """Return the process-wide tracker for key (e.g. a model)."""
+        with cls._registry_lock:
+            if key not in cls._registry:
+                cls._registry[key] = cls()
+            return cls._registry[key]
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the q-th quantile of recent latencies, or None while warming up."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            values = list(self._latencies)
+        return percentile(values, q)
+
+
+def first_completed(primary: Callable, backup: Callable, hedge_after: Optional[float]):
+    """
+    Run primary, and backup as well if primary is still running after
+    hedge_after seconds. Returns the first successful result; the slower
+    request is abandoned and finishes in the background.
+
+    Raises:
+        Exception: The last error if every request failed
+    """
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        futures = {executor.submit(bind_context(primary))}
+        if hedge_after is not None:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                metrics.count('hedged_requests')
+                futures.add(executor.submit(bind_context(backup)))
+
+        error = None
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+        raise error
+    finally:
+        executor.shutdown(wait=False)
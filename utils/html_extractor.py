@@ -0,0 +1,280 @@
+import re
+from html.parser import HTMLParser
+from typing import List, Optional
+
+# Elements whose content is only visible once rendered
+VISUAL_TAGS = {'img', 'canvas', 'svg', 'object', 'embed', 'iframe', 'video', 'picture'}
+
+# Inline styles that draw content or move it around visually
+VISUAL_STYLE = re.compile(r'url\(|background-image|position\s*:\s*absolute|transform\s*:', re.I)
+
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr',
+}
+
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'center', 'dd', 'div', 'dl',
+    'dt', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4',
+    'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre',
+    'section', 'table', 'tr', 'ul',
+}
+
+SKIPPED_TAGS = {'head', 'style', 'title', 'noscript'}
+
+# Start tags that imply the end of open elements: the elements they close,
+# and the elements bounding the search for them
+IMPLIED_END = {
+    'li': ({'li'}, {'ul', 'ol'}),
+    'dt': ({'dt', 'dd'}, {'dl'}),
+    'dd': ({'dt', 'dd'}, {'dl'}),
+    'td': ({'td', 'th'}, {'tr', 'table'}),
+    'th': ({'td', 'th'}, {'tr', 'table'}),
+    'tr': ({'tr', 'td', 'th'}, {'table', 'thead', 'tbody', 'tfoot'}),
+    'thead': ({'thead', 'tbody', 'tfoot', 'tr', 'td', 'th'}, {'table'}),
+    'tbody': ({'thead', 'tbody', 'tfoot', 'tr', 'td', 'th'}, {'table'}),
+    'tfoot': ({'thead', 'tbody', 'tfoot', 'tr', 'td', 'th'}, {'table'}),
+}
+
+# Elements bounding the search for an open paragraph closed by a block
+PARAGRAPH_SCOPE = {'table', 'td', 'th', 'caption', 'button', 'object'}
+
+
+class _Node:
+    """Element of the parsed HTML tree"""
+
+    def __init__(self, tag: str, attrs: dict, parent: Optional['_Node'] = None):
+        self.tag = tag
+        self.attrs = attrs
+        self.parent = parent
+        self.children: List = []
+
+
+class _TreeBuilder(HTMLParser):
+    """Builds a lenient element tree from an HTML fragment"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node('#root', {})
+        self.current = self.root
+        self.tags = set()
+        self.visual_style = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        self.tags.add(tag)
+        self._close_implied(tag)
+        if VISUAL_STYLE.search(attrs.get('style') or ''):
+            self.visual_style = True
+        node = _Node(tag, attrs, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.current = self.current.parent
+
+    def _close_implied(self, tag):
+        """Close the elements whose end tag the start of tag implies"""
+        rules = []
+        if tag in IMPLIED_END:
+            rules.append(IMPLIED_END[tag])
+        if tag in BLOCK_TAGS:
+            rules.append(({'p'}, PARAGRAPH_SCOPE))
+
+        for closed_tags, boundaries in rules:
+            node, closed = self.current, None
+            while node is not self.root and node.tag not in boundaries:
+                if node.tag in closed_tags:
+                    closed = node
+                node = node.parent
+            if closed is not None:
+                self.current = closed.parent
+
+    def handle_endtag(self, tag):
+        # Close up to the matching open element, ignore stray end tags
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+class HTMLExtractor:
+    """Converts simple HTML markup to text without rendering it"""
+
+    def __init__(self, min_text_ratio=0.01):
+        """
+        Initialize the extractor
+        Args:
+            min_text_ratio (float): Minimum ratio of extracted characters to
+                HTML characters below which the extraction is not trusted
+        """
+        self.min_text_ratio = min_text_ratio
+
+    def extract(self, html: str) -> Optional[str]:
+        """
+        Extract the text of an HTML fragment
+        Returns:
+            str: Extracted text, or None if the fragment has to be rendered
+                (images, canvas, SVG, visual styles or failed confidence check)
+        """
+        builder = _TreeBuilder()
+        builder.feed(html)
+        builder.close()
+
+        if builder.tags & VISUAL_TAGS or builder.visual_style:
+            return None
+
+        text = self._normalize(self._render(builder.root))
+        if not self._is_confident(html, text):
+            return None
+        return text
+
+    def _is_confident(self, html: str, text: str) -> bool:
+        """Reject extractions that lost the content"""
+        if '�' in text:
+            return False
+        visible = re.sub(r'<[^>]*>', '', html).strip()
+        if visible and not text:
+            return False
+        return len(text) >= self.min_text_ratio * len(html.strip())
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        lines = [re.sub(r'[ \t\r\f\v]+', ' ', line).strip() for line in text.split('\n')]
+        return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+    def _render(self, node) -> str:
+        if isinstance(node, str):
+            return node
+
+        tag = node.tag
+        if tag in SKIPPED_TAGS:
+            return ''
+        if tag == 'script':
+            # Keep TeX sources (e.g. MathJax), drop code
+            if 'tex' in (node.attrs.get('type') or ''):
+                return f"${self._children(node)}$"
+            return ''
+        if tag == 'br':
+            return '\n'
+        if tag == 'math':
+            return f" {self._math(node).strip()} "
+        if tag == 'sup':
+            return self._script('^', self._children(node))
+        if tag == 'sub':
+            return self._script('_', self._children(node))
+        if tag == 'table':
+            return f"\n{self._table(node)}\n"
+        if tag in ('ul', 'ol'):
+            return f"\n{self._list(node)}\n"
+
+        content = self._children(node)
+        if tag in BLOCK_TAGS:
+            return f"\n{content}\n"
+        if tag in ('td', 'th'):
+            return f" {content} "
+        return content
+
+    def _children(self, node) -> str:
+        return ''.join(self._render(child) for child in node.children)
+
+    @staticmethod
+    def _script(marker: str, content: str) -> str:
+        content = content.strip()
+        if len(content) <= 1:
+            return f"{marker}{content}"
+        return f"{marker}({content})"
+
+    def _table(self, table) -> str:
+        """Render table rows as '|' separated cells"""
+        rows = []
+        for row in self._find_all(table, 'tr'):
+            cells = [
+                self._normalize(self._children(cell)).replace('\n', ' ')
+                for cell in row.children
+                if not isinstance(cell, str) and cell.tag in ('td', 'th')
+            ]
+            rows.append(f"| {' | '.join(cells)} |")
+        return '\n'.join(rows)
+
+    def _list(self, node) -> str:
+        """Render list items with bullets or numbers"""
+        ordered = node.tag == 'ol'
+        start = 1
+        if ordered:
+            try:
+                start = int(node.attrs.get('start') or 1)
+            except ValueError:
+                pass
+        items = [
+            child for child in node.children
+            if not isinstance(child, str) and child.tag == 'li'
+        ]
+        lines = []
+        for number, item in enumerate(items, start):
+            marker = f"{number}." if ordered else '-'
+            content = self._normalize(self._children(item)).replace('\n', ' ')
+            lines.append(f"{marker} {content}")
+        return '\n'.join(lines)
+
+    def _find_all(self, node, tag) -> List[_Node]:
+        """Find descendant elements, not looking inside nested tables"""
+        found = []
+        for child in node.children:
+            if isinstance(child, str):
+                continue
+            if child.tag == tag:
+                found.append(child)
+            elif child.tag != 'table':
+                found.extend(self._find_all(child, tag))
+        return found
+
+    def _math(self, node) -> str:
+        """Linearize MathML, preferring an embedded TeX annotation"""
+        if isinstance(node, str):
+            return node.strip()
+
+        tag = node.tag
+        elements = [child for child in node.children if not isinstance(child, str)]
+        parts = [self._math(child) for child in elements]
+
+        if tag == 'semantics':
+            for child in elements:
+                if child.tag == 'annotation' and 'tex' in (child.attrs.get('encoding') or ''):
+                    return f"${self._children(child).strip()}$"
+            return parts[0] if parts else ''
+        if tag in ('annotation', 'annotation-xml'):
+            return ''
+        if tag == 'mfrac' and len(parts) == 2:
+            return f"({parts[0]})/({parts[1]})"
+        if tag == 'msqrt':
+            return f"sqrt({''.join(parts)})"
+        if tag == 'mroot' and len(parts) == 2:
+            return f"root({parts[0]}, {parts[1]})"
+        if tag == 'msup' and len(parts) == 2:
+            return f"{parts[0]}{self._script('^', parts[1])}"
+        if tag == 'msub' and len(parts) == 2:
+            return f"{parts[0]}{self._script('_', parts[1])}"
+        if tag == 'msubsup' and len(parts) == 3:
+            return f"{parts[0]}{self._script('_', parts[1])}{self._script('^', parts[2])}"
+        if tag == 'mfenced':
+            opening = node.attrs.get('open', '(')
+            closing = node.attrs.get('close', ')')
+            separator = node.attrs.get('separators', ',')[:1] or ','
+            return f"{opening}{separator.join(parts)}{closing}"
+        if tag in ('mi', 'mn', 'mo', 'mtext', 'ms'):
+            return self._children(node).strip()
+        if tag == 'mtable':
+            return '; '.join(parts)
+        if tag == 'mtr':
+            return ', '.join(parts)
+        if tag == 'mspace':
+            return ' '
+        return ''.join(parts)
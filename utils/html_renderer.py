@@ -0,0 +1,347 @@
+import atexit
+import base64
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Queue
+from typing import List
+
+import websocket
+
+# Resolves once web fonts are loaded, images are decoded and two animation
+# frames have passed, i.e. once layout and paint of the new document are done
+_LAYOUT_DONE_SCRIPT = """
+Promise.all(Array.from(document.images).map(img => img.complete ? null :
+    new Promise(resolve => { img.onload = img.onerror = resolve; })))
+  .then(() => document.fonts.ready)
+  .then(() => new Promise(resolve =>
+    requestAnimationFrame(() => requestAnimationFrame(() => resolve(true)))))
+"""
+
+# Bounding box of the rendered content in CSS pixels, including overflow
+# beyond the viewport
+_CONTENT_BOX_SCRIPT = """
+(() => {
+  const range = document.createRange();
+  range.selectNodeContents(document.body);
+  const box = range.getBoundingClientRect();
+  return JSON.stringify({
+    x: Math.max(0, Math.floor(box.left + window.scrollX)),
+    y: Math.max(0, Math.floor(box.top + window.scrollY)),
+    width: Math.ceil(box.width),
+    height: Math.ceil(box.height),
+  });
+})()
+"""
+
+_BROWSER_NAMES = (
+    'google-chrome',
+    'google-chrome-stable',
+    'chromium',
+    'chromium-browser',
+    'chrome',
+    'msedge',
+)
+
+
+def find_browser() -> str:
+    """Find a Chrome/Chromium executable, honouring the CHROME_PATH variable."""
+    executable = os.getenv('CHROME_PATH')
+    if executable:
+        return executable
+    for name in _BROWSER_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    raise FileNotFoundError("Chrome executable not found, set CHROME_PATH")
+
+
+# Renderers still open, closed at exit without keeping them alive until then
+_renderers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_renderers():
+    for renderer in list(_renderers):
+        renderer.close()
+
+
+class _Tab:
+    """A browser tab driven over its own DevTools websocket."""
+
+    def __init__(
+        self,
+        websocket_url: str,
+        size: tuple,
+        scale: float,
+        timeout: float,
+        clip: bool = False,
+        close_url: str = None,
+    ):
+        self.clip = clip
+        self.timeout = timeout
+        self.close_url = close_url
+        self._connection = websocket.create_connection(
+            websocket_url, timeout=timeout, suppress_origin=True
+        )
+        self._next_id = 0
+        self.send('Page.enable')
+        self.send('Emulation.setDeviceMetricsOverride', {
+            'width': size[0],
+            'height': size[1],
+            'deviceScaleFactor': scale,
+            'mobile': False,
+        })
+        self.frame_id = self.send('Page.getFrameTree')['frameTree']['frame']['id']
+
+    def send(self, method: str, params: dict = None) -> dict:
+        """Send a DevTools command and return its result."""
+        self._next_id += 1
+        message_id = self._next_id
+        self._connection.send(json.dumps({
+            'id': message_id,
+            'method': method,
+            'params': params or {},
+        }))
+        while True:
+            message = json.loads(self._connection.recv())
+            # Skip events and stale responses
+            if message.get('id') != message_id:
+                continue
+            if 'error' in message:
+                raise RuntimeError(f"DevTools {method} failed: {message['error']}")
+            return message.get('result', {})
+
+    def render(self, html: str) -> bytes:
+        """Replace the document with html and return a PNG screenshot."""
+        self.send('Page.setDocumentContent', {'frameId': self.frame_id, 'html': html})
+        self.send('Runtime.evaluate', {
+            'expression': _LAYOUT_DONE_SCRIPT,
+            'awaitPromise': True,
+        })
+        params = {'format': 'png'}
+        if self.clip:
+            # Capture the content only, however small or tall it is
+            box = json.loads(self.send('Runtime.evaluate', {
+                'expression': _CONTENT_BOX_SCRIPT,
+                'returnByValue': True,
+            })['result']['value'])
+            if box['width'] > 0 and box['height'] > 0:
+                params['clip'] = {**box, 'scale': 1}
+                params['captureBeyondViewport'] = True
+        screenshot = self.send('Page.captureScreenshot', params)
+        return base64.b64decode(screenshot['data'])
+
+    def close(self, close_target: bool = False):
+        """
+        Close the connection to the tab.
+
+        Args:
+            close_target (bool): Also close the tab in the browser, so that a
+                dropped tab does not keep its page alive
+        """
+        try:
+            self._connection.close()
+        except Exception:
+            pass
+        if close_target and self.close_url:
+            try:
+                urllib.request.urlopen(self.close_url, timeout=self.timeout).close()
+            except Exception:
+                # The browser is gone, and its tabs with it
+                pass
+
+
+class HTMLRenderer:
+    """
+    Renders HTML fragments to PNG with a single long-lived headless browser
+
+    A tab whose connection breaks is dropped and replaced on next use, and
+    the browser is restarted if it exited.
+    """
+
+    def __init__(
+        self,
+        size=(1024, 768),
+        scale=2,
+        tabs=1,
+        timeout=30,
+        browser_executable=None,
+        clip=False,
+    ):
+        """
+        Initialize the renderer. The browser is started on first use.
+        Args:
+            size (tuple): Viewport size in CSS pixels
+            scale (float): Device scale factor of the screenshots
+            tabs (int): Number of tabs rendering in parallel
+            timeout (float): Timeout of a single DevTools command in seconds
+            browser_executable (str): Path to Chrome (found automatically if None)
+            clip (bool): Capture the bounding box of the content instead of
+                the whole viewport
+        """
+        self.size = size
+        self.scale = scale
+        self.tabs = max(1, tabs)
+        self.timeout = timeout
+        self.browser_executable = browser_executable
+        self.clip = clip
+        self._process = None
+        self._port = None
+        self._user_data_dir = None
+        self._idle_tabs: Queue[_Tab] = Queue()
+        self._all_tabs: List[_Tab] = []
+        self._lock = threading.Lock()
+        _renderers.add(self)
+
+    def _start(self):
+        """Launch the browser and open the tab pool"""
+        executable = self.browser_executable or find_browser()
+        self._user_data_dir = tempfile.mkdtemp(prefix='ai-tutor-chrome-')
+        self._process = subprocess.Popen(
+            [
+                executable,
+                '--headless=new',
+                '--disable-gpu',
+                '--hide-scrollbars',
+                '--no-first-run',
+                '--no-default-browser-check',
+                '--remote-debugging-port=0',
+                '--remote-allow-origins=*',
+                f'--user-data-dir={self._user_data_dir}',
+                f'--window-size={self.size[0]},{self.size[1]}',
+                'about:blank',
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self._port = self._wait_for_port()
+        self._open_tabs()
+
+    def _open_tabs(self):
+        """Open tabs until the pool is full"""
+        while len(self._all_tabs) < self.tabs:
+            request = urllib.request.Request(
+                f'http://127.0.0.1:{self._port}/json/new?about:blank', method='PUT'
+            )
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                target = json.loads(response.read())
+            tab = _Tab(
+                target['webSocketDebuggerUrl'],
+                self.size,
+                self.scale,
+                self.timeout,
+                self.clip,
+                close_url=f"http://127.0.0.1:{self._port}/json/close/{target['id']}",
+            )
+            self._all_tabs.append(tab)
+            self._idle_tabs.put(tab)
+
+    def _wait_for_port(self) -> int:
+        """Wait until the browser writes its DevTools port"""
+        port_file = os.path.join(self._user_data_dir, 'DevToolsActivePort')
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError("Browser exited before DevTools was available")
+            if os.path.exists(port_file):
+                with open(port_file, encoding='utf-8') as f:
+                    first_line = f.readline().strip()
+                if first_line:
+                    return int(first_line)
+            time.sleep(0.05)
+        raise TimeoutError("Timed out waiting for the browser DevTools port")
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is not None:
+                print("Browser exited, restarting it")
+                self._shutdown()
+            if self._process is None:
+                self._start()
+            elif len(self._all_tabs) < self.tabs:
+                # Replace the tabs dropped after a connection error
+                try:
+                    self._open_tabs()
+                except Exception as e:
+                    print(f"Error opening a browser tab, restarting the browser: {e}")
+                    self._shutdown()
+                    self._start()
+
+    def _acquire_tab(self) -> _Tab:
+        """Wait for an idle tab, replacing dropped ones meanwhile"""
+        while True:
+            self._ensure_started()
+            try:
+                return self._idle_tabs.get(timeout=0.5)
+            except Empty:
+                continue
+
+    def _release(self, tab: _Tab, broken: bool = False):
+        """Return a tab to the pool, or close it if broken or from a closed browser"""
+        with self._lock:
+            if not broken and tab in self._all_tabs:
+                self._idle_tabs.put(tab)
+                return
+            if tab in self._all_tabs:
+                self._all_tabs.remove(tab)
+        tab.close(close_target=True)
+
+    def render(self, html: str) -> bytes:
+        """Render an HTML fragment and return the PNG bytes of the screenshot"""
+        tab = self._acquire_tab()
+        try:
+            image = tab.render(html)
+        except (websocket.WebSocketException, OSError):
+            # Crashed tab or browser: the tab is replaced on next use
+            self._release(tab, broken=True)
+            raise
+        except Exception:
+            self._release(tab)
+            raise
+        self._release(tab)
+        return image
+
+    def render_many(self, htmls: List[str]) -> List[bytes]:
+        """Render several HTML fragments in parallel over the tab pool"""
+        self._ensure_started()
+        with ThreadPoolExecutor(max_workers=self.tabs) as executor:
+            return list(executor.map(self.render, htmls))
+
+    def close(self):
+        """Close the tabs and shut the browser down"""
+        with self._lock:
+            self._shutdown()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _shutdown(self):
+        """Close the tabs and the browser, with the lock held"""
+        for tab in self._all_tabs:
+            tab.close()
+        self._all_tabs.clear()
+        self._idle_tabs = Queue()
+
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+            self._port = None
+
+        if self._user_data_dir is not None:
+            shutil.rmtree(self._user_data_dir, ignore_errors=True)
+            self._user_data_dir = None
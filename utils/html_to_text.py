@@ -1,87 +1,201 @@
+import hashlib
+import io
 import os
-import pytesseract
-from PIL import Image
-from html2image import Html2Image
+import shlex
+import subprocess
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from utils.html_extractor import HTMLExtractor
+from utils.html_renderer import HTMLRenderer
+from utils.sqlite_cache import SQLiteCache
+
+
+# Tesseract executable, reading the image from stdin and writing to stdout,
+# when the TESSERACT_CMD variable is not set
+TESSERACT_CMD = 'tesseract'
+
+
+def ocr_image(image, lang, config, timeout=60):
+    """
+    Run Tesseract on PNG bytes (picklable for process pools)
+
+    The image is piped to Tesseract, so nothing is written to disk and any
+    number of threads or processes can OCR at once.
+    """
+    options = shlex.split(config)
+    if '-l' not in options:
+        options += ['-l', lang]
+    completed = subprocess.run(
+        [os.getenv('TESSERACT_CMD') or TESSERACT_CMD, 'stdin', 'stdout', *options],
+        input=image,
+        capture_output=True,
+        timeout=timeout,
+    )
+    if completed.returncode:
+        raise RuntimeError(
+            f"Tesseract failed: {completed.stderr.decode('utf-8', 'replace').strip()}")
+    return completed.stdout.decode('utf-8').strip()
+
+
+def _otsu_threshold(histogram: List[int]) -> int:
+    """Gray level separating ink from background with the least in-class variance"""
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background, weighted_background = 0, 0
+    best_level, best_variance = 127, -1.0
+    for level, count in enumerate(histogram):
+        background += count
+        weighted_background += level * count
+        foreground = total - background
+        if not background or not foreground:
+            continue
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def _band_cuts(ink_rows: List[int], max_height: int) -> List[int]:
+    """Rows to cut an image at, in blank gaps between lines of text"""
+    cuts = [0]
+    height = len(ink_rows)
+    while height - cuts[-1] > max_height:
+        start = cuts[-1]
+        # The last blank row within reach, else the first one beyond it
+        blank = [row for row in range(start + 1, start + max_height) if not ink_rows[row]]
+        if not blank:
+            blank = [row for row in range(start + max_height, height) if not ink_rows[row]][:1]
+        if not blank:
+            break
+        cuts.append(blank[-1])
+    return cuts + [height]
+
+
+def prepare_for_ocr(image, dpi=192, max_band_height=1200, margin=10) -> List[bytes]:
+    """
+    Turn a screenshot into what Tesseract reads best
+
+    The image is converted to grayscale, binarized with Otsu's threshold and
+    cropped to its ink plus a margin. Taller images are split into bands at
+    blank rows between lines, so the bands can be OCR'd in parallel.
+    Args:
+        image (bytes): PNG screenshot
+        dpi (int): Resolution recorded in the PNGs, 96 per device pixel ratio
+        max_band_height (int): Height in pixels above which an image is split
+        margin (int): White border kept around the ink in pixels
+    Returns:
+        list: PNG bytes of the bands, top to bottom
+    """
+    from PIL import Image, ImageOps
+
+    gray = ImageOps.grayscale(Image.open(io.BytesIO(image)))
+    threshold = _otsu_threshold(gray.histogram())
+    binary = gray.point(lambda level: 255 if level > threshold else 0)
+
+    box = ImageOps.invert(binary).getbbox()
+    if box is None:
+        return []
+    binary = ImageOps.expand(binary.crop(box), border=margin, fill=255)
+
+    # Ink pixels in every row, from a one pixel wide downscale in floating
+    # point, so a row with a single ink pixel is not taken for a blank one
+    ink = ImageOps.invert(binary).convert('F').resize((1, binary.height), Image.BOX)
+    ink_rows = [round(level * binary.width / 255) for level in ink.getdata()]
+    cuts = _band_cuts(ink_rows, max_band_height)
+
+    bands = []
+    for top, bottom in zip(cuts, cuts[1:]):
+        buffer = io.BytesIO()
+        binary.crop((0, top, binary.width, bottom)).save(buffer, 'PNG', dpi=(dpi, dpi))
+        bands.append(buffer.getvalue())
+    return bands
+
 
 class HTMLToText:
     """Class to handle HTML to text conversion via image processing"""
 
-    def __init__(self, output_path='temp', lang='jpn'):
+    def __init__(
+        self,
+        lang='jpn',
+        renderer=None,
+        cache=None,
+        direct=True,
+        optimize=False,
+        max_band_height=1200,
+    ):
         """
         Initialize HTMLToText converter
         Args:
-            output_path (str): Path to store temporary images
             lang (str): Language for OCR (default: Japanese)
+            renderer (HTMLRenderer): Shared browser renderer (created if None)
+            cache (SQLiteCache): Cache of extracted text keyed by HTML content
+            direct (bool): Extract simple markup directly and only render
+                and OCR fragments that need it
+            optimize (bool): Crop and binarize screenshots and split tall
+                ones into bands before OCR
+            max_band_height (int): Height in pixels above which an
+                optimized screenshot is split into bands
         """
-        self.output_path = output_path
         self.lang = lang
-        self._setup_output_dir()
+        self.ocr_config = f'--oem 3 --psm 6 -l {lang}'
+        self.renderer = renderer or HTMLRenderer()
+        self.optimize = optimize
+        self.max_band_height = max_band_height
+        self.dpi = round(96 * self.renderer.scale)
+        if optimize:
+            self.ocr_config += f' --dpi {self.dpi}'
+        self.cache: SQLiteCache | None = cache
+        self.extractor = HTMLExtractor() if direct else None
+        self.path_counts = Counter()
+        self._path_lock = threading.Lock()
 
-    def _setup_output_dir(self):
-        """Create output directory if it doesn't exist"""
-        if not os.path.exists(self.output_path):
-            os.makedirs(self.output_path)
-
-    def html_to_image(self, html_content, id):
-        """Convert HTML content to image with settings optimized for Japanese text"""
+    def html_to_image(self, html_content):
+        """Render HTML content to PNG bytes with settings optimized for Japanese text"""
         if not html_content:
             return None
 
         try:
-            # Initialize Html2Image with updated settings for new headless mode
-            hti = Html2Image(
-                output_path=self.output_path,
-                size=(1024, 768),
-                custom_flags=[
-                    '--headless=new',
-                    '--disable-gpu',
-                    '--force-device-scale-factor=2',
-                    '--hide-scrollbars',
-                    '--virtual-time-budget=5000'
-                ]
-            )
-
-            # Generate unique filename
-            filename = f"question_{id}.png"
-
-            # Convert HTML to image
-            hti.screenshot(
-                html_str=html_content,
-                save_as=filename
-            )
-
-            return os.path.join(self.output_path, filename)
+            # Render in the long-lived browser, waiting only for layout
+            return self.renderer.render(html_content)
         except Exception as e:
             print(f"Error converting HTML to image: {e}")
             return None
 
-    def image_to_text(self, image_path):
-        """Convert image content to text using OCR with language configuration"""
-        try:
-            image = Image.open(image_path)
-
-            # Configure pytesseract
-            custom_config = f'--oem 3 --psm 6 -l {self.lang}'
-            text = pytesseract.image_to_string(
-                image,
-                lang=self.lang,
-                config=custom_config
-            )
+    def prepare(self, image) -> List[bytes]:
+        """Return the images to OCR for a screenshot, in reading order"""
+        if not self.optimize:
+            return [image]
+        return prepare_for_ocr(image, self.dpi, self.max_band_height)
 
-            return text.strip()
+    def image_to_text(self, image):
+        """Convert PNG bytes to text using OCR with language configuration"""
+        try:
+            bands = self.prepare(image)
+            if len(bands) == 1:
+                return ocr_image(bands[0], self.lang, self.ocr_config)
+            # Tesseract runs as a subprocess, so threads OCR bands in parallel
+            with ThreadPoolExecutor(max_workers=max(1, len(bands))) as executor:
+                texts = executor.map(
+                    lambda band: ocr_image(band, self.lang, self.ocr_config), bands)
+                return "\n".join(texts)
         except Exception as e:
             print(f"Error converting image to text: {e}")
             return None
 
-    def process_content(self, content, content_type, item_id):
+    def wrap_content(self, content, content_type):
         """
-        Process HTML content and convert to text
+        Build the HTML to render for a question or answer
         Args:
-            content (dict or str): Content to process
+            content (dict): Problem to process
             content_type (str): Type of content ('question' or 'answer')
-            item_id (str): Problem item ID
         Returns:
-            tuple: (extracted_text, image_path) or (text_content, None)
+            tuple: (html_content, text_content), html_content is None
+                when the content has no HTML
         """
         if content_type == 'question':
             has_html = '<' in content['item_description'] or '<' in content['question']
@@ -101,26 +215,87 @@ class HTMLToText:
             """ if has_html else None
             text_content = content['answer']
 
-        if has_html:
-            image_path = self.html_to_image(html_content, f"{item_id}_{content_type}")
-            if image_path is None:
+        return html_content, text_content
+
+    def process_content(self, content, content_type):
+        """
+        Process HTML content and convert to text
+        Args:
+            content (dict or str): Content to process
+            content_type (str): Type of content ('question' or 'answer')
+        Returns:
+            str: Extracted text, or the text content if it has no HTML
+        """
+        text, html_content, cache_key = self.resolve_content(content, content_type)
+
+        if text is None:
+            image = self.html_to_image(html_content)
+            if image is None:
                 print(f"Error converting {content_type} HTML to image")
                 raise ValueError("Error converting HTML to image")
 
-            extracted_text = self.image_to_text(image_path)
+            extracted_text = self.image_to_text(image)
             if extracted_text is None:
                 print(f"Error converting {content_type} image to text")
                 raise ValueError("Error converting image to text")
 
-            return extracted_text, image_path
+            self.store_ocr_text(cache_key, extracted_text)
+            return extracted_text
 
-        return text_content, None
+        return text
 
-    @staticmethod
-    def cleanup_temp_files(image_path):
-        """Remove temporary image files"""
-        try:
-            if os.path.exists(image_path):
-                os.remove(image_path)
-        except Exception as e:
-            print(f"Error cleaning up temporary file: {e}")
+    def resolve_content(self, content, content_type):
+        """
+        Get the text of a question or answer without rendering if possible
+        Args:
+            content (dict): Problem to process
+            content_type (str): Type of content ('question' or 'answer')
+        Returns:
+            tuple: (text, None, None) when the text is known, or
+                (None, html_content, cache_key) when it must be rendered
+        """
+        html_content, text_content = self.wrap_content(content, content_type)
+        if html_content is None:
+            self._count_path('plain')
+            return text_content, None, None
+
+        if self.extractor is not None:
+            direct_text = self.extractor.extract(html_content)
+            if direct_text is not None:
+                self._count_path('direct')
+                return direct_text, None, None
+
+        cache_key = self.cache_key(html_content)
+        if self.cache is not None:
+            cached_text = self.cache.get(cache_key)
+            if cached_text is not None:
+                self._count_path('cache')
+                return cached_text, None, None
+
+        return None, html_content, cache_key
+
+    def store_ocr_text(self, cache_key, text):
+        """Record text obtained by render and OCR"""
+        self._count_path('ocr')
+        if self.cache is not None:
+            self.cache.set(cache_key, text)
+
+    def _count_path(self, path):
+        with self._path_lock:
+            self.path_counts[path] += 1
+
+    def cache_key(self, html_content):
+        """Hash of everything that determines the extracted text"""
+        key = "\0".join([
+            html_content,
+            self.lang,
+            self.ocr_config,
+            f"{self.renderer.size}@{self.renderer.scale}",
+            f"clip={self.renderer.clip}",
+            f"optimize={self.optimize}:{self.max_band_height}",
+        ])
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def close(self):
+        """Shut down the browser used for rendering"""
+        self.renderer.close()
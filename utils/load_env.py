@@ -1,6 +1,9 @@
+from functools import lru_cache
+
 from dotenv import find_dotenv, load_dotenv
 
 
+@lru_cache(maxsize=None)
 def load_env():
-    """Load environment variables from .env file"""
+    """Load environment variables from .env file (once per process)"""
     load_dotenv(find_dotenv())
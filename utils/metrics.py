@@ -0,0 +1,243 @@
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+# Counters kept for every stage of every problem
+COUNTERS = (
+    'llm_requests',
+    'prompt_tokens',
+    'completion_tokens',
+    'retries',
+    'hedged_requests',
+    'stragglers_dropped',
+    'coalesced_requests',
+    'duplicates_reused',
+    'cache_hits',
+    'cache_misses',
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_problem_id = contextvars.ContextVar('problem_id', default=None)
+_stage = contextvars.ContextVar('stage', default=None)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """Run fn in a copy of the caller's context, e.g. on an executor thread."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def problem_key(problem: dict) -> str:
+    """
+    Return the key of the metrics of a problem. Several problems of a CSV
+    file share an item_id, so their position in the run tells them apart.
+    """
+    if problem.get('metrics_key') is not None:
+        return str(problem['metrics_key'])
+    if problem.get('index') is None:
+        return str(problem['item_id'])
+    return f"{problem['item_id']}#{problem['index']}"
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the q-th quantile of values, interpolating between ranks."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower, upper = math.floor(position), math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class Metrics:
+    """
+    Per-problem, per-stage wall time, queue wait and LLM counters.
+
+    Measurements are attributed to the problem (keyed by problem_key) and
+    stage of the current context, so work done on executor threads must be submitted through
+    bind_context. Each problem becomes one JSON Lines record once finished,
+    and the run totals can be served in the Prometheus text format.
+    """
+
+    def __init__(self):
+        # Records of several runs appended to one file are told apart by run
+        self.run_id = time.strftime('%Y%m%dT%H%M%S')
+        self._lock = threading.Lock()
+        self._open: Dict[str, dict] = {}
+        self._walls: Dict[str, List[float]] = defaultdict(list)
+        self._waits: Dict[str, float] = defaultdict(float)
+        self._totals: Dict[tuple, float] = defaultdict(float)
+        self._problems: Dict[str, int] = defaultdict(int)
+        self._file = None
+        self._server = None
+
+    def export_to(self, path: str):
+        """Append a JSON Lines record for every finished problem to path."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    @contextmanager
+    def stage(self, name: str, problem_id=None):
+        """Time a stage of the current (or given) problem."""
+        token = _stage.set(name)
+        problem_token = _problem_id.set(str(problem_id)) if problem_id is not None else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, 'wall', time.perf_counter() - start)
+            _stage.reset(token)
+            if problem_token is not None:
+                _problem_id.reset(problem_token)
+
+    def add_wait(self, seconds: float, stage: str = None, problem_id=None):
+        """Record time spent waiting in a queue before work could start."""
+        self.add(stage or _stage.get() or 'other', 'wait', seconds, problem_id)
+
+    def count(self, name: str, value: float = 1):
+        """Increment a counter of the current stage."""
+        self.add(_stage.get() or 'other', name, value)
+
+    def add(self, stage: str, name: str, value: float, problem_id=None):
+        problem_id = str(problem_id) if problem_id is not None else _problem_id.get()
+        with self._lock:
+            self._totals[(stage, name)] += value
+            if problem_id is not None:
+                stages = self._open.setdefault(problem_id, {})
+                fields = stages.setdefault(stage, {})
+                fields[name] = fields.get(name, 0) + value
+
+    def finish_problem(self, problem_id, status: str = 'done') -> dict:
+        """Close the record of a problem and export it."""
+        with self._lock:
+            stages = self._open.pop(str(problem_id), {})
+            for stage, fields in stages.items():
+                if 'wall' in fields:
+                    self._walls[stage].append(fields['wall'])
+                self._waits[stage] += fields.get('wait', 0)
+            self._problems[status] += 1
+
+        record = {
+            'run_id': self.run_id,
+            'problem_id': str(problem_id),
+            'status': status,
+            'finished_at': time.time(),
+            'stages': stages,
+        }
+        if self._file is not None:
+            with self._lock:
+                self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                self._file.flush()
+        return record
+
+    def summary(self) -> Dict[str, dict]:
+        """Return the per-problem wall time percentiles of every stage."""
+        with self._lock:
+            walls = {stage: list(values) for stage, values in self._walls.items()}
+        return {
+            stage: {
+                'count': len(values),
+                **{f'p{round(q * 100)}': percentile(values, q) for q in QUANTILES},
+            }
+            for stage, values in walls.items()
+        }
+
+    def format_summary(self) -> str:
+        """Format the stage percentiles as a table for the console."""
+        lines = [f"{'Stage':<12}{'Count':>7}{'p50':>10}{'p95':>10}{'p99':>10}"]
+        for stage, row in sorted(self.summary().items()):
+            lines.append(
+                f"{stage:<12}{row['count']:>7}"
+                f"{row['p50']:>9.2f}s{row['p95']:>9.2f}s{row['p99']:>9.2f}s"
+            )
+        return "\n".join(lines)
+
+    def prometheus_text(self) -> str:
+        """Render the run totals in the Prometheus text exposition format."""
+        summary = self.summary()
+        with self._lock:
+            totals = dict(self._totals)
+            waits = dict(self._waits)
+            problems = dict(self._problems)
+            walls = {stage: sum(values) for stage, values in self._walls.items()}
+
+        lines = [
+            "# HELP tutor_stage_seconds Wall time of a stage per problem",
+            "# TYPE tutor_stage_seconds summary",
+        ]
+        for stage, row in sorted(summary.items()):
+            for q in QUANTILES:
+                lines.append(
+                    f'tutor_stage_seconds{{stage="{stage}",quantile="{q}"}} '
+                    f'{row[f"p{round(q * 100)}"]}'
+                )
+            lines.append(f'tutor_stage_seconds_sum{{stage="{stage}"}} {walls[stage]}')
+            lines.append(f'tutor_stage_seconds_count{{stage="{stage}"}} {row["count"]}')
+
+        lines += [
+            "# HELP tutor_stage_wait_seconds_total Time spent queued before a stage",
+            "# TYPE tutor_stage_wait_seconds_total counter",
+        ]
+        lines += [
+            f'tutor_stage_wait_seconds_total{{stage="{stage}"}} {seconds}'
+            for stage, seconds in sorted(waits.items())
+        ]
+
+        for name in COUNTERS:
+            lines.append(f"# TYPE tutor_{name}_total counter")
+            lines += [
+                f'tutor_{name}_total{{stage="{stage}"}} {value:g}'
+                for (stage, counter), value in sorted(totals.items())
+                if counter == name
+            ]
+
+        lines.append("# TYPE tutor_problems_total counter")
+        lines += [
+            f'tutor_problems_total{{status="{status}"}} {count}'
+            for status, count in sorted(problems.items())
+        ]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = '127.0.0.1'):
+        """Serve /metrics in the Prometheus text format from a daemon thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Shared by every component of the process
+metrics = Metrics()
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import List, Optional, Tuple
+
+from utils.answer_checker import AnswerChecker
+from utils.html_extractor import HTMLExtractor
+
+# Numbering in front of a line or an option: (1), 1., ①, 問2, (a), ア. A
+# letter is only numbering when a space follows it, so the "a" of "a、bの値"
+# or "a.b" stays, and "1.5" is a number
+_NUMBERING = re.compile(
+    r'(?m)^\s*(?:\(\s*(?:[0-9]+|[a-zア-ン])\s*\)|[0-9]+\s*[.)．、](?![0-9])|'
+    r'問\s*[0-9]+\s*[.:：]?|[a-zア-ン][.)．](?=\s))\s*'
+)
+# Circled numbers, written as (1) before NFKC turns them into plain digits
+_CIRCLED = re.compile(r'[①-⑳]')
+# Whitespace and punctuation carrying no meaning for the problem
+_NOISE = re.compile(r'[\s、。:;!?「」『』()\[\]{}]+|(?<!\d)[.,]|[.,](?!\d)')
+
+# Mersenne prime 2^61 - 1, modulus of the universal hash functions
+_PRIME = (1 << 61) - 1
+
+
+class MinHasher:
+    """MinHash signatures of the character shingles of a text."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        """
+        Initialize the hasher.
+
+        Args:
+            num_perm: Number of hash functions, the length of a signature
+            shingle_size: Number of characters per shingle
+            seed: Seed of the hash functions, fixed so signatures can be stored
+        """
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._params = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)
+        ]
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        size = self.shingle_size
+        shingles = {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+            for shingle in shingles
+        ]
+        return tuple(
+            min((a * value + b) % _PRIME for value in hashes) for a, b in self._params
+        )
+
+
+def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+class NearDuplicateIndex:
+    """
+    Index of solved problems, found again by near-duplicate questions.
+
+    Questions are normalized (markup, numbering, whitespace and punctuation
+    removed) and indexed by MinHash with locality-sensitive hashing: a
+    signature is split into bands and problems sharing any band are compared.
+    A stored problem matches when its signature is similar enough and its
+    correct answer normalizes to the same answer, so questions differing by a
+    number and the answer with it are not confused. Problems are only reused
+    within the scope (model and student settings) they were solved in.
+    Stored in SQLite so it grows across runs.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 16,
+        scope: dict = None,
+    ):
+        """
+        Initialize the index and create the database if needed.
+
+        Args:
+            path: Path to the SQLite database file
+            threshold: Minimum estimated similarity of a match
+            num_perm: Length of the MinHash signatures
+            bands: Number of LSH bands, dividing num_perm
+            scope: Settings the analyses depend on (e.g. model, students);
+                a problem solved under other settings is not reused
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.scope = json.dumps(scope or {}, sort_keys=True, default=str)
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.answer_checker = AnswerChecker()
+        self._extractor = HTMLExtractor()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS problems ("
+            "id INTEGER PRIMARY KEY, "
+            "item_id TEXT NOT NULL, "
+            "scope TEXT NOT NULL DEFAULT '', "
+            "answer TEXT, "
+            "signature TEXT NOT NULL, "
+            "record TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS bands ("
+            "band INTEGER NOT NULL, "
+            "hash TEXT NOT NULL, "
+            "problem_id INTEGER NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS bands_hash ON bands (band, hash)"
+        )
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(problems)")}
+        if 'scope' not in columns:
+            # Problems indexed before scopes were stored are never reused
+            try:
+                self._connection.execute(
+                    "ALTER TABLE problems ADD COLUMN scope TEXT NOT NULL DEFAULT ''")
+            except sqlite3.OperationalError:
+                # Added by another process meanwhile
+                pass
+
+    def normalize(self, text: str) -> str:
+        """Reduce a question to the text that identifies it."""
+        if '<' in text:
+            text = self._extractor.extract(text) or re.sub(r'<[^>]*>', ' ', text)
+        text = _CIRCLED.sub(lambda match: f"({ord(match.group()) - ord('①') + 1})", text)
+        # Full-width punctuation and digits become ASCII
+        text = unicodedata.normalize('NFKC', text).lower()
+        text = _NUMBERING.sub('', text)
+        return _NOISE.sub('', text)
+
+    def _bands(self, signature: Tuple[int, ...]) -> List[str]:
+        return [
+            hashlib.blake2b(
+                repr(signature[band * self.rows:(band + 1) * self.rows]).encode(),
+                digest_size=8,
+            ).hexdigest()
+            for band in range(self.bands)
+        ]
+
+    def find(self, question: str, answer: str) -> Optional[Tuple[dict, float]]:
+        """
+        Return the stored record of the most similar solved problem with the
+        same answer and its similarity, or None below the threshold.
+        """
+        signature = self.hasher.signature(self.normalize(question))
+        normalized_answer = self.answer_checker.normalize(answer or '')
+        conditions = " OR ".join(["(band = ? AND hash = ?)"] * self.bands)
+        parameters = [
+            value for band, digest in enumerate(self._bands(signature)) for value in (band, digest)
+        ]
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT DISTINCT p.id, p.answer, p.signature, p.record FROM problems p "
+                f"JOIN bands b ON b.problem_id = p.id WHERE p.scope = ? AND ({conditions})",
+                [self.scope, *parameters],
+            ).fetchall()
+
+        best = None
+        for _, stored_answer, stored_signature, record in rows:
+            if stored_answer != normalized_answer:
+                continue
+            score = similarity(signature, tuple(json.loads(stored_signature)))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (record, score)
+        if best is None:
+            return None
+        return json.loads(best[0]), best[1]
+
+    def add(self, question: str, answer: str, record: dict):
+        """Index a solved problem with the record to reuse for its duplicates."""
+        signature = self.hasher.signature(self.normalize(question))
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._connection.execute(
+                    "INSERT INTO problems (item_id, scope, answer, signature, record, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        str(record.get('item_id')),
+                        self.scope,
+                        self.answer_checker.normalize(answer or ''),
+                        json.dumps(signature),
+                        json.dumps(record, ensure_ascii=False),
+                        time.time(),
+                    ),
+                )
+                self._connection.executemany(
+                    "INSERT INTO bands (band, hash, problem_id) VALUES (?, ?, ?)",
+                    [
+                        (band, digest, cursor.lastrowid)
+                        for band, digest in enumerate(self._bands(signature))
+                    ],
+                )
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM problems").fetchone()[0]
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._connection.close()
@@ -1,13 +1,38 @@
 import argparse
 
-def parse_args():
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def _fraction(value: str) -> float:
+    number = float(value)
+    if not 0 <= number <= 1:
+        raise argparse.ArgumentTypeError(f"{value} is not between 0 and 1")
+    return number
+
+
+def _shard(value: str):
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not of the form i/n")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"{value} needs 0 <= i < n")
+    return index, count
+
+
+def build_parser(description: str = 'AI Tutor Application') -> argparse.ArgumentParser:
     """
-    Parse command line arguments for the AI Tutor application.
+    Build the parser of the AI Tutor options, shared by the CLI and the service.
 
     Returns:
-        argparse.Namespace: Parsed command line arguments
+        argparse.ArgumentParser: Parser of the command line arguments
     """
-    parser = argparse.ArgumentParser(description='AI Tutor Application')
+    parser = argparse.ArgumentParser(description=description)
     parser.add_argument(
         '--llm',
         type=str,
@@ -17,10 +42,68 @@ def parse_args():
     )
     parser.add_argument(
         '--students',
-        type=int,
+        type=_positive_int,
         default=10,
         help='Number of students to simulate'
     )
+    parser.add_argument(
+        '--student-mode',
+        type=str,
+        choices=['agents', 'ensemble'],
+        default='agents',
+        help='One agent per student, or all students sampled from one prompt (default: agents)'
+    )
+    parser.add_argument(
+        '--sampling',
+        type=str,
+        choices=['fixed', 'adaptive'],
+        default='fixed',
+        help='Run every student, or students in waves until answers agree (default: fixed)'
+    )
+    parser.add_argument(
+        '--min-students',
+        type=_positive_int,
+        default=3,
+        help='Students run before checking agreement in adaptive mode (default: 3)'
+    )
+    parser.add_argument(
+        '--wave-size',
+        type=_positive_int,
+        default=2,
+        help='Students added per wave in adaptive mode (default: 2)'
+    )
+    parser.add_argument(
+        '--agreement',
+        type=_fraction,
+        default=0.75,
+        help='Share of agreeing answers that stops adaptive sampling (default: 0.75)'
+    )
+    parser.add_argument(
+        '--quorum',
+        type=_positive_int,
+        default=None,
+        help='Students that must answer before slower ones can be dropped (default: all)'
+    )
+    parser.add_argument(
+        '--straggler-timeout',
+        type=float,
+        default=0.0,
+        help='Seconds to wait for the other students once the quorum answered (default: 0)'
+    )
+    parser.add_argument(
+        '--verifier',
+        type=str,
+        choices=['llm', 'local'],
+        default='llm',
+        help='Verify every solution with the LLM, or check answers locally first (default: llm)'
+    )
+    parser.add_argument(
+        '--verifier-context',
+        type=str,
+        choices=['full', 'compact'],
+        default='full',
+        help='Pass every solution to the verifier, or one per distinct answer (default: full)'
+    )
     parser.add_argument(
         '--file',
         type=str,
@@ -33,4 +116,100 @@ def parse_args():
         default=False,
         help='Enable HTML to text conversion (default: False)'
     )
-    return parser.parse_args()
+    parser.add_argument(
+        '--force-ocr',
+        action='store_true',
+        default=False,
+        help='Render and OCR all HTML instead of extracting simple markup directly'
+    )
+    parser.add_argument(
+        '--ocr-optimize',
+        action='store_true',
+        default=False,
+        help='Crop, binarize and band screenshots at 288 DPI before OCR (default: False)'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=_positive_int,
+        default=1,
+        help='Number of problems processed at the same time (default: 1)'
+    )
+    parser.add_argument(
+        '--cache',
+        type=str,
+        choices=['off', 'read', 'write', 'replay'],
+        default='off',
+        help='LLM response cache mode (default: off)'
+    )
+    parser.add_argument(
+        '--dedup',
+        action='store_true',
+        default=False,
+        help='Reuse the analysis of an already solved near-duplicate problem (default: False)'
+    )
+    parser.add_argument(
+        '--dedup-threshold',
+        type=_fraction,
+        default=0.9,
+        help='Minimum question similarity of a near-duplicate, 0 to 1 (default: 0.9)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        default=False,
+        help='Skip problems completed by a previous run (default: False)'
+    )
+    parser.add_argument(
+        '--shard',
+        type=_shard,
+        default=None,
+        help='Only process the problems of shard i out of n, by item_id hash (e.g. 0/4)'
+    )
+    parser.add_argument(
+        '--queue',
+        type=str,
+        default=None,
+        help='SQLite work queue shared by worker processes (e.g. on a shared filesystem)'
+    )
+    parser.add_argument(
+        '--lease-timeout',
+        type=float,
+        default=600.0,
+        help='Seconds a worker holds a problem without renewing its lease (default: 600)'
+    )
+    parser.add_argument(
+        '--run-id',
+        type=str,
+        default=None,
+        help='Identifier of the run, shared by workers writing one set of results'
+    )
+    parser.add_argument(
+        '--results-format',
+        type=str,
+        choices=['jsonl', 'parquet'],
+        default='jsonl',
+        help='Format of the results written to output/results (default: jsonl)'
+    )
+    parser.add_argument(
+        '--metrics-file',
+        type=str,
+        default='output/metrics.jsonl',
+        help='JSON Lines file receiving the stage timings of every problem'
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=_positive_int,
+        default=None,
+        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics during the run'
+    )
+    return parser
+
+
+def parse_args():
+    """
+    Parse command line arguments for the AI Tutor application.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    return build_parser().parse_args()
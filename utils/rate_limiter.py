@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests and tokens per minute.
+
+    Callers are served in arrival order: a request that does not fit the
+    budget waits at the head of the queue instead of failing, and the ones
+    behind it wait for their turn. The buckets live in memory, or in a state
+    file when a state directory is given so that several processes on the
+    same host share one budget.
+    """
+
+    _registry: Dict[str, 'RateLimiter'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, rpm: int = None, tpm: int = None, state_path: str = None):
+        """
+        Initialize the limiter.
+
+        Args:
+            rpm: Maximum requests per minute (None for unlimited)
+            tpm: Maximum tokens per minute (None for unlimited)
+            state_path: File holding the buckets shared between processes
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.state_path = state_path
+        self._state = self._full_state()
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+
+    @classmethod
+    def shared(
+        cls,
+        key: str,
+        rpm: int = None,
+        tpm: int = None,
+        state_dir: str = None,
+    ) -> 'RateLimiter':
+        """Return the process-wide limiter for key (e.g. a provider/model)."""
+        with cls._registry_lock:
+            limiter = cls._registry.get(key)
+            if limiter is None:
+                state_path = None
+                if state_dir:
+                    os.makedirs(state_dir, exist_ok=True)
+                    name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+                    state_path = os.path.join(state_dir, f"{name}.json")
+                limiter = cls(rpm=rpm, tpm=tpm, state_path=state_path)
+                cls._registry[key] = limiter
+            return limiter
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Block until a request using `tokens` tokens fits the budget.
+
+        Returns:
+            float: Time spent waiting in seconds
+        """
+        if not self.rpm and not self.tpm:
+            return 0.0
+
+        start = time.monotonic()
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while self._serving != ticket:
+                self._condition.wait()
+
+            try:
+                while True:
+                    wait = self._update(lambda state: self._take(state, tokens))
+                    if wait <= 0:
+                        break
+                    self._condition.wait(timeout=wait)
+            finally:
+                self._serving += 1
+                self._condition.notify_all()
+
+        return time.monotonic() - start
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the real usage of a request is known."""
+        if not self.tpm:
+            return
+
+        def adjust(state):
+            state['tokens'] = min(
+                self.tpm, state['tokens'] + estimated_tokens - actual_tokens)
+
+        with self._condition:
+            self._update(adjust)
+
+    def _full_state(self) -> dict:
+        return {
+            'requests': float(self.rpm or 0),
+            'tokens': float(self.tpm or 0),
+            'updated_at': time.time(),
+        }
+
+    def _take(self, state: dict, tokens: int) -> float:
+        """Refill the buckets and consume one request, or return the time to wait."""
+        now = time.time()
+        elapsed = max(0.0, now - state['updated_at'])
+        state['updated_at'] = now
+
+        waits = []
+        if self.rpm:
+            state['requests'] = min(self.rpm, state['requests'] + elapsed * self.rpm / 60)
+            if state['requests'] < 1:
+                waits.append((1 - state['requests']) * 60 / self.rpm)
+        if self.tpm:
+            # A request larger than the whole budget waits for a full bucket
+            tokens = min(tokens, self.tpm)
+            state['tokens'] = min(self.tpm, state['tokens'] + elapsed * self.tpm / 60)
+            if state['tokens'] < tokens:
+                waits.append((tokens - state['tokens']) * 60 / self.tpm)
+
+        if waits:
+            return max(waits)
+
+        if self.rpm:
+            state['requests'] -= 1
+        if self.tpm:
+            state['tokens'] -= tokens
+        return 0.0
+
+    def _update(self, update):
+        """Apply update to the buckets, in memory or in the shared state file."""
+        if self.state_path is None:
+            return update(self._state)
+
+        with self._locked_state() as state:
+            return update(state)
+
+    @contextmanager
+    def _locked_state(self):
+        import fcntl
+
+        with open(self.state_path, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read())
+                except json.JSONDecodeError:
+                    state = self._full_state()
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,224 @@
+import glob
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Tuple
+
+# Totals kept in the summary of a run, updated as records are written
+SUMMARY_FIELDS = (
+    'problems',
+    'correct',
+    'incorrect',
+    'undecided',
+    'students',
+    'students_correct',
+    'students_incorrect',
+    'prompt_tokens',
+    'completion_tokens',
+    'duration',
+)
+
+
+class ResultsStore:
+    """
+    Structured results of every problem, one dataset partition per run.
+
+    Records are buffered and appended to `run=<run_id>/` under the root as
+    JSON Lines or Parquet part files. Each partition also keeps a small
+    `_summary.json` of running totals, so accuracy queries over a run do not
+    read the records. Worker processes sharing a run each write files of their
+    own, named after the writer, and the partition is read as one dataset.
+    With skip_stored, a problem already stored in the partition, e.g. by a
+    run killed before it marked the problem done, is not stored twice.
+    """
+
+    FORMATS = ('jsonl', 'parquet')
+
+    def __init__(
+        self,
+        root: str = 'output/results',
+        run_id: str = 'default',
+        format: str = 'jsonl',
+        flush_every: int = 20,
+        writer: str = None,
+        skip_stored: bool = False,
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory holding one partition per run
+            run_id: Identifier of the run the records belong to
+            format: 'jsonl' (one growing file) or 'parquet' (one file per flush)
+            flush_every: Number of records buffered before they are written
+            writer: Name of this writer when several processes share the run
+            skip_stored: Drop the records of problems (item_id and index)
+                already in the partition
+        """
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown results format: {format}")
+        self.root = root
+        self.run_id = run_id
+        self.format = format
+        self.flush_every = flush_every
+        self.writer = writer
+        self._suffix = f"-{writer}" if writer else ''
+        self.partition = self.partition_path(root, run_id)
+        self._buffer: List[dict] = []
+        self._lock = threading.Lock()
+        os.makedirs(self.partition, exist_ok=True)
+        self._summary = self._read_summary(self._summary_path)
+        self._keys = None
+        if skip_stored:
+            self._keys = {self.record_key(record) for record in self.iter_records(root, run_id)}
+
+    @staticmethod
+    def partition_path(root: str, run_id: str) -> str:
+        return os.path.join(root, f"run={run_id}")
+
+    @staticmethod
+    def record_key(record: dict) -> Tuple:
+        """Return the problem of a record. Several problems of a CSV file share an item_id."""
+        return record.get('item_id'), record.get('index')
+
+    @property
+    def data_path(self) -> str:
+        """File (JSON Lines) or file pattern (Parquet) receiving the records."""
+        if self.format == 'jsonl':
+            return os.path.join(self.partition, f"results{self._suffix}.jsonl")
+        return os.path.join(self.partition, f"part{self._suffix}-*.parquet")
+
+    @property
+    def _summary_path(self) -> str:
+        return os.path.join(self.partition, f"_summary{self._suffix}.json")
+
+    def append(self, record: dict) -> bool:
+        """
+        Buffer a record, writing the buffer once it is full.
+
+        Returns:
+            bool: True if the buffer, this record included, was written
+        """
+        key = self.record_key(record)
+        with self._lock:
+            if self._keys is not None:
+                if key in self._keys:
+                    # Stored by a previous run, the record is written already
+                    return False
+                self._keys.add(key)
+            self._buffer.append({'run_id': self.run_id, **record})
+            if len(self._buffer) < self.flush_every:
+                return False
+            self._flush()
+            return True
+
+    def flush(self):
+        """Write the buffered records."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+
+        if self.format == 'jsonl':
+            with open(self.data_path, 'a', encoding='utf-8') as f:
+                f.writelines(
+                    json.dumps(record, ensure_ascii=False) + '\n' for record in self._buffer)
+        else:
+            self._write_parquet(self._buffer)
+
+        for record in self._buffer:
+            self._add_to_summary(record)
+        self._write_summary()
+        self._buffer = []
+
+    def _write_parquet(self, records: List[dict]):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required for the parquet results format")
+
+        # Stage timings have varying keys, so they are stored as JSON text
+        rows = [{**record, 'stages': json.dumps(record.get('stages') or {})} for record in records]
+        part = len(glob.glob(self.data_path))
+        pq.write_table(
+            pa.Table.from_pylist(rows),
+            os.path.join(self.partition, f"part{self._suffix}-{part:05d}.parquet"),
+        )
+
+    def _add_to_summary(self, record: dict):
+        summary = self._summary
+        summary['problems'] += 1
+        verdict = record.get('verdict')
+        summary[{True: 'correct', False: 'incorrect', None: 'undecided'}[verdict]] += 1
+        for student in record.get('students') or []:
+            summary['students'] += 1
+            summary['students_correct'] += student.get('verdict') is True
+            summary['students_incorrect'] += student.get('verdict') is False
+        summary['prompt_tokens'] += record.get('prompt_tokens') or 0
+        summary['completion_tokens'] += record.get('completion_tokens') or 0
+        summary['duration'] += record.get('duration') or 0
+
+    def _write_summary(self):
+        path = self._summary_path
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self._summary, f)
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        self.flush()
+
+    @staticmethod
+    def runs(root: str = 'output/results') -> List[str]:
+        """Return the run ids stored under root, oldest first."""
+        partitions = sorted(glob.glob(os.path.join(root, 'run=*')), key=os.path.getmtime)
+        return [os.path.basename(path)[len('run='):] for path in partitions]
+
+    @classmethod
+    def summary(cls, root: str, run_id: str) -> Dict[str, float]:
+        """
+        Return the totals of a run, with the accuracy over decided problems.
+
+        Reads only the summary files of the partition.
+        """
+        summary = dict.fromkeys(SUMMARY_FIELDS, 0)
+        pattern = os.path.join(cls.partition_path(root, run_id), '_summary*.json')
+        for path in glob.glob(pattern):
+            for field, value in cls._read_summary(path).items():
+                summary[field] += value
+
+        decided = summary['correct'] + summary['incorrect']
+        summary['accuracy'] = summary['correct'] / decided if decided else None
+        return summary
+
+    @staticmethod
+    def _read_summary(path: str) -> Dict[str, float]:
+        summary = dict.fromkeys(SUMMARY_FIELDS, 0)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                summary.update(json.load(f))
+        return summary
+
+    @classmethod
+    def iter_records(cls, root: str, run_id: str) -> Iterator[dict]:
+        """Yield the records of a run, writer by writer in the order they were written."""
+        partition = cls.partition_path(root, run_id)
+        for jsonl_path in sorted(glob.glob(os.path.join(partition, 'results*.jsonl'))):
+            with open(jsonl_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Partial line written by a run that was killed
+                        continue
+
+        parts = sorted(glob.glob(os.path.join(partition, 'part-*.parquet')))
+        if parts:
+            import pyarrow.parquet as pq
+
+            for part in parts:
+                for record in pq.read_table(part).to_pylist():
+                    record['stages'] = json.loads(record.get('stages') or '{}')
+                    yield record
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict
+
+
+class RunManifest:
+    """A utility class recording the status of every problem of a run."""
+
+    # Problem fields that identify the work done for a problem
+    INPUT_FIELDS = ('item_id', 'item_description', 'question', 'answer', 'explanation')
+
+    def __init__(self, path: str, resume: bool = False, run_id: str = None):
+        """
+        Initialize the manifest.
+
+        Records are appended to a JSON Lines file, one line per completed
+        problem, and flushed to disk immediately. When resuming, the records
+        of the previous run are loaded and the file is appended to; otherwise
+        it is started afresh.
+
+        Args:
+            path: Path to the manifest file
+            resume: Load the records of a previous run
+            run_id: Run the records belong to, defaults to the run of the
+                last record loaded when resuming
+        """
+        self.path = path
+        self.run_id = run_id
+        self.entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if resume and os.path.exists(path):
+            self._load()
+            mode = 'a'
+        else:
+            mode = 'w'
+        self._file = open(path, mode, encoding='utf-8')
+
+    def _load(self):
+        """Replay the records of a previous run, the last one for a problem wins."""
+        with open(self.path, 'rb+') as f:
+            content = f.read()
+            if content and not content.endswith(b'\n'):
+                # Drop the partial last line of a run that was killed, so the
+                # next record does not get appended to it
+                content = content[:content.rfind(b'\n') + 1]
+                f.truncate(len(content))
+
+        run_id = None
+        for line in content.decode('utf-8', errors='replace').splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Line damaged by a run that was killed
+                continue
+            self.entries[entry['input_hash']] = entry
+            run_id = entry.get('run_id') or run_id
+        if self.run_id is None:
+            self.run_id = run_id
+
+    @classmethod
+    def input_hash(cls, problem: dict) -> str:
+        """Return a hash of the problem fields."""
+        fields = {field: problem.get(field) for field in cls.INPUT_FIELDS}
+        return hashlib.sha256(
+            json.dumps(fields, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+
+    def is_done(self, problem: dict) -> bool:
+        """Return True if the problem was completed by a previous run."""
+        entry = self.entries.get(self.input_hash(problem))
+        return entry is not None and entry['status'] == 'done'
+
+    def record(
+        self,
+        problem: dict,
+        status: str,
+        output_path: str = None,
+        duration: float = None,
+        error: str = None,
+    ):
+        """
+        Record the outcome of a problem.
+
+        Args:
+            problem: Problem as read from the CSV file
+            status: 'done' or 'failed'
+            output_path: Path to the written results
+            duration: Processing time in seconds
+            error: Error message of a failed problem
+        """
+        entry = {
+            'input_hash': self.input_hash(problem),
+            'item_id': problem['item_id'],
+            'run_id': self.run_id,
+            'status': status,
+            'output_path': output_path,
+            'duration': duration,
+            'error': error,
+            'completed_at': time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self.entries[entry['input_hash']] = entry
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """Close the manifest file."""
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,142 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteCache:
+    """Persistent key/value cache stored in SQLite with size and age eviction."""
+
+    # Number of writes between two eviction passes
+    EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = None,
+        max_bytes: int = None,
+        max_age: float = None,
+    ):
+        """
+        Initialize the cache and create the database if needed.
+
+        Args:
+            path: Path to the SQLite database file
+            max_entries: Maximum number of entries kept (None for unlimited)
+            max_bytes: Maximum total size of the stored values in bytes
+            max_age: Maximum age of an entry in seconds
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, "
+            "value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)"
+        )
+        self.evict()
+
+    def get(self, key: str) -> str | None:
+        """Return the cached value for key or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            if self.max_age is not None and now - created_at > self.max_age:
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+
+            self._connection.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str):
+        """Store value under key, replacing any previous value."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode('utf-8')), now, now),
+            )
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones over the limits."""
+        with self._lock:
+            if self.max_age is not None:
+                self._connection.execute(
+                    "DELETE FROM entries WHERE created_at < ?",
+                    (time.time() - self.max_age,),
+                )
+
+            if self.max_entries is not None:
+                self._connection.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    "SELECT key FROM entries ORDER BY accessed_at DESC "
+                    "LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+            if self.max_bytes is not None:
+                # Keep the most recently used entries whose running size fits
+                self._connection.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    "SELECT key FROM ("
+                    "SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS total "
+                    "FROM entries) WHERE total > ?)",
+                    (self.max_bytes,),
+                )
+
+    def stats(self) -> dict:
+        """Return hit/miss statistics of this cache instance."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional
+
+from utils.run_manifest import RunManifest
+
+
+def shard_of(item_id: str, shards: int) -> int:
+    """Return the shard of an item_id, stable across processes and hosts."""
+    digest = hashlib.sha1(str(item_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shards
+
+
+class WorkQueue:
+    """
+    Durable queue of problems shared by worker processes through SQLite.
+
+    Workers lease problems one at a time. A lease expires after the
+    visibility timeout unless renewed, so the problems of a crashed worker
+    are leased again by the others. Completing a problem requires holding its
+    lease, and a failed problem, or one whose lease expired, is retried until
+    it used up its attempts.
+    """
+
+    # Leases of a problem before it stays failed
+    MAX_ATTEMPTS = 3
+
+    def __init__(
+        self,
+        path: str,
+        visibility_timeout: float = 600.0,
+        poll_interval: float = 1.0,
+        max_attempts: int = MAX_ATTEMPTS,
+    ):
+        """
+        Initialize the queue and create the database if needed.
+
+        Args:
+            path: Path to the SQLite database file, on a filesystem shared
+                by every worker
+            visibility_timeout: Seconds a lease lasts without being renewed
+            poll_interval: Seconds between lease attempts while every
+                remaining problem is leased by other workers
+            max_attempts: Leases of a problem before it stays failed
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # The rollback journal relies on file locks only, unlike WAL which
+        # needs shared memory and so a single host
+        self._connection = sqlite3.connect(
+            path, timeout=60, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "key TEXT PRIMARY KEY, "
+            "item_id TEXT NOT NULL, "
+            "position INTEGER NOT NULL, "
+            "problem TEXT NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "owner TEXT, "
+            "lease_expires REAL, "
+            "error TEXT, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS items_status ON items (status, position)"
+        )
+
+    @staticmethod
+    def key(problem: dict) -> str:
+        return RunManifest.input_hash(problem)
+
+    def enqueue(self, problems: Iterable[dict]) -> int:
+        """
+        Add problems to the queue, ignoring the ones already in it.
+
+        Every worker may enqueue the same file: the first one adds the
+        problems and the others find them there.
+
+        Returns:
+            int: Number of problems added
+        """
+        now = time.time()
+        rows = (
+            (self.key(problem), str(problem['item_id']), problem.get('index', 0),
+             json.dumps(problem, ensure_ascii=False), now)
+            for problem in problems
+        )
+        with self._lock:
+            before = self._connection.total_changes
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO items "
+                    "(key, item_id, position, problem, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+            return self._connection.total_changes - before
+
+    def lease(self, owner: str) -> Optional[dict]:
+        """Lease the first pending (or expired) problem, or return None."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                # A problem that crashed or hung its worker every time stays failed
+                self._connection.execute(
+                    "UPDATE items SET status = 'failed', owner = NULL, lease_expires = NULL, "
+                    "error = 'lease expired on every attempt', updated_at = ? "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, self.max_attempts),
+                )
+                row = self._connection.execute(
+                    "SELECT key, problem FROM items "
+                    "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                    "ORDER BY position LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        "UPDATE items SET status = 'leased', owner = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, updated_at = ? WHERE key = ?",
+                        (owner, now + self.visibility_timeout, now, row[0]),
+                    )
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+        return json.loads(row[1]) if row is not None else None
+
+    def renew(self, owner: str) -> int:
+        """Extend every lease held by owner, returning the number renewed."""
+        now = time.time()
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE items SET lease_expires = ?, updated_at = ? "
+                "WHERE status = 'leased' AND owner = ?",
+                (now + self.visibility_timeout, now, owner),
+            )
+            return cursor.rowcount
+
+    def complete(self, problem: dict, owner: str, status: str = 'done', error: str = None) -> bool:
+        """
+        Record the outcome of a leased problem.
+
+        A failed problem goes back to the queue while it has attempts left.
+
+        Args:
+            problem: Problem returned by lease
+            owner: Worker holding the lease
+            status: 'done' or 'failed'
+            error: Error message of a failed problem
+
+        Returns:
+            bool: False if the lease was lost to another worker meanwhile
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE items SET "
+                "status = CASE WHEN ? = 'failed' AND attempts < ? THEN 'pending' ELSE ? END, "
+                "owner = NULL, lease_expires = NULL, error = ?, updated_at = ? "
+                "WHERE key = ? AND status = 'leased' AND owner = ?",
+                (status, self.max_attempts, status, error, time.time(), self.key(problem), owner),
+            )
+            return cursor.rowcount == 1
+
+    def consume(self, owner: str) -> Iterator[dict]:
+        """
+        Lease and yield problems until none is pending or leased elsewhere.
+
+        While the remaining problems are leased by other workers, waits for
+        them to finish or for their leases to expire. Problems still leased
+        by owner are not waited for, since the caller completes them after
+        this returns: one that fails goes back to the queue, so the caller
+        consumes again until counts() shows nothing pending.
+        """
+        while True:
+            problem = self.lease(owner)
+            if problem is not None:
+                yield problem
+                continue
+
+            with self._lock:
+                leased_elsewhere = self._connection.execute(
+                    "SELECT COUNT(*) FROM items WHERE status = 'leased' AND owner != ?",
+                    (owner,),
+                ).fetchone()[0]
+            if not leased_elsewhere:
+                return
+            time.sleep(self.poll_interval)
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of problems in each status."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM items GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._connection.close()